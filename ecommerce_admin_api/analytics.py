@@ -0,0 +1,111 @@
+import numpy as np
+from datetime import date
+
+# Vectorized revenue analytics over per-day revenue rows (see crud.get_daily_revenue_rows).
+# All bucketing is done on numpy datetime64[D] arrays, so results do not depend on the SQL
+# dialect's date functions. Weeks start on Sunday, matching MySQL's DAYOFWEEK.
+
+PERIODS = ('day', 'week', 'month', 'year')
+ONE_MICROSECOND = np.timedelta64(1, 'us')
+
+
+def _check_period(period: str):
+    if period not in PERIODS:
+        raise ValueError("Invalid period specified. Use 'day', 'week', 'month', or 'year'.")
+
+
+def to_day_array(days) -> np.ndarray:
+    """Converts dates (or ISO date strings, as SQLite returns DATE()) to datetime64[D]."""
+    return np.array([day if isinstance(day, date) else date.fromisoformat(day) for day in days],
+                    dtype='datetime64[D]')
+
+
+def period_starts(days: np.ndarray, period: str) -> np.ndarray:
+    """Start day of the period containing each day."""
+    _check_period(period)
+    if period == 'day':
+        return days
+    if period == 'week':
+        # 1970-01-01 was a Thursday, so (days since epoch + 4) % 7 is days since the previous Sunday
+        offset = (days.astype('int64') + 4) % 7
+        return days - offset.astype('timedelta64[D]')
+    if period == 'month':
+        return days.astype('datetime64[M]').astype('datetime64[D]')
+    return days.astype('datetime64[Y]').astype('datetime64[D]')
+
+
+def period_ends(starts: np.ndarray, period: str) -> np.ndarray:
+    """Last microsecond of each period, as datetime64[us]."""
+    _check_period(period)
+    if period == 'day':
+        next_starts = starts + np.timedelta64(1, 'D')
+    elif period == 'week':
+        next_starts = starts + np.timedelta64(7, 'D')
+    elif period == 'month':
+        next_starts = (starts.astype('datetime64[M]') + np.timedelta64(1, 'M')).astype('datetime64[D]')
+    else:
+        next_starts = (starts.astype('datetime64[Y]') + np.timedelta64(1, 'Y')).astype('datetime64[D]')
+    return next_starts.astype('datetime64[us]') - ONE_MICROSECOND
+
+
+def period_range(first_day: date, last_day: date, period: str) -> np.ndarray:
+    """Start days of every period from the one containing first_day through the one containing last_day."""
+    first, last = period_starts(to_day_array([first_day, last_day]), period)
+    if period == 'day':
+        return np.arange(first, last + np.timedelta64(1, 'D'))
+    if period == 'week':
+        return np.arange(first, last + np.timedelta64(1, 'D'), np.timedelta64(7, 'D'))
+    unit = 'M' if period == 'month' else 'Y'
+    return np.arange(first.astype(f'datetime64[{unit}]'),
+                     last.astype(f'datetime64[{unit}]') + np.timedelta64(1, unit)).astype('datetime64[D]')
+
+
+def aggregate(days: np.ndarray, revenue: np.ndarray, period: str, keys: np.ndarray = None,
+              periods: np.ndarray = None):
+    """
+    Sums revenue per (series key, period).
+    Returns (period start days, series keys or None, matrix[n_series, n_periods]). Without keys
+    there is a single series. Without periods only the periods that have rows are returned; pass
+    period_range(...) to get every period of a range, zero where there were no sales, as deltas needs.
+    """
+    starts = period_starts(days, period)
+    if periods is None:
+        periods, period_index = np.unique(starts, return_inverse=True)
+    else:
+        period_index = np.searchsorted(periods, starts)
+    if keys is None:
+        series_keys, series_index = None, np.zeros(len(days), dtype=np.int64)
+        n_series = 1
+    else:
+        series_keys, series_index = np.unique(keys, return_inverse=True)
+        n_series = len(series_keys)
+    flat = np.bincount(series_index * len(periods) + period_index, weights=revenue,
+                       minlength=n_series * len(periods))
+    return periods, series_keys, flat.reshape(n_series, len(periods))
+
+
+def deltas(matrix: np.ndarray, lag: int = 1):
+    """
+    Absolute and percentage changes along the period axis against the period `lag` positions
+    earlier (1 = period-over-period, 12 over monthly periods = year-over-year).
+    Periods without a baseline, or whose baseline is zero, have no percentage change (NaN).
+    """
+    if lag < 1:
+        raise ValueError("lag must be at least 1.")
+    change = np.full(matrix.shape, np.nan)
+    percent = np.full(matrix.shape, np.nan)
+    if matrix.shape[-1] > lag:
+        previous = matrix[:, :-lag]
+        change[:, lag:] = matrix[:, lag:] - previous
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percent[:, lag:] = np.where(previous != 0, change[:, lag:] / previous * 100, np.nan)
+    return change, percent
+
+
+def to_datetimes(values: np.ndarray) -> list:
+    """datetime64 array to a list of naive datetimes."""
+    return values.astype('datetime64[us]').tolist()
+
+
+def nan_to_none(values: np.ndarray) -> list:
+    return [None if np.isnan(value) else float(value) for value in values]
@@ -0,0 +1,196 @@
+import argparse
+import io
+import logging
+import os
+from datetime import date, datetime, time
+from itertools import groupby
+
+import crud
+
+# Columnar export of sales (with each sale's category, from sales.category) as Apache Arrow IPC or Parquet.
+# Record batches are built straight from crud.iter_sales_batches, one keyset query per batch.
+# pyarrow is an optional dependency: pip install pyarrow
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError: # pragma: no cover - optional dependency
+    pa = None
+    pq = None
+
+FORMATS = ("arrow", "parquet")
+PARTITIONS = ("day", "month", "year")
+MEDIA_TYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+logger = logging.getLogger(__name__)
+
+
+def require_pyarrow():
+    if pa is None:
+        raise RuntimeError("pyarrow is required for Arrow/Parquet export. Please install it: pip install pyarrow")
+
+
+def sales_schema():
+    require_pyarrow()
+    return pa.schema([
+        ("id", pa.int64()),
+        ("product_id", pa.int32()),
+        ("quantity_sold", pa.int32()),
+        ("sale_price_per_unit", pa.float64()),
+        ("total_revenue", pa.float64()),
+        ("sale_date", pa.timestamp("us")),
+        ("category", pa.string()),
+    ])
+
+
+def to_record_batch(rows, schema):
+    """Converts a list of (EXPORT_COLUMNS..., category) rows into one RecordBatch."""
+    columns = list(zip(*rows)) if rows else [()] * len(schema)
+    return pa.RecordBatch.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+        schema=schema
+    )
+
+
+def iter_record_batches(db, **filters):
+    schema = sales_schema()
+    for rows in crud.iter_sales_batches(db, with_category=True, **filters):
+        yield to_record_batch(rows, schema)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back to a generator."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_sales(db, export_format: str, **filters):
+    """
+    Yields an Arrow IPC stream or a Parquet file as byte chunks, one record batch at a time.
+    Parquet row groups map to DB cursor batches; the footer is written at the end.
+    """
+    require_pyarrow()
+    schema = sales_schema()
+    sink = _ChunkSink()
+    if export_format == "arrow":
+        writer = pa.ipc.new_stream(sink, schema)
+    elif export_format == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    else:
+        raise ValueError(f"Unsupported export format '{export_format}'. Use one of {FORMATS}.")
+
+    for batch in iter_record_batches(db, **filters):
+        if export_format == "arrow":
+            writer.write_batch(batch)
+        else:
+            writer.write_table(pa.Table.from_batches([batch], schema=schema))
+        chunk = sink.drain()
+        if chunk:
+            yield chunk
+    writer.close()
+    yield sink.drain()
+
+
+def _partition_key(value: datetime, partition_by: str) -> str:
+    if partition_by == "day":
+        return value.strftime("%Y-%m-%d")
+    if partition_by == "month":
+        return value.strftime("%Y-%m")
+    return value.strftime("%Y")
+
+
+def write_partitioned(db, root_dir: str, export_format: str = "parquet", partition_by: str = "month", **filters) -> dict:
+    """
+    Writes sales into Hive-style date partitions, e.g. root_dir/sale_month=2024-01/part-0.parquet.
+    Rows arrive ordered by sale_date, so each partition's writer is closed as soon as the next one starts.
+    Returns {partition directory: row count}.
+    """
+    require_pyarrow()
+    if partition_by not in PARTITIONS:
+        raise ValueError(f"Unsupported partition '{partition_by}'. Use one of {PARTITIONS}.")
+    schema = sales_schema()
+    extension = "arrow" if export_format == "arrow" else "parquet"
+    counts = {}
+    current_key, writer = None, None
+
+    def open_writer(key):
+        directory = os.path.join(root_dir, f"sale_{partition_by}={key}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"part-0.{extension}")
+        if export_format == "arrow":
+            return pa.ipc.new_file(path, schema)
+        return pq.ParquetWriter(path, schema, compression="snappy")
+
+    def write(batch):
+        if export_format == "arrow":
+            writer.write_batch(batch)
+        else:
+            writer.write_table(pa.Table.from_batches([batch], schema=schema))
+
+    try:
+        for rows in crud.iter_sales_batches(db, with_category=True, **filters):
+            for key, group in groupby(rows, key=lambda row: _partition_key(row.sale_date, partition_by)):
+                group = list(group)
+                if key != current_key:
+                    if writer is not None:
+                        writer.close()
+                    current_key, writer = key, open_writer(key)
+                write(to_record_batch(group, schema))
+                partition = f"sale_{partition_by}={key}"
+                counts[partition] = counts.get(partition, 0) + len(group)
+    finally:
+        if writer is not None:
+            writer.close()
+    return counts
+
+
+    # --- Command line export for BI jobs ---
+    # Example: python arrow_export.py --out exports/sales --format parquet --partition month --start 2024-01-01
+if __name__ == "__main__":
+        from database import new_read_session
+
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        parser = argparse.ArgumentParser(description="Export sales with their category as Arrow IPC or Parquet.")
+        parser.add_argument("--out", required=True, help="Output file, or directory when --partition is given")
+        parser.add_argument("--format", choices=FORMATS, default="parquet")
+        parser.add_argument("--partition", choices=PARTITIONS, default=None, help="Write Hive-style date partitions")
+        parser.add_argument("--start", type=date.fromisoformat, default=None, help="First sale date (YYYY-MM-DD)")
+        parser.add_argument("--end", type=date.fromisoformat, default=None, help="Last sale date (YYYY-MM-DD)")
+        parser.add_argument("--product-id", type=int, default=None)
+        parser.add_argument("--category", default=None)
+        args = parser.parse_args()
+
+        filters = dict(
+            start_date=datetime.combine(args.start, time.min) if args.start else None,
+            end_date=datetime.combine(args.end, time.max) if args.end else None,
+            product_id=args.product_id,
+            category=args.category,
+        )
+        db = new_read_session()
+        try:
+            if args.partition:
+                counts = write_partitioned(db, args.out, args.format, args.partition, **filters)
+                logger.info(f"Wrote {sum(counts.values())} rows into {len(counts)} partitions under {args.out}")
+            else:
+                with open(args.out, "wb") as output:
+                    for chunk in stream_sales(db, args.format, **filters):
+                        output.write(chunk)
+                logger.info(f"Wrote {args.out}")
+        finally:
+            db.close()
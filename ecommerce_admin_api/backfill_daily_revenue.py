@@ -0,0 +1,41 @@
+import argparse
+import logging
+from datetime import date
+
+from database import SessionLocal
+import models # Registers the DailyRevenue table on Base.metadata
+import crud
+
+    # --- Configure Logging ---
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def backfill(start_date=None, end_date=None, sale_categories=False):
+        """
+        Rebuilds the daily_revenue rollup from raw sales for the given day range (all history by default).
+        With sale_categories, first fills sales.category on rows that predate the column.
+        """
+        db = SessionLocal()
+        try:
+            if sale_categories:
+                logger.info("Backfilling sales.category from products...")
+                logger.info(f"Updated {crud.backfill_sale_categories(db)} sales.")
+            logger.info(f"Rebuilding daily_revenue rollup for {start_date or 'beginning'} .. {end_date or 'today'}...")
+            rows = crud.rebuild_daily_revenue(db, start_date=start_date, end_date=end_date)
+            logger.info(f"Wrote {rows} daily_revenue rows.")
+        finally:
+            db.close()
+
+
+    # --- Run the backfill script ---
+    # Example: python backfill_daily_revenue.py --start 2024-01-01 --end 2024-12-31
+    # After adding sales.category: python backfill_daily_revenue.py --sale-categories
+if __name__ == "__main__":
+        parser = argparse.ArgumentParser(description="Backfill the daily_revenue rollup table from existing sales.")
+        parser.add_argument("--start", type=date.fromisoformat, default=None, help="First day to rebuild (YYYY-MM-DD)")
+        parser.add_argument("--end", type=date.fromisoformat, default=None, help="Last day to rebuild (YYYY-MM-DD)")
+        parser.add_argument("--sale-categories", action="store_true",
+                            help="Fill sales.category on existing sales before rebuilding the rollup")
+        args = parser.parse_args()
+        backfill(start_date=args.start, end_date=args.end, sale_categories=args.sale_categories)
@@ -0,0 +1,607 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+# End-to-end benchmark: runs main.app in-process (fastapi.testclient, no server or network needed)
+# against a seeded database and drives a weighted mix of browse, inventory, sale and dashboard
+# requests from several client threads. Reports p50/p95/p99 latency, throughput and DB queries per
+# request (from the app's Server-Timing header, see query_metrics.py) for each operation, and saves
+# the run as JSON; --baseline compares against a saved run.
+#
+# Example:
+#   python benchmark.py --database-url sqlite:///benchmark.db --seed-products 2000 --seed-sales 500000 \
+#       --duration 60 --concurrency 8 --output results.json
+#   python benchmark.py --duration 60 --baseline results.json --max-regression 0.2
+# --write-behind records sales through POST /sales/buffered (sale_buffer.py) instead of POST /sales/;
+# run it with --baseline against a run without it to compare the two ingestion paths:
+#   python benchmark.py --duration 60 --concurrency 16 --output sync.json
+#   python benchmark.py --duration 60 --concurrency 16 --write-behind --baseline sync.json
+# --async-mode serves the hot endpoints from the async routes (DB_ASYNC_MODE=true); its clients are tasks on one
+# event loop (--event-loop), so compare it against a sync run driven the same way:
+#   python benchmark.py --duration 60 --concurrency 64 --event-loop --output sync-loop.json
+#   python benchmark.py --duration 60 --concurrency 64 --async-mode --baseline sync-loop.json
+# --list-cpu N also requests each list endpoint N times from a single client and reports the process CPU
+# time per request, which is what row materialization and JSON encoding cost (--duration 0 skips the mix):
+#   python benchmark.py --duration 0 --list-cpu 500 --output lists.json
+# --inventory-adjust N adjusts the stock of N products with one PUT /inventory/{id} each, then with PATCH
+# /inventory/bulk, and reports items per second and DB queries of both (the stock ends where it started):
+#   python benchmark.py --duration 0 --inventory-adjust 1000
+# --sale-contention T records one-unit sales of a single product from T threads, through crud.create_sale's
+# conditional UPDATE and through the read-modify-write path it replaced, and reports sales/s and lost decrements:
+#   python benchmark.py --duration 0 --sale-contention 16 --sales-per-thread 50
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("benchmark")
+
+DEFAULT_DATABASE_URL = "sqlite:///benchmark.db"
+
+# (operation, weight): roughly an admin dashboard's traffic, reads dominating writes
+WORKLOAD = (
+    ("browse_products", 25),
+    ("get_product", 20),
+    ("get_inventory", 15),
+    ("low_stock", 5),
+    ("record_sale", 15),
+    ("list_sales", 5),
+    ("revenue_summary", 5),
+    ("revenue_analysis", 4),
+    ("leaderboard", 4),
+    ("revenue_matrix", 2),
+)
+
+def _build_request(operation: str, rng: random.Random, product_ids: list, today: date, sale_path: str = "/sales/"):
+        """Returns (method, url, json body) for one operation."""
+        product_id = rng.choice(product_ids)
+        if operation == "browse_products":
+            return "GET", f"/products/?limit=50&skip={rng.randrange(0, 10) * 50}", None
+        if operation == "get_product":
+            return "GET", f"/products/{product_id}", None
+        if operation == "get_inventory":
+            return "GET", f"/inventory/{product_id}", None
+        if operation == "low_stock":
+            return "GET", "/inventory/?low_stock=true&limit=100", None
+        if operation == "record_sale":
+            return "POST", sale_path, {"sale": {"product_id": product_id, "quantity_sold": 1}}
+        if operation == "list_sales":
+            return "GET", f"/sales/?limit=100&product_id={product_id}", None
+        if operation == "revenue_summary":
+            start = today - timedelta(days=rng.choice((7, 30, 90)))
+            return "GET", f"/sales/revenue/summary?start_date={start}&end_date={today}", None
+        if operation == "revenue_analysis":
+            start = today - timedelta(days=365)
+            return "GET", f"/sales/revenue/analysis?period={rng.choice(('week', 'month'))}&start_date={start}&end_date={today}", None
+        if operation == "leaderboard":
+            return "GET", f"/sales/leaderboard?window_days={rng.choice((7, 30, 90))}&group_by={rng.choice(('product', 'category'))}", None
+        if operation == "revenue_matrix":
+            # Twelve consecutive 30-day windows ending today
+            periods = [{"start": f"{today - timedelta(days=30 * k)}T00:00:00", "end": f"{today - timedelta(days=30 * (k - 1))}T00:00:00"}
+                       for k in range(12, 0, -1)]
+            return "POST", "/sales/revenue/comparison/matrix", {"periods": periods, "group_by": "category"}
+        raise ValueError(f"Unknown operation '{operation}'")
+
+
+def seed_database(num_products: int, num_sales: int, days: int, seed: int):
+        """Bulk-loads synthetic data (populate_db.bulk_load) if the database has no products yet."""
+        import database
+        import models
+        import populate_db
+        models.Base.metadata.create_all(bind=database.engine)
+        db = database.SessionLocal()
+        try:
+            has_products = db.query(models.Product.id).first() is not None
+        finally:
+            db.close()
+        if has_products:
+            logger.warning("Database already has products; skipping seeding.")
+            return
+        logger.warning(f"Seeding {num_products} products and {num_sales} sales...")
+        populate_db.bulk_load(num_products=num_products, num_sales=num_sales, days=days, seed=seed)
+
+
+def run(duration: float, concurrency: int, warmup: float, seed: int, write_behind: bool = False, event_loop: bool = False):
+        """
+        Drives the workload and returns {operation: {"latencies": [...], "queries": [...], "errors": n, "statuses": {...}}}.
+        Clients are threads with a TestClient each, or with event_loop concurrent tasks on one event loop sending
+        through httpx's ASGI transport, the way a server runs requests (and what the async routes need: the async
+        engine's pool belongs to one loop).
+        """
+        from fastapi.testclient import TestClient
+        import database
+        import main
+        import models
+        import query_metrics
+        import sale_buffer
+
+        if database.ASYNC_MODE and not event_loop:
+            raise RuntimeError("DB_ASYNC_MODE needs --event-loop clients.")
+        if write_behind and not sale_buffer.buffer.started:
+            raise RuntimeError("--write-behind needs SALES_WRITE_BEHIND=true before main is imported.")
+        sale_path = "/sales/buffered" if write_behind else "/sales/"
+
+        if not query_metrics.QUERY_METRICS_ENABLED:
+            logger.warning("QUERY_METRICS_ENABLED is off; queries per request will not be reported.")
+        app = main.app
+
+        db = database.SessionLocal()
+        try:
+            product_ids = [row.id for row in db.query(models.Product.id).all()]
+        finally:
+            db.close()
+        if not product_ids:
+            raise RuntimeError("The benchmark database has no products; seed it first.")
+
+        operations = [name for name, _ in WORKLOAD]
+        weights = [weight for _, weight in WORKLOAD]
+        results = {name: {"latencies": [], "queries": [], "errors": 0, "statuses": {}} for name in operations}
+        lock = threading.Lock()
+        today = date.today()
+        started = time.perf_counter()
+        measure_from = started + warmup
+        stop_at = measure_from + duration
+
+        def record(operation: str, begin: float, status: int, queries):
+            elapsed = time.perf_counter() - begin
+            if begin < measure_from:
+                return
+            with lock:
+                result = results[operation]
+                result["statuses"][str(status)] = result["statuses"].get(str(status), 0) + 1
+                if status >= 500:
+                    result["errors"] += 1
+                    return
+                result["latencies"].append(elapsed)
+                if queries is not None:
+                    result["queries"].append(queries)
+
+        def worker(worker_id: int):
+            rng = random.Random(seed * 1000 + worker_id)
+            client = TestClient(app)
+            while time.perf_counter() < stop_at:
+                operation = rng.choices(operations, weights)[0]
+                method, url, body = _build_request(operation, rng, product_ids, today, sale_path)
+                begin = time.perf_counter()
+                try:
+                    response = client.request(method, url, json=body)
+                    timing = query_metrics.parse_server_timing(response.headers.get("server-timing", ""))
+                    status, queries = response.status_code, timing.get("db_queries")
+                except Exception as e:
+                    logger.warning(f"{operation} failed: {e}")
+                    status, queries = 599, None
+                record(operation, begin, status, queries)
+
+        async def drive_on_loop():
+            import httpx
+
+            async def task(client, worker_id: int):
+                rng = random.Random(seed * 1000 + worker_id)
+                while time.perf_counter() < stop_at:
+                    operation = rng.choices(operations, weights)[0]
+                    method, url, body = _build_request(operation, rng, product_ids, today, sale_path)
+                    begin = time.perf_counter()
+                    try:
+                        response = await client.request(method, url, json=body)
+                        timing = query_metrics.parse_server_timing(response.headers.get("server-timing", ""))
+                        status, queries = response.status_code, timing.get("db_queries")
+                    except Exception as e:
+                        logger.warning(f"{operation} failed: {e}")
+                        status, queries = 599, None
+                    record(operation, begin, status, queries)
+
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver") as client:
+                await asyncio.gather(*[task(client, i) for i in range(concurrency)])
+
+        if event_loop:
+            asyncio.run(drive_on_loop())
+        else:
+            threads = [threading.Thread(target=worker, args=(i,), name=f"bench-{i}") for i in range(concurrency)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        if write_behind:
+            sale_buffer.buffer.flush()
+        return results
+
+
+# (name, url) of the list endpoints measured by --list-cpu, at their largest page size
+LIST_ENDPOINTS = (
+    ("list_products", "/products/?limit=200"),
+    ("list_inventory", "/inventory/?limit=200"),
+    ("list_sales", "/sales/?limit=500"),
+)
+
+def measure_list_cpu(requests_per_endpoint: int) -> dict:
+        """
+        Requests each list endpoint sequentially from one client and returns
+        {endpoint: {"cpu_ms_per_request", "wall_ms_per_request", "rows", "bytes"}}. Process CPU time covers
+        the client too, which is the same for every version of the app, so compare runs rather than
+        reading the absolute numbers.
+        """
+        from fastapi.testclient import TestClient
+        import main
+
+        client = TestClient(main.app)
+        measured = {}
+        for name, url in LIST_ENDPOINTS:
+            for _ in range(min(20, requests_per_endpoint)): # Warm caches, pools and code paths
+                client.get(url)
+            cpu_started, wall_started = time.process_time(), time.perf_counter()
+            for _ in range(requests_per_endpoint):
+                response = client.get(url)
+            cpu_ms = (time.process_time() - cpu_started) * 1000 / requests_per_endpoint
+            wall_ms = (time.perf_counter() - wall_started) * 1000 / requests_per_endpoint
+            if response.status_code != 200:
+                raise RuntimeError(f"{url} returned {response.status_code}: {response.text[:200]}")
+            measured[name] = {"cpu_ms_per_request": round(cpu_ms, 3), "wall_ms_per_request": round(wall_ms, 3),
+                              "rows": len(response.json()), "bytes": len(response.content)}
+        return measured
+
+
+def measure_inventory_adjust(items: int) -> dict:
+        """
+        Adds one unit to each of the first `items` products with one PUT /inventory/{id} per product, then takes
+        it back with PATCH /inventory/bulk requests, and returns {path: {"items", "seconds", "items_per_s", "queries"}}.
+        """
+        from fastapi.testclient import TestClient
+        import database
+        import main
+        import models
+        import query_metrics
+        from routers.inventory import MAX_BULK_ADJUSTMENTS
+
+        db = database.SessionLocal()
+        try:
+            stock = db.query(models.Inventory.product_id, models.Inventory.quantity) \
+                .order_by(models.Inventory.product_id).limit(items).all()
+        finally:
+            db.close()
+        if not stock:
+            raise RuntimeError("The benchmark database has no inventory; seed it first.")
+        client = TestClient(main.app)
+
+        def send(method, url, body):
+            response = client.request(method, url, json=body)
+            if response.status_code != 200:
+                raise RuntimeError(f"{method} {url} returned {response.status_code}: {response.text[:200]}")
+            return query_metrics.parse_server_timing(response.headers.get("server-timing", "")).get("db_queries", 0)
+
+        def timed(requests):
+            started, queries = time.perf_counter(), 0
+            for method, url, body in requests:
+                queries += send(method, url, body)
+            seconds = time.perf_counter() - started
+            return {"items": len(stock), "seconds": round(seconds, 3), "items_per_s": round(len(stock) / seconds, 1),
+                    "queries": int(queries)}
+
+        measured = {"put": timed([("PUT", f"/inventory/{product_id}", {"inventory_update": {"quantity": quantity + 1}})
+                                  for product_id, quantity in stock])}
+        adjustments = [{"product_id": product_id, "delta": -1} for product_id, _ in stock]
+        measured["bulk"] = timed([("PATCH", "/inventory/bulk", {"adjustments": adjustments[start:start + MAX_BULK_ADJUSTMENTS]})
+                                  for start in range(0, len(adjustments), MAX_BULK_ADJUSTMENTS)])
+        return measured
+
+
+def _create_sale_read_modify_write(db, sale):
+        """
+        The stock check create_sale used before its conditional UPDATE, for --sale-contention: the quantity is
+        read, checked in Python and written back as an absolute value, so concurrent sales can overwrite each
+        other's decrement. Everything else matches create_sale.
+        """
+        import crud
+        import models
+
+        db_product = crud.get_product(db, sale.product_id)
+        if db_product.inventory.quantity < sale.quantity_sold:
+            raise crud.InsufficientStockError(f"Insufficient stock for product id {sale.product_id}.")
+        db_product.inventory.quantity -= sale.quantity_sold
+        total_revenue = sale.quantity_sold * db_product.price
+        db_sale = models.Sale(product_id=sale.product_id, quantity_sold=sale.quantity_sold,
+                              sale_price_per_unit=db_product.price, total_revenue=total_revenue,
+                              sale_date=crud.database_now(db), category=db_product.category_norm)
+        db.add(db_sale)
+        try:
+            db.flush()
+            crud._add_to_daily_revenue(db, db_sale.sale_date.date(), sale.product_id, db_product.category,
+                                       total_revenue, sale.quantity_sold)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return db_sale
+
+
+def measure_sale_contention(threads: int, sales_per_thread: int) -> dict:
+        """
+        Records threads x sales_per_thread one-unit sales of one product, all threads released together, through
+        crud.create_sale and through _create_sale_read_modify_write. The stock is reset to cover every sale before
+        each path and restored afterwards. Returns {path: {"sales", "seconds", "sales_per_s", "accepted",
+        "insufficient", "errors", "lost_decrements"}}; lost_decrements counts accepted sales the stock never lost.
+        """
+        from sqlalchemy import select, update
+        import cache
+        import crud
+        import database
+        import models
+        import schemas
+
+        inventory_table = models.Inventory.__table__
+        db = database.SessionLocal()
+        try:
+            product_id, original = db.query(models.Inventory.product_id, models.Inventory.quantity) \
+                .order_by(models.Inventory.product_id).first()
+
+            def set_stock(quantity: int):
+                db.execute(update(inventory_table).where(inventory_table.c.product_id == product_id).values(quantity=quantity))
+                db.commit()
+                cache.inventory_cache.invalidate(product_id)
+
+            def stock() -> int:
+                return db.execute(select(inventory_table.c.quantity).where(inventory_table.c.product_id == product_id)).scalar()
+
+            total = threads * sales_per_thread
+            sale = schemas.SaleCreate(product_id=product_id, quantity_sold=1)
+            measured = {}
+            for name, record in (("conditional_update", crud.create_sale), ("read_modify_write", _create_sale_read_modify_write)):
+                set_stock(total)
+                counts = {"accepted": 0, "insufficient": 0, "errors": 0}
+                lock = threading.Lock()
+                barrier = threading.Barrier(threads + 1)
+
+                def sell():
+                    session = database.SessionLocal()
+                    outcomes = []
+                    try:
+                        barrier.wait()
+                        for _ in range(sales_per_thread):
+                            try:
+                                record(session, sale)
+                                outcomes.append("accepted")
+                            except crud.InsufficientStockError:
+                                outcomes.append("insufficient")
+                            except Exception:
+                                session.rollback()
+                                outcomes.append("errors")
+                    finally:
+                        session.close()
+                    with lock:
+                        for outcome in outcomes:
+                            counts[outcome] += 1
+
+                workers = [threading.Thread(target=sell, name=f"sale-contention-{i}") for i in range(threads)]
+                for worker in workers:
+                    worker.start()
+                barrier.wait()
+                started = time.perf_counter()
+                for worker in workers:
+                    worker.join()
+                seconds = time.perf_counter() - started
+                measured[name] = {"sales": total, "seconds": round(seconds, 3),
+                                  "sales_per_s": round(counts["accepted"] / seconds, 1), **counts,
+                                  "lost_decrements": counts["accepted"] - (total - stock())}
+            set_stock(original)
+        finally:
+            db.close()
+        return measured
+
+
+def summarize(results: dict, duration: float) -> dict:
+        """Per-operation and overall latency percentiles (ms), throughput (req/s) and queries per request."""
+        def stats(latencies, queries, errors, statuses=None):
+            latencies_ms = np.array(latencies) * 1000
+            summary = {
+                "requests": len(latencies),
+                "errors": errors,
+                "throughput_rps": round(len(latencies) / duration, 2) if duration else None,
+                "p50_ms": None, "p95_ms": None, "p99_ms": None, "mean_ms": None, "max_ms": None,
+                "queries_per_request": round(float(np.mean(queries)), 2) if queries else None,
+            }
+            if len(latencies_ms):
+                p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+                summary.update(p50_ms=round(float(p50), 3), p95_ms=round(float(p95), 3), p99_ms=round(float(p99), 3),
+                               mean_ms=round(float(latencies_ms.mean()), 3), max_ms=round(float(latencies_ms.max()), 3))
+            if statuses is not None:
+                summary["statuses"] = statuses
+            return summary
+
+        operations = {name: stats(r["latencies"], r["queries"], r["errors"], r["statuses"]) for name, r in results.items()}
+        overall = stats([l for r in results.values() for l in r["latencies"]],
+                        [q for r in results.values() for q in r["queries"]],
+                        sum(r["errors"] for r in results.values()))
+        return {"overall": overall, "operations": operations}
+
+
+def compare(current: dict, baseline: dict, max_regression: float) -> list:
+        """
+        Returns a list of human-readable regressions: p95 latency or queries per request up, or throughput
+        down, by more than max_regression.
+        """
+        regressions = []
+        for name, now in [("overall", current["overall"])] + list(current["operations"].items()):
+            before = baseline["overall"] if name == "overall" else baseline.get("operations", {}).get(name)
+            if not before or not now["p95_ms"] or not before.get("p95_ms"):
+                continue
+            change = (now["p95_ms"] - before["p95_ms"]) / before["p95_ms"]
+            if change > max_regression:
+                regressions.append(f"{name}: p95 {before['p95_ms']}ms -> {now['p95_ms']}ms (+{change:.0%})")
+            # Cache hit ratios make query counts jitter a little between runs; flag real increases only
+            if before.get("queries_per_request") is not None and now["queries_per_request"] is not None \
+                    and now["queries_per_request"] > before["queries_per_request"] * (1 + max_regression) + 0.5:
+                regressions.append(f"{name}: queries/request {before['queries_per_request']} -> {now['queries_per_request']}")
+        for name, now in current.get("list_cpu", {}).items():
+            before = baseline.get("list_cpu", {}).get(name)
+            if before and now["cpu_ms_per_request"] > before["cpu_ms_per_request"] * (1 + max_regression):
+                regressions.append(f"{name}: CPU {before['cpu_ms_per_request']}ms -> {now['cpu_ms_per_request']}ms per request")
+        before = baseline.get("inventory_adjust", {}).get("bulk")
+        now = current.get("inventory_adjust", {}).get("bulk")
+        if before and now and now["items_per_s"] < before["items_per_s"] * (1 - max_regression):
+            regressions.append(f"inventory bulk adjust: {before['items_per_s']} -> {now['items_per_s']} items/s")
+        before = baseline.get("sale_contention", {}).get("conditional_update")
+        now = current.get("sale_contention", {}).get("conditional_update")
+        if before and now and now["sales_per_s"] < before["sales_per_s"] * (1 - max_regression):
+            regressions.append(f"contended sales: {before['sales_per_s']} -> {now['sales_per_s']} sales/s")
+        if baseline["overall"].get("throughput_rps") and current["overall"]["throughput_rps"] is not None:
+            change = (current["overall"]["throughput_rps"] - baseline["overall"]["throughput_rps"]) / baseline["overall"]["throughput_rps"]
+            if change < -max_regression:
+                regressions.append(f"overall: throughput {baseline['overall']['throughput_rps']} -> {current['overall']['throughput_rps']} req/s ({change:.0%})")
+        return regressions
+
+
+def print_comparison(summary: dict, baseline: dict):
+        """Side-by-side p50/p99 latency and throughput of each operation against a saved run."""
+        header = f"{'operation':<18} {'p50 before':>10} {'p50 now':>9} {'p99 before':>10} {'p99 now':>9} {'req/s before':>12} {'req/s now':>9}"
+        print(header)
+        print("-" * len(header))
+        rows = list(summary["operations"].items()) + [("overall", summary["overall"])]
+        for name, now in rows:
+            before = baseline["overall"] if name == "overall" else baseline.get("operations", {}).get(name)
+            if not before:
+                continue
+            fmt = lambda value, width: f"{value:{width}.2f}" if value is not None else f"{'-':>{width}}"
+            print(f"{name:<18} {fmt(before['p50_ms'], 10)} {fmt(now['p50_ms'], 9)} {fmt(before['p99_ms'], 10)} "
+                  f"{fmt(now['p99_ms'], 9)} {fmt(before['throughput_rps'], 12)} {fmt(now['throughput_rps'], 9)}")
+
+
+def print_list_cpu(list_cpu: dict, baseline: dict = None):
+        """CPU and wall time per request of each list endpoint, with the baseline's CPU time when it has one."""
+        previous = (baseline or {}).get("list_cpu", {})
+        header = f"{'endpoint':<18} {'rows':>5} {'KiB':>7} {'wall ms':>8} {'CPU ms':>8} {'CPU before':>10} {'change':>7}"
+        print(header)
+        print("-" * len(header))
+        for name, now in list_cpu.items():
+            before = previous.get(name, {}).get("cpu_ms_per_request")
+            change = f"{(now['cpu_ms_per_request'] - before) / before:+7.0%}" if before else f"{'-':>7}"
+            print(f"{name:<18} {now['rows']:>5} {now['bytes'] / 1024:>7.1f} {now['wall_ms_per_request']:>8.2f} "
+                  f"{now['cpu_ms_per_request']:>8.2f} {f'{before:.2f}' if before is not None else '-':>10} {change}")
+
+
+def print_inventory_adjust(measured: dict):
+        header = f"{'path':<6} {'items':>6} {'seconds':>8} {'items/s':>9} {'queries':>8}"
+        print(header)
+        print("-" * len(header))
+        for name, result in measured.items():
+            print(f"{name:<6} {result['items']:>6} {result['seconds']:>8.3f} {result['items_per_s']:>9.1f} {result['queries']:>8}")
+
+
+def print_sale_contention(measured: dict):
+        header = f"{'path':<20} {'sales':>6} {'sales/s':>8} {'accepted':>8} {'409':>5} {'errors':>6} {'lost':>5}"
+        print(header)
+        print("-" * len(header))
+        for name, result in measured.items():
+            print(f"{name:<20} {result['sales']:>6} {result['sales_per_s']:>8.1f} {result['accepted']:>8} "
+                  f"{result['insufficient']:>5} {result['errors']:>6} {result['lost_decrements']:>5}")
+
+
+def print_report(summary: dict):
+        header = f"{'operation':<18} {'reqs':>7} {'err':>4} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8}"
+        print(header)
+        print("-" * len(header))
+        rows = list(summary["operations"].items()) + [("overall", summary["overall"])]
+        for name, s in rows:
+            fmt = lambda value: f"{value:8.2f}" if value is not None else f"{'-':>8}"
+            throughput = f"{s['throughput_rps']:8.1f}" if s['throughput_rps'] is not None else f"{'-':>8}"
+            print(f"{name:<18} {s['requests']:>7} {s['errors']:>4} {throughput} "
+                  f"{fmt(s['p50_ms'])} {fmt(s['p95_ms'])} {fmt(s['p99_ms'])} {fmt(s['queries_per_request'])}")
+
+
+def _git_commit():
+        try:
+            return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                  cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+        except Exception:
+            return None
+
+
+    # --- Run the benchmark ---
+if __name__ == "__main__":
+        parser = argparse.ArgumentParser(description="Benchmark the API in-process against a seeded database.")
+        parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", DEFAULT_DATABASE_URL),
+                            help=f"Database to benchmark (default: $DATABASE_URL or {DEFAULT_DATABASE_URL})")
+        parser.add_argument("--seed-products", type=int, default=1000, help="Products to bulk-load if the database is empty")
+        parser.add_argument("--seed-sales", type=int, default=200000, help="Sales to bulk-load if the database is empty")
+        parser.add_argument("--seed-days", type=int, default=365, help="Days of sales history to bulk-load")
+        parser.add_argument("--seed", type=int, default=42, help="Seed for the data and the request mix")
+        parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+        parser.add_argument("--warmup", type=float, default=3, help="Unmeasured seconds before measuring (fills caches and pools)")
+        parser.add_argument("--concurrency", type=int, default=4, help="Client threads")
+        parser.add_argument("--output", default=None, help="Write the results as JSON to this file")
+        parser.add_argument("--baseline", default=None, help="JSON results of an earlier run to compare against")
+        parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed relative p95/throughput regression vs the baseline")
+        parser.add_argument("--write-behind", action="store_true", help="Record sales through the write-behind buffer (POST /sales/buffered)")
+        parser.add_argument("--event-loop", action="store_true",
+                            help="Run the clients as concurrent tasks on one event loop instead of threads")
+        parser.add_argument("--async-mode", action="store_true",
+                            help="Serve the hot endpoints from the async routes (DB_ASYNC_MODE=true); implies --event-loop")
+        parser.add_argument("--list-cpu", type=int, default=0, metavar="N",
+                            help="Also measure CPU time per request of each list endpoint over N sequential requests")
+        parser.add_argument("--inventory-adjust", type=int, default=0, metavar="N",
+                            help="Also compare per-item PUT /inventory/{id} with PATCH /inventory/bulk over N products")
+        parser.add_argument("--sale-contention", type=int, default=0, metavar="T",
+                            help="Also compare conditional-UPDATE and read-modify-write sales of one product from T threads")
+        parser.add_argument("--sales-per-thread", type=int, default=50, help="Sales per thread for --sale-contention")
+        args = parser.parse_args()
+
+        # database.py reads DATABASE_URL and DB_ASYNC_MODE, and main SALES_WRITE_BEHIND, at import time
+        os.environ["DATABASE_URL"] = args.database_url
+        if args.write_behind:
+            os.environ["SALES_WRITE_BEHIND"] = "true"
+        if args.async_mode:
+            os.environ["DB_ASYNC_MODE"] = "true"
+            args.event_loop = True
+
+        seed_database(args.seed_products, args.seed_sales, args.seed_days, args.seed)
+        baseline = None
+        if args.baseline:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        results = run(args.duration, args.concurrency, args.warmup, args.seed, write_behind=args.write_behind,
+                      event_loop=args.event_loop) if args.duration else {}
+        summary = summarize(results, args.duration)
+        if results:
+            print_report(summary)
+        if args.list_cpu:
+            summary["list_cpu"] = measure_list_cpu(args.list_cpu)
+            print(f"\nList endpoints ({args.list_cpu} sequential requests each):")
+            print_list_cpu(summary["list_cpu"], baseline)
+        if args.inventory_adjust:
+            summary["inventory_adjust"] = measure_inventory_adjust(args.inventory_adjust)
+            print(f"\nInventory adjustments ({args.inventory_adjust} products, one PUT each vs PATCH /inventory/bulk):")
+            print_inventory_adjust(summary["inventory_adjust"])
+        if args.sale_contention:
+            summary["sale_contention"] = measure_sale_contention(args.sale_contention, args.sales_per_thread)
+            print(f"\nContended sales ({args.sale_contention} threads x {args.sales_per_thread} one-unit sales of one product):")
+            print_sale_contention(summary["sale_contention"])
+
+        import database
+        report = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "database": database.engine.url.get_backend_name(),
+            "async_mode": database.ASYNC_MODE,
+            "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "database_url")},
+            **summary,
+        }
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"\nResults written to {args.output}")
+
+        if baseline is not None:
+            print(f"\nCompared with {args.baseline} (commit {baseline.get('git_commit')}, write-behind {baseline.get('config', {}).get('write_behind', False)}):")
+            if results:
+                print_comparison(summary, baseline)
+            regressions = compare(summary, baseline, args.max_regression)
+            if regressions:
+                print(f"\nRegressions vs {args.baseline} (commit {baseline.get('git_commit')}):")
+                for regression in regressions:
+                    print(f"  {regression}")
+                raise SystemExit(1)
+            print(f"\nNo regressions vs {args.baseline} (commit {baseline.get('git_commit')}).")
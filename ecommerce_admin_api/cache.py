@@ -0,0 +1,324 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+from datetime import datetime
+
+from pydantic import TypeAdapter
+
+import schemas
+
+logger = logging.getLogger(__name__)
+
+# Caches for hot point lookups, product list pages and revenue summaries.
+#
+# CACHE_BACKEND selects where entries live:
+#   "local"      - in-process only (default). Each worker has its own copy.
+#   "redis"      - shared across workers in the Redis server at REDIS_URL; every worker keeps a
+#                  small local copy in front of it, and invalidations are published on
+#                  CACHE_INVALIDATION_CHANNEL so all workers drop their local copy.
+#   "fake-redis" - the redis backend on top of fake_redis.FakeRedis, an in-memory stand-in.
+#
+# Entries are invalidated by the crud write paths; TTLs bound staleness for anything else.
+# CACHE_TTL_SECONDS=0 disables caching.
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "local").lower()
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "30"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+PAGE_CACHE_TTL_SECONDS = float(os.getenv("PAGE_CACHE_TTL_SECONDS", "5"))
+REVENUE_CACHE_TTL_SECONDS = float(os.getenv("REVENUE_CACHE_TTL_SECONDS", "60"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "ecommerce_admin:")
+CACHE_INVALIDATION_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "ecommerce_admin:cache-invalidations")
+
+MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire `ttl` seconds after they were stored."""
+
+    def __init__(self, name: str, maxsize: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL_SECONDS):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.maxsize > 0
+
+    def get(self, key):
+        """Returns the cached value, or MISSING if absent or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return MISSING
+
+    def set(self, key, value, ttl: float = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if not self.enabled or ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys:
+                if self._data.pop(key, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+class RedisBackend:
+    """
+    Shared cache storage on a Redis-protocol server (redis-py client API).
+    Values are stored as JSON with a TTL; invalidations delete the keys and are published to
+    every worker so they can drop their local copies.
+    """
+
+    name = "redis"
+
+    def __init__(self, client, channel: str = CACHE_INVALIDATION_CHANNEL, prefix: str = CACHE_KEY_PREFIX):
+        self.client = client
+        self.channel = channel
+        self.prefix = prefix
+        self.errors = 0
+        self._listener = None
+
+    def get(self, key: str):
+        try:
+            return self.client.get(self.prefix + key)
+        except Exception as e:
+            self._error("get", e)
+            return None
+
+    def get_with_ttl(self, key: str):
+        """(payload, seconds left to live) in one round trip; (None, None) if absent, ttl None if it never expires."""
+        try:
+            pipeline = self.client.pipeline(transaction=False)
+            pipeline.get(self.prefix + key)
+            pipeline.pttl(self.prefix + key)
+            payload, ttl_ms = pipeline.execute()
+        except Exception as e:
+            self._error("get", e)
+            return None, None
+        return payload, None if ttl_ms == -1 else max(ttl_ms, 0) / 1000
+
+    def set(self, key: str, payload: bytes, ttl: float):
+        try:
+            self.client.set(self.prefix + key, payload, px=max(int(ttl * 1000), 1))
+        except Exception as e:
+            self._error("set", e)
+
+    def delete(self, cache_name: str, keys: list):
+        try:
+            self.client.delete(*[self.prefix + key for key in keys])
+            self.client.publish(self.channel, json.dumps({"cache": cache_name, "keys": keys}))
+        except Exception as e:
+            self._error("delete", e)
+
+    def incr(self, key: str) -> int:
+        try:
+            return int(self.client.incr(self.prefix + key))
+        except Exception as e:
+            self._error("incr", e)
+            return 0
+
+    def read_int(self, key: str) -> int:
+        value = self.get(key)
+        return int(value) if value is not None else 0
+
+    def start_listener(self, on_invalidate):
+        """Subscribes to the invalidation channel on a daemon thread."""
+        def listen():
+            while True:
+                try:
+                    pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                    pubsub.subscribe(self.channel)
+                    for message in pubsub.listen():
+                        if message.get("type") != "message":
+                            continue
+                        data = json.loads(message["data"])
+                        on_invalidate(data["cache"], data["keys"])
+                except Exception as e:
+                    self._error("subscribe", e)
+                    time.sleep(1)
+        self._listener = threading.Thread(target=listen, name="cache-invalidation-listener", daemon=True)
+        self._listener.start()
+
+    def _error(self, operation: str, error: Exception):
+        # The database stays the source of truth; a cache outage only costs extra queries
+        self.errors += 1
+        logger.warning(f"Cache backend {operation} failed: {error}")
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "errors": self.errors,
+                "listener_alive": bool(self._listener and self._listener.is_alive())}
+
+
+class Cache:
+    """
+    A named cache of one value type. Always keeps an in-process TTLCache; with a shared backend
+    it reads through to it on local misses and writes through to it on set.
+    """
+
+    def __init__(self, name: str, value_type, ttl: float = CACHE_TTL_SECONDS,
+                 maxsize: int = CACHE_MAX_ENTRIES, backend: RedisBackend = None):
+        self.name = name
+        self.ttl = ttl
+        self.local = TTLCache(name, maxsize=maxsize, ttl=ttl)
+        self.backend = backend
+        self.adapter = TypeAdapter(value_type)
+        self.shared_hits = 0
+        self._version = 0
+
+    def _key(self, key) -> str:
+        return f"{self.name}:{key}"
+
+    def get(self, key):
+        """Returns the cached value, or MISSING."""
+        value = self.local.get(key)
+        if value is not MISSING or self.backend is None or not self.local.enabled:
+            return value
+        payload, ttl = self.backend.get_with_ttl(self._key(key))
+        if payload is None:
+            return MISSING
+        value = self.adapter.validate_json(payload)
+        self.shared_hits += 1
+        # The local copy expires with the shared entry, not a full TTL after this read
+        self.local.set(key, value, ttl)
+        return value
+
+    def set(self, key, value):
+        self.local.set(key, value)
+        if self.backend is not None and self.local.enabled:
+            self.backend.set(self._key(key), self.adapter.dump_json(value), self.ttl)
+
+    def invalidate(self, *keys):
+        """Drops keys here and, with a shared backend, in the backend and in every other worker."""
+        if not keys:
+            return
+        self.local.invalidate(*keys)
+        if self.backend is not None:
+            self.backend.delete(self.name, [self._key(key) for key in keys])
+
+    def version(self) -> int:
+        """Generation number mixed into keys of caches that are invalidated as a whole."""
+        if self.backend is not None:
+            return self.backend.read_int(self._key("version"))
+        return self._version
+
+    def bump_version(self):
+        """Invalidates every entry at once by moving to a new generation."""
+        self.local.clear()
+        if self.backend is not None:
+            self.backend.incr(self._key("version"))
+        else:
+            self._version += 1
+
+    def stats(self) -> dict:
+        stats = self.local.stats()
+        # A local miss answered by the shared backend is still a cache hit
+        stats["shared_hits"] = self.shared_hits
+        stats["hits"] += self.shared_hits
+        stats["misses"] -= self.shared_hits
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+def make_key(*parts) -> str:
+    """Stable string key for a tuple of query arguments."""
+    return json.dumps(parts, default=str, separators=(",", ":"))
+
+
+def _create_backend():
+    if CACHE_BACKEND == "local":
+        return None
+    if CACHE_BACKEND == "fake-redis":
+        from fake_redis import FakeRedis
+        return RedisBackend(FakeRedis())
+    if CACHE_BACKEND == "redis":
+        try:
+            import redis
+        except ImportError:
+            print("Error: redis not found. Please install it: pip install redis (or set CACHE_BACKEND=local)")
+            exit()
+        return RedisBackend(redis.Redis.from_url(REDIS_URL))
+    print(f"WARNING: Unknown CACHE_BACKEND '{CACHE_BACKEND}', using 'local'.")
+    return None
+
+
+backend = _create_backend()
+
+# Product fields keyed by product id (the nested inventory is only used to know that one exists)
+product_cache = Cache("products", schemas.Product, backend=backend)
+# schemas.Inventory keyed by product id
+inventory_cache = Cache("inventory", schemas.Inventory, backend=backend)
+# GET /products/ pages as crud.get_products_rows dicts; the version is bumped by product and inventory
+# admin writes, and the nested inventory may otherwise lag sales by up to PAGE_CACHE_TTL_SECONDS
+product_page_cache = Cache("product_pages", List[Dict[str, Any]], ttl=PAGE_CACHE_TTL_SECONDS, backend=backend)
+# Revenue totals and per-period series; TTL-bounded, versioned by rollup rebuilds and product deletes
+revenue_cache = Cache("revenue", float, ttl=REVENUE_CACHE_TTL_SECONDS, backend=backend)
+revenue_series_cache = Cache("revenue_series", List[Tuple[datetime, float]], ttl=REVENUE_CACHE_TTL_SECONDS, backend=backend)
+# Top-N leaderboards over sliding day windows; same staleness rules as the revenue caches
+leaderboard_cache = Cache("leaderboards", schemas.Leaderboard, ttl=REVENUE_CACHE_TTL_SECONDS, backend=backend)
+
+CACHES = {cache.name: cache for cache in (product_cache, inventory_cache, product_page_cache,
+                                          revenue_cache, revenue_series_cache, leaderboard_cache)}
+
+
+def _on_remote_invalidation(cache_name: str, keys: list):
+    cache = CACHES.get(cache_name)
+    if cache is None:
+        return
+    prefix = cache_name + ":"
+    local_keys = [key[len(prefix):] for key in keys if key.startswith(prefix)]
+    # Local keys are ints or strings; try both spellings
+    cache.local.invalidate(*local_keys, *[int(key) for key in local_keys if key.lstrip("-").isdigit()])
+
+
+if backend is not None:
+    backend.start_listener(_on_remote_invalidation)
+
+
+def cache_stats() -> dict:
+    stats = {"backend": backend.stats() if backend is not None else {"backend": "local"}}
+    stats.update({name: cache.stats() for name, cache in CACHES.items()})
+    return stats
@@ -1,240 +1,1198 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func, extract, and_ 
-from datetime import datetime, timedelta
-from typing import Optional 
-
-import models
-import schemas
-
-
-def get_product(db: Session, product_id: int):
-        """Fetches a single product by its ID."""
-       
-        return db.query(models.Product).filter(models.Product.id == product_id).first()
-
-def get_product_by_name(db: Session, name: str):
-        """Fetches a single product by its name."""
-        return db.query(models.Product).filter(func.lower(models.Product.name) == func.lower(name)).first()
-
-def get_products(db: Session, skip: int = 0, limit: int = 100, category: Optional[str] = None):
-        """Fetches a list of products, with pagination and optional category filtering."""
-        query = db.query(models.Product)
-        if category:
-            
-            query = query.filter(func.lower(models.Product.category) == func.lower(category))
-        return query.offset(skip).limit(limit).all()
-
-def create_product(db: Session, product: schemas.ProductCreate):
-        """Creates a new product and its initial inventory record."""
-        
-        existing_product = get_product_by_name(db, product.name)
-        if existing_product:
-            return None 
-
-        db_product = models.Product(
-            name=product.name,
-            description=product.description,
-            category=product.category,
-            price=product.price
-        )
-        db.add(db_product)
-        db.flush() 
-
-        db_inventory = models.Inventory(
-            product_id=db_product.id,
-            quantity=product.initial_quantity,
-            low_stock_threshold=product.low_stock_threshold if product.low_stock_threshold is not None else 10 # Ensure default
-        )
-        db.add(db_inventory)
-
-        db.commit() 
-        db.refresh(db_product) 
-        db.refresh(db_inventory) 
-        db_product.inventory = db_inventory
-        return db_product
-
-
-def update_product(db: Session, product_id: int, product_update: schemas.ProductUpdate):
-        """Updates an existing product's details."""
-        db_product = get_product(db, product_id)
-        if not db_product:
-            return None
-
-        update_data = product_update.model_dump(exclude_unset=True) 
-
-       
-        if "name" in update_data and update_data["name"].lower() != db_product.name.lower():
-            existing_product = get_product_by_name(db, update_data["name"])
-            if existing_product and existing_product.id != product_id:
-                raise ValueError(f"Product name '{update_data['name']}' already exists.")
-
-        for key, value in update_data.items():
-            setattr(db_product, key, value)
-
-        db.add(db_product)
-        db.commit()
-        db.refresh(db_product)
-        return db_product
-
-def delete_product(db: Session, product_id: int):
-        """Deletes a product and its associated inventory and sales records (due to cascade)."""
-        db_product = get_product(db, product_id)
-        if not db_product:
-            return None # Not found
-        db.delete(db_product)
-        db.commit()
-        return db_product
-
-
-def get_inventory(db: Session, product_id: int):
-        """Fetches inventory for a specific product."""
-        return db.query(models.Inventory).filter(models.Inventory.product_id == product_id).first()
-
-def get_all_inventory(db: Session, skip: int = 0, limit: int = 100, low_stock: bool = False):
-        """Fetches all inventory records, with pagination and optional low stock filtering."""
-        query = db.query(models.Inventory)
-        if low_stock:
-            query = query.filter(models.Inventory.quantity <= models.Inventory.low_stock_threshold)
-        return query.offset(skip).limit(limit).all()
-
-def update_inventory(db: Session, product_id: int, inventory_update: schemas.InventoryUpdate):
-        """Updates inventory quantity or threshold for a product."""
-        db_inventory = get_inventory(db, product_id)
-        if not db_inventory:
-            return None 
-
-        update_data = inventory_update.model_dump(exclude_unset=True) 
-
-        updated = False
-        if "quantity" in update_data and update_data["quantity"] is not None:
-            db_inventory.quantity = update_data["quantity"]
-            updated = True
-        if "low_stock_threshold" in update_data and update_data["low_stock_threshold"] is not None:
-            db_inventory.low_stock_threshold = update_data["low_stock_threshold"]
-            updated = True
-
-        if updated:
-            db.add(db_inventory)
-            db.commit()
-            db.refresh(db_inventory)
-
-        return db_inventory
-
-def create_sale(db: Session, sale: schemas.SaleCreate):
-        """Creates a new sale record and updates inventory."""
-        db_product = get_product(db, sale.product_id)
-        if not db_product:
-            raise ValueError(f"Product with id {sale.product_id} not found.")
-
-        db_inventory = db_product.inventory
-        if not db_inventory:
-             db_inventory = get_inventory(db, sale.product_id)
-             if not db_inventory:
-                 raise ValueError(f"CRITICAL: Inventory record for product id {sale.product_id} not found.")
-
-        if db_inventory.quantity < sale.quantity_sold:
-            raise ValueError(f"Insufficient stock for product id {sale.product_id}. Available: {db_inventory.quantity}, Requested: {sale.quantity_sold}")
-
-        current_price = db_product.price
-        total_revenue = sale.quantity_sold * current_price
-
-        db_sale = models.Sale(
-            product_id=sale.product_id,
-            quantity_sold=sale.quantity_sold,
-            sale_price_per_unit=current_price, 
-            total_revenue=total_revenue,
-        )
-
-        db_inventory.quantity -= sale.quantity_sold
-
-        db.add(db_sale)
-        db.add(db_inventory) 
-
-        db.refresh(db_sale)
-        db.refresh(db_inventory)
-
-        return db_sale
-
-
-def get_sales(db: Session, skip: int = 0, limit: int = 100,
-                  start_date: Optional[datetime] = None,
-                  end_date: Optional[datetime] = None,
-                  product_id: Optional[int] = None,
-                  category: Optional[str] = None):
-        """Fetches sales records with filtering and pagination."""
-        query = db.query(models.Sale)
-
-      
-        if category:
-            query = query.join(models.Product).filter(func.lower(models.Product.category) == func.lower(category))
-
-        if product_id:
-            query = query.filter(models.Sale.product_id == product_id)
-        if start_date:
-            query = query.filter(models.Sale.sale_date >= start_date)
-        if end_date:
-            
-             query = query.filter(models.Sale.sale_date <= end_date)
-
-
-        return query.order_by(models.Sale.sale_date.desc()).offset(skip).limit(limit).all()
-
-
-def get_revenue_summary(db: Session, start_date: datetime, end_date: datetime,
-                            product_id: Optional[int] = None,
-                            category: Optional[str] = None):
-        """Calculates total revenue within a date range, optionally filtered."""
-        query = db.query(func.sum(models.Sale.total_revenue).label("total_revenue"))
-
-        query = query.filter(models.Sale.sale_date >= start_date)
-
-        query = query.filter(models.Sale.sale_date <= end_date)
-
-        if product_id:
-            query = query.filter(models.Sale.product_id == product_id)
-
-        if category:
-            query = query.join(models.Product).filter(func.lower(models.Product.category) == func.lower(category))
-
-        result = query.scalar() 
-        return result if result is not None else 0.0 
-
-
-def get_revenue_by_period(db: Session, period: str, start_date: datetime, end_date: datetime):
-        """
-        Calculates revenue grouped by a specific period (day, week, month, year).
-        Returns a list of tuples: (period_start_date, revenue)
-        Note: Date truncation functions can be database-specific. These examples lean towards MySQL.
-        """
-        if period not in ['day', 'week', 'month', 'year']:
-            raise ValueError("Invalid period specified. Use 'day', 'week', 'month', or 'year'.")
-
-       
-        if period == 'day':
-            date_trunc_func = func.date(models.Sale.sale_date)
-        elif period == 'week':
-            date_trunc_func = func.date(func.subdate(models.Sale.sale_date, func.dayofweek(models.Sale.sale_date) - 1))
-        elif period == 'month':
-            date_trunc_func = func.date(func.subdate(models.Sale.sale_date, func.dayofmonth(models.Sale.sale_date) - 1))
-        elif period == 'year':
-            date_trunc_func = func.date(func.subdate(models.Sale.sale_date, func.dayofyear(models.Sale.sale_date) - 1))
-        else: 
-             raise ValueError("Invalid period")
-
-
-        query = db.query(
-            date_trunc_func.label("period_start"),
-            func.sum(models.Sale.total_revenue).label("revenue")
-        ).filter(
-            models.Sale.sale_date >= start_date,
-            models.Sale.sale_date <= end_date
-        ).group_by(
-            "period_start" 
-        ).order_by(
-            "period_start" 
-        )
-
-        results = query.all()
-        return [(datetime.combine(r.period_start, datetime.min.time()), r.revenue) for r in results]
-
-    
\ No newline at end of file
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, extract, and_, or_, insert, delete, select, update, case, true, literal, union_all
+from datetime import datetime, date, time, timedelta, timezone
+from typing import Optional, List, Tuple
+import base64
+import heapq
+import json
+import numpy as np
+
+import analytics
+import cache
+import low_stock
+import models
+import schemas
+
+
+def encode_cursor(*values) -> str:
+        """Encodes the sort key of the last row of a page into an opaque keyset cursor."""
+        raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> list:
+        """Decodes a cursor produced by encode_cursor. Raises ValueError if it is malformed."""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except Exception:
+            raise ValueError("Invalid pagination cursor.")
+        if not isinstance(values, list) or not values:
+            raise ValueError("Invalid pagination cursor.")
+        return values
+
+def _decode_id_cursor(cursor: str) -> int:
+        """Decodes a cursor whose sort key is a single integer id."""
+        values = decode_cursor(cursor)
+        if len(values) != 1 or not isinstance(values[0], int):
+            raise ValueError("Invalid pagination cursor.")
+        return values[0]
+
+
+def _product_query(db: Session):
+        """Base query for product reads. Eager-loads the one-to-one inventory with a
+        LEFT OUTER JOIN so serializing schemas.Product never lazy-loads per row."""
+        return db.query(models.Product).options(joinedload(models.Product.inventory))
+
+def get_product(db: Session, product_id: int):
+        """Fetches a single product by its ID."""
+       
+        return _product_query(db).filter(models.Product.id == product_id).first()
+
+def cache_product(db_product) -> schemas.Product:
+        """Stores a product (ORM or schemas.Product) in the product cache, and its inventory in the inventory cache."""
+        product = schemas.Product.model_validate(db_product)
+        cache.product_cache.set(product.id, product)
+        if product.inventory is not None:
+            cache.inventory_cache.set(product.id, product.inventory)
+        return product
+
+def get_product_cached(db: Session, product_id: int) -> Optional[schemas.Product]:
+        """
+        Fetches a product as a schemas.Product through the in-process cache.
+        The nested inventory is a snapshot from when the entry was loaded (it tells whether a record
+        exists); use get_inventory_cached or get_product_view for current stock.
+        """
+        cached = cache.product_cache.get(product_id)
+        if cached is not cache.MISSING:
+            return cached
+        db_product = get_product(db, product_id)
+        return cache_product(db_product) if db_product is not None else None
+
+def get_inventory_cached(db: Session, product_id: int) -> Optional[schemas.Inventory]:
+        """Fetches a product's inventory as a schemas.Inventory through the in-process cache."""
+        cached = cache.inventory_cache.get(product_id)
+        if cached is not cache.MISSING:
+            return cached
+        db_inventory = get_inventory(db, product_id)
+        if db_inventory is None:
+            return None
+        inventory = schemas.Inventory.model_validate(db_inventory)
+        cache.inventory_cache.set(product_id, inventory)
+        return inventory
+
+def get_product_view(db: Session, product_id: int) -> Optional[schemas.Product]:
+        """Product with its current inventory, served from the caches when possible."""
+        product = get_product_cached(db, product_id)
+        if product is None or product.inventory is None:
+            return product
+        return product.model_copy(update={"inventory": get_inventory_cached(db, product_id)})
+
+def get_product_by_name(db: Session, name: str):
+        """Fetches a single product by its name."""
+        return _product_query(db).filter(models.Product.name_norm == models.normalize_lookup(name)).first()
+
+def _page_products(query, skip: int, limit: int, category: Optional[str], cursor: Optional[str]):
+        """Applies the product list filter, order and pagination to a query over products."""
+        if category:
+            query = query.filter(models.Product.category_norm == _normalize_category(category))
+        query = query.order_by(models.Product.id)
+        if cursor:
+            last_id = _decode_id_cursor(cursor)
+            return query.filter(models.Product.id > last_id).limit(limit)
+        return query.offset(skip).limit(limit)
+
+# Columns of the list endpoints' rows, in schemas.Product / schemas.Inventory / schemas.Sale field order
+PRODUCT_LIST_COLUMNS = (models.Product.name, models.Product.description, models.Product.category, models.Product.price,
+                        models.Product.id, models.Product.created_at, models.Product.updated_at)
+INVENTORY_LIST_COLUMNS = (models.Inventory.quantity, models.Inventory.low_stock_threshold, models.Inventory.id,
+                          models.Inventory.product_id, models.Inventory.is_low_stock, models.Inventory.last_updated)
+SALE_LIST_COLUMNS = (models.Sale.product_id, models.Sale.quantity_sold, models.Sale.id,
+                     models.Sale.sale_price_per_unit, models.Sale.total_revenue, models.Sale.sale_date)
+
+def _row_dicts(query, columns) -> List[dict]:
+        fields = [column.key for column in columns]
+        return [dict(zip(fields, row)) for row in query.all()]
+
+def get_products_rows(db: Session, skip: int = 0, limit: int = 100, category: Optional[str] = None,
+                      cursor: Optional[str] = None) -> List[dict]:
+        """
+        Fetches a list of products, with pagination and optional category filtering, as plain dicts
+        shaped like schemas.Product (inventory nested, or None). Read as column tuples with one
+        LEFT OUTER JOIN instead of ORM entities.
+        If a cursor is given, seeks past the last id of the previous page instead of using skip.
+        """
+        query = db.query(*PRODUCT_LIST_COLUMNS, *INVENTORY_LIST_COLUMNS).outerjoin(
+            models.Inventory, models.Inventory.product_id == models.Product.id)
+        product_fields = [column.key for column in PRODUCT_LIST_COLUMNS]
+        inventory_fields = [column.key for column in INVENTORY_LIST_COLUMNS]
+        split = len(product_fields)
+        page = []
+        for row in _page_products(query, skip, limit, category, cursor).all():
+            product = dict(zip(product_fields, row[:split]))
+            inventory = row[split:]
+            # The outer join leaves the inventory columns NULL, its id included, for a product without one
+            product["inventory"] = dict(zip(inventory_fields, inventory)) if inventory[2] is not None else None
+            page.append(product)
+        return page
+
+def products_page_key(skip: int, limit: int, category: Optional[str], cursor: Optional[str]) -> str:
+        return cache.make_key(cache.product_page_cache.version(), skip, limit,
+                              category.lower() if category else None, cursor)
+
+def get_products_page_cached(db: Session, skip: int = 0, limit: int = 100, category: Optional[str] = None,
+                             cursor: Optional[str] = None) -> List[dict]:
+        """get_products_rows through the product page cache."""
+        key = products_page_key(skip, limit, category, cursor)
+        cached = cache.product_page_cache.get(key)
+        if cached is not cache.MISSING:
+            return cached
+        page = get_products_rows(db, skip=skip, limit=limit, category=category, cursor=cursor)
+        cache.product_page_cache.set(key, page)
+        return page
+
+def create_product(db: Session, product: schemas.ProductCreate):
+        """Creates a new product and its initial inventory record."""
+        
+        existing_product = get_product_by_name(db, product.name)
+        if existing_product:
+            return None 
+
+        db_product = models.Product(
+            name=product.name,
+            description=product.description,
+            category=product.category,
+            price=product.price
+        )
+        db.add(db_product)
+        db.flush() 
+
+        threshold = product.low_stock_threshold if product.low_stock_threshold is not None else 10 # Ensure default
+        db_inventory = models.Inventory(
+            product_id=db_product.id,
+            quantity=product.initial_quantity,
+            low_stock_threshold=threshold,
+            is_low_stock=product.initial_quantity <= threshold
+        )
+        db.add(db_inventory)
+
+        db.commit() 
+        if db_inventory.is_low_stock:
+            low_stock.notifier.publish([_low_stock_event(db_product.id, product.initial_quantity, threshold, True)])
+        cache.product_cache.invalidate(db_product.id)
+        cache.inventory_cache.invalidate(db_product.id)
+        cache.product_page_cache.bump_version()
+        db.refresh(db_product) 
+        db.refresh(db_inventory) 
+        db_product.inventory = db_inventory
+        return db_product
+
+
+def update_product(db: Session, product_id: int, product_update: schemas.ProductUpdate):
+        """Updates an existing product's details."""
+        db_product = get_product(db, product_id)
+        if not db_product:
+            return None
+
+        update_data = product_update.model_dump(exclude_unset=True) 
+
+       
+        if "name" in update_data and update_data["name"].lower() != db_product.name.lower():
+            existing_product = get_product_by_name(db, update_data["name"])
+            if existing_product and existing_product.id != product_id:
+                raise ValueError(f"Product name '{update_data['name']}' already exists.")
+
+        for key, value in update_data.items():
+            setattr(db_product, key, value)
+
+        db.add(db_product)
+        db.commit()
+        cache.product_cache.invalidate(product_id)
+        cache.product_page_cache.bump_version()
+        db.refresh(db_product)
+        return db_product
+
+def delete_product(db: Session, product_id: int):
+        """Deletes a product and its associated inventory and sales records (due to cascade)."""
+        db_product = get_product(db, product_id)
+        if not db_product:
+            return None # Not found
+        db.execute(delete(models.DailyRevenue).where(models.DailyRevenue.product_id == product_id))
+        db.delete(db_product)
+        db.commit()
+        cache.product_cache.invalidate(product_id)
+        cache.inventory_cache.invalidate(product_id)
+        cache.product_page_cache.bump_version()
+        cache.revenue_cache.bump_version()
+        cache.revenue_series_cache.bump_version()
+        cache.leaderboard_cache.bump_version()
+        return db_product
+
+
+def get_inventory(db: Session, product_id: int):
+        """Fetches inventory for a specific product."""
+        return db.query(models.Inventory).filter(models.Inventory.product_id == product_id).first()
+
+def get_all_inventory_rows(db: Session, skip: int = 0, limit: int = 100, low_stock: bool = False,
+                           cursor: Optional[str] = None) -> List[dict]:
+        """
+        Fetches all inventory records, with pagination and optional low stock filtering, as plain dicts
+        shaped like schemas.Inventory (read as column tuples).
+        If a cursor is given, seeks past the last id of the previous page instead of using skip.
+        """
+        query = _page_inventory(db.query(*INVENTORY_LIST_COLUMNS), skip, limit, low_stock, cursor)
+        return _row_dicts(query, INVENTORY_LIST_COLUMNS)
+
+def _page_inventory(query, skip: int, limit: int, low_stock: bool, cursor: Optional[str]):
+        if low_stock:
+            query = query.filter(models.Inventory.is_low_stock == true()) # Materialized flag, served by ix_inventory_low_stock_id
+        query = query.order_by(models.Inventory.id)
+        if cursor:
+            last_id = _decode_id_cursor(cursor)
+            return query.filter(models.Inventory.id > last_id).limit(limit)
+        return query.offset(skip).limit(limit)
+
+def update_inventory(db: Session, product_id: int, inventory_update: schemas.InventoryUpdate):
+        """Updates inventory quantity or threshold for a product."""
+        db_inventory = get_inventory(db, product_id)
+        if not db_inventory:
+            return None 
+
+        update_data = inventory_update.model_dump(exclude_unset=True) 
+
+        updated = False
+        if "quantity" in update_data and update_data["quantity"] is not None:
+            db_inventory.quantity = update_data["quantity"]
+            updated = True
+        if "low_stock_threshold" in update_data and update_data["low_stock_threshold"] is not None:
+            db_inventory.low_stock_threshold = update_data["low_stock_threshold"]
+            updated = True
+
+        if updated:
+            db.add(db_inventory)
+            try:
+                db.flush()
+                events = _sync_low_stock(db, [product_id])
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            low_stock.notifier.publish(events)
+            cache.inventory_cache.invalidate(product_id)
+            cache.product_page_cache.bump_version()
+            db.refresh(db_inventory)
+
+        return db_inventory
+
+def _lock_inventory(db: Session, product_ids):
+        """
+        Write-locks the inventory rows that the caller is about to read WITH FOR UPDATE and update, on
+        backends that ignore FOR UPDATE. SQLite takes one database-wide write lock on a transaction's first
+        write, so starting with a no-op UPDATE makes concurrent read-check-write transactions run one at a
+        time there instead of both passing the stock check.
+        """
+        if db.get_bind().dialect.name == "sqlite" and product_ids:
+            inventory_table = models.Inventory.__table__
+            db.execute(update(inventory_table).where(inventory_table.c.product_id.in_(product_ids))
+                       .values(quantity=inventory_table.c.quantity))
+
+def adjust_inventory_bulk(db: Session, adjustments: List[schemas.InventoryAdjustment]):
+        """
+        Applies absolute (quantity) or relative (delta) stock adjustments and threshold changes to many
+        products in one transaction.
+        The affected inventory rows are locked once (SELECT ... FOR UPDATE), items are applied in request
+        order to the running values (so several items may target the same product), and the final values
+        are written with one UPDATE ... CASE per chunk of products.
+        Returns [schemas.InventoryAdjustmentResult, ...] in request order; rejected items change nothing.
+        """
+        inventory_table = models.Inventory.__table__
+        product_ids = {item.product_id for item in adjustments}
+        try:
+            _lock_inventory(db, product_ids)
+            rows = db.execute(
+                select(inventory_table.c.product_id, inventory_table.c.quantity,
+                       inventory_table.c.low_stock_threshold, inventory_table.c.is_low_stock)
+                .where(inventory_table.c.product_id.in_(product_ids))
+                .with_for_update()
+            ).all() if product_ids else []
+            original = {row.product_id: row for row in rows}
+            current = {row.product_id: [row.quantity, row.low_stock_threshold] for row in rows}
+
+            results, changed = [], set()
+            for index, item in enumerate(adjustments):
+                def reject(detail: str):
+                    results.append(schemas.InventoryAdjustmentResult(
+                        index=index, product_id=item.product_id, accepted=False, detail=detail))
+
+                if item.product_id not in current:
+                    reject(f"Inventory for product id {item.product_id} not found.")
+                    continue
+                if item.quantity is not None and item.delta is not None:
+                    reject("Provide either quantity or delta, not both.")
+                    continue
+                if item.quantity is None and item.delta is None and item.low_stock_threshold is None:
+                    reject("No adjustment provided.")
+                    continue
+
+                quantity, threshold = current[item.product_id]
+                if item.quantity is not None:
+                    quantity = item.quantity
+                elif item.delta is not None:
+                    quantity += item.delta
+                if quantity < 0:
+                    reject(f"Adjustment would make stock negative for product id {item.product_id}. Available: {current[item.product_id][0]}, Delta: {item.delta}")
+                    continue
+                if item.low_stock_threshold is not None:
+                    threshold = item.low_stock_threshold
+
+                current[item.product_id] = [quantity, threshold]
+                changed.add(item.product_id)
+                results.append(schemas.InventoryAdjustmentResult(
+                    index=index, product_id=item.product_id, accepted=True,
+                    quantity=quantity, low_stock_threshold=threshold, is_low_stock=quantity <= threshold))
+
+            changed = sorted(pid for pid in changed if tuple(current[pid]) != (original[pid].quantity, original[pid].low_stock_threshold)
+                             or bool(original[pid].is_low_stock) != (current[pid][0] <= current[pid][1]))
+            for start in range(0, len(changed), BULK_INSERT_CHUNK_SIZE):
+                chunk = changed[start:start + BULK_INSERT_CHUNK_SIZE]
+                key = inventory_table.c.product_id
+                db.execute(update(inventory_table).where(key.in_(chunk)).values(
+                    quantity=case({pid: current[pid][0] for pid in chunk}, value=key),
+                    low_stock_threshold=case({pid: current[pid][1] for pid in chunk}, value=key),
+                    is_low_stock=case({pid: current[pid][0] <= current[pid][1] for pid in chunk}, value=key),
+                ))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        low_stock.notifier.publish([
+            _low_stock_event(pid, current[pid][0], current[pid][1], current[pid][0] <= current[pid][1])
+            for pid in changed if bool(original[pid].is_low_stock) != (current[pid][0] <= current[pid][1])
+        ])
+        if changed:
+            cache.inventory_cache.invalidate(*changed)
+            cache.product_page_cache.bump_version()
+        return results
+
+def _low_stock_event(product_id: int, quantity: int, threshold: int, is_low: bool) -> schemas.LowStockEvent:
+        return schemas.LowStockEvent(product_id=product_id, quantity=quantity, low_stock_threshold=threshold,
+                                     is_low_stock=is_low, at=datetime.now())
+
+def _flag_low_stock(db: Session, rows) -> List[schemas.LowStockEvent]:
+        """
+        Flips inventory.is_low_stock for rows of (product_id, quantity, low_stock_threshold, is_low_stock)
+        whose flag no longer matches their current quantity and threshold, in the caller's transaction.
+        Returns the threshold crossings, to be published once the transaction commits.
+        """
+        events = [_low_stock_event(pid, quantity, threshold, quantity <= threshold)
+                  for pid, quantity, threshold, is_low in rows if (quantity <= threshold) != bool(is_low)]
+        inventory_table = models.Inventory.__table__
+        for is_low in (True, False):
+            ids = [event.product_id for event in events if event.is_low_stock == is_low]
+            if ids:
+                db.execute(update(inventory_table).where(inventory_table.c.product_id.in_(ids))
+                           .values(is_low_stock=is_low))
+        return events
+
+def _sync_low_stock(db: Session, product_ids) -> List[schemas.LowStockEvent]:
+        """Re-derives is_low_stock for the given products after their quantity or threshold changed."""
+        inventory_table = models.Inventory.__table__
+        rows = db.execute(select(inventory_table.c.product_id, inventory_table.c.quantity,
+                                 inventory_table.c.low_stock_threshold, inventory_table.c.is_low_stock)
+                          .where(inventory_table.c.product_id.in_(product_ids))).all()
+        return _flag_low_stock(db, rows)
+
+
+def database_now(db: Session) -> datetime:
+        """
+        Current time on the database clock, which every sale path stores explicitly in sales.sale_date.
+        Relying on the column's server default would mix formats on SQLite: CURRENT_TIMESTAMP is stored
+        as 'YYYY-MM-DD HH:MM:SS' but bound datetimes with microseconds, and SQLite compares them as
+        strings, so range filters and the (sale_date, id) cursor would misorder equal timestamps.
+        """
+        return db.execute(select(func.now())).scalar()
+
+
+class InsufficientStockError(ValueError):
+        """Raised when a sale asks for more units than are in stock."""
+
+
+def create_sale(db: Session, sale: schemas.SaleCreate):
+        """
+        Creates a new sale record, updates inventory and the daily revenue rollup in one transaction.
+        Stock is decremented with a conditional UPDATE (quantity >= requested), so concurrent sales
+        can never oversell; a sale that loses the race raises InsufficientStockError.
+        The product cache only answers whether the product and its inventory exist; the price and category
+        are read from the database in the sale's transaction, with the stock left, as the bulk path does.
+        """
+        check_sale_product(get_product_cached(db, sale.product_id), sale)
+        db_sale, events = record_sale(db, sale)
+        publish_sale(sale, events)
+        db.refresh(db_sale)
+        return db_sale
+
+def check_sale_product(product: Optional[schemas.Product], sale: schemas.SaleCreate):
+        """Raises ValueError unless the (cached) product exists and has an inventory record."""
+        if not product:
+            raise ValueError(f"Product with id {sale.product_id} not found.")
+
+        if not product.inventory:
+            raise ValueError(f"CRITICAL: Inventory record for product id {sale.product_id} not found.")
+
+def record_sale(db: Session, sale: schemas.SaleCreate):
+        """
+        The database part of create_sale: commits the sale and returns (db_sale, low-stock events) without
+        touching the caches or the notifier, so crud_async can run it in its greenlet and those outside.
+        """
+        inventory_table = models.Inventory.__table__
+        try:
+            decremented = db.execute(
+                update(inventory_table)
+                .where(inventory_table.c.product_id == sale.product_id,
+                       inventory_table.c.quantity >= sale.quantity_sold)
+                .values(quantity=inventory_table.c.quantity - sale.quantity_sold)
+            )
+            if decremented.rowcount == 0:
+                raise InsufficientStockError(f"Insufficient stock for product id {sale.product_id}. Requested: {sale.quantity_sold}")
+            # The inventory row is now locked by the UPDATE; read the price, category and stock left in one go
+            product = db.execute(
+                select(models.Product.price, models.Product.category, inventory_table.c.quantity,
+                       inventory_table.c.low_stock_threshold, inventory_table.c.is_low_stock)
+                .join(inventory_table, inventory_table.c.product_id == models.Product.id)
+                .where(models.Product.id == sale.product_id)
+            ).one()
+            # Sales only lower stock, so the flag can only turn on; the common case writes nothing
+            events = _flag_low_stock(db, [(sale.product_id, product.quantity, product.low_stock_threshold, product.is_low_stock)])
+
+            total_revenue = sale.quantity_sold * product.price
+            db_sale = models.Sale(
+                product_id=sale.product_id,
+                quantity_sold=sale.quantity_sold,
+                sale_price_per_unit=product.price,
+                total_revenue=total_revenue,
+                sale_date=database_now(db),
+                category=_normalize_category(product.category),
+            )
+            db.add(db_sale)
+            db.flush()
+            _add_to_daily_revenue(db, db_sale.sale_date.date(), sale.product_id, product.category,
+                                  total_revenue, sale.quantity_sold)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return db_sale, events
+
+def publish_sale(sale: schemas.SaleCreate, events: List[schemas.LowStockEvent]):
+        """After a sale commits: low-stock events out, the product's cached stock dropped."""
+        low_stock.notifier.publish(events)
+        cache.inventory_cache.invalidate(sale.product_id)
+
+
+BULK_INSERT_CHUNK_SIZE = 1000
+
+def create_sales_bulk(db: Session, sales: List[schemas.SaleCreate]):
+        """
+        Records a batch of sales in one transaction.
+        Inventory rows of all referenced products are locked once (SELECT ... FOR UPDATE), stock is checked
+        line by line in request order against the running remainder, accepted lines are inserted with
+        multi-row INSERTs and inventory is decremented with a single grouped UPDATE.
+        Returns (sale_date, [schemas.SaleBulkLineResult, ...]) in request order.
+        """
+        product_ids = {line.product_id for line in sales}
+        try:
+            _lock_inventory(db, product_ids)
+            rows = db.execute(
+                select(models.Product.id, models.Product.price, models.Product.category, models.Inventory.quantity,
+                       models.Inventory.low_stock_threshold, models.Inventory.is_low_stock)
+                .join(models.Inventory, models.Inventory.product_id == models.Product.id)
+                .where(models.Product.id.in_(product_ids))
+                .with_for_update(of=models.Inventory)
+            ).all() if product_ids else []
+            products = {row.id: row for row in rows}
+            remaining = {row.id: row.quantity for row in rows}
+
+            sale_date = database_now(db)
+            results, sale_rows, sold, events = [], [], {}, []
+            for index, line in enumerate(sales):
+                product = products.get(line.product_id)
+                if product is None:
+                    results.append(schemas.SaleBulkLineResult(
+                        index=index, product_id=line.product_id, quantity_sold=line.quantity_sold, accepted=False,
+                        detail=f"Product with id {line.product_id} not found."))
+                    continue
+                if remaining[line.product_id] < line.quantity_sold:
+                    results.append(schemas.SaleBulkLineResult(
+                        index=index, product_id=line.product_id, quantity_sold=line.quantity_sold, accepted=False,
+                        detail=f"Insufficient stock for product id {line.product_id}. Available: {remaining[line.product_id]}, Requested: {line.quantity_sold}"))
+                    continue
+
+                remaining[line.product_id] -= line.quantity_sold
+                total_revenue = line.quantity_sold * product.price
+                revenue, quantity, count = sold.get(line.product_id, (0.0, 0, 0))
+                sold[line.product_id] = (revenue + total_revenue, quantity + line.quantity_sold, count + 1)
+                sale_rows.append(dict(product_id=line.product_id, quantity_sold=line.quantity_sold,
+                                      sale_price_per_unit=product.price, total_revenue=total_revenue,
+                                      sale_date=sale_date, category=_normalize_category(product.category)))
+                results.append(schemas.SaleBulkLineResult(
+                    index=index, product_id=line.product_id, quantity_sold=line.quantity_sold, accepted=True,
+                    sale_price_per_unit=product.price, total_revenue=total_revenue))
+
+            if sale_rows:
+                sales_table = models.Sale.__table__
+                for start in range(0, len(sale_rows), BULK_INSERT_CHUNK_SIZE):
+                    db.execute(insert(sales_table).values(sale_rows[start:start + BULK_INSERT_CHUNK_SIZE]))
+
+                inventory_table = models.Inventory.__table__
+                decrement = case({pid: totals[1] for pid, totals in sold.items()}, value=inventory_table.c.product_id)
+                db.execute(update(inventory_table)
+                           .where(inventory_table.c.product_id.in_(sold.keys()))
+                           .values(quantity=inventory_table.c.quantity - decrement))
+
+                events = _flag_low_stock(db, [(pid, remaining[pid], products[pid].low_stock_threshold, products[pid].is_low_stock)
+                                              for pid in sold])
+
+                for pid, (revenue, quantity, count) in sold.items():
+                    _add_to_daily_revenue(db, sale_date.date(), pid, products[pid].category, revenue, quantity, count)
+
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        low_stock.notifier.publish(events)
+        cache.inventory_cache.invalidate(*sold.keys())
+        return sale_date, results
+
+
+def apply_buffered_sales(db: Session, wal_name: str, sales: List[schemas.BufferedSale]):
+        """
+        Commits write-behind sales (sale_buffer) in one transaction, in sequence order, together with
+        the highest applied sequence number of their log in sales_wal_checkpoints; sales at or below the
+        checkpoint are skipped, so replaying a log after a crash never records a sale twice.
+        Stock is re-checked against the locked inventory rows, and a sale it no longer covers is
+        rejected rather than overselling.
+        Returns (applied, rejected, {product_id: (quantity after commit, price, category_norm)}), the
+        products' current price and category read under the same locks, for the buffer's next sales.
+        """
+        try:
+            checkpoint = db.execute(select(models.SalesWalCheckpoint)
+                                    .where(models.SalesWalCheckpoint.name == wal_name)
+                                    .with_for_update()).scalar_one_or_none()
+            applied_sequence = checkpoint.applied_sequence if checkpoint else 0
+            sales = [sale for sale in sales if sale.sequence > applied_sequence]
+            if not sales:
+                db.rollback()
+                return [], [], {}
+
+            inventory_table = models.Inventory.__table__
+            product_ids = {sale.product_id for sale in sales}
+            _lock_inventory(db, product_ids)
+            rows = db.execute(
+                select(inventory_table.c.product_id, inventory_table.c.quantity,
+                       inventory_table.c.low_stock_threshold, inventory_table.c.is_low_stock,
+                       models.Product.price, models.Product.category_norm)
+                .join(models.Product, models.Product.id == inventory_table.c.product_id)
+                .where(inventory_table.c.product_id.in_(product_ids))
+                .with_for_update(of=inventory_table)
+            ).all()
+            inventory = {row.product_id: row for row in rows}
+            remaining = {row.product_id: row.quantity for row in rows}
+
+            applied, rejected, sold, rollup = [], [], {}, {}
+            for sale in sales:
+                if remaining.get(sale.product_id, 0) < sale.quantity_sold:
+                    rejected.append(sale)
+                    continue
+                remaining[sale.product_id] -= sale.quantity_sold
+                applied.append(sale)
+                sold[sale.product_id] = sold.get(sale.product_id, 0) + sale.quantity_sold
+                key = (sale.sale_date.date(), sale.product_id, sale.category)
+                revenue, quantity, count = rollup.get(key, (0.0, 0, 0))
+                rollup[key] = (revenue + sale.total_revenue, quantity + sale.quantity_sold, count + 1)
+
+            events = []
+            if applied:
+                sale_rows = [dict(product_id=sale.product_id, quantity_sold=sale.quantity_sold,
+                                  sale_price_per_unit=sale.sale_price_per_unit, total_revenue=sale.total_revenue,
+                                  sale_date=sale.sale_date, category=sale.category) for sale in applied]
+                sales_table = models.Sale.__table__
+                for start in range(0, len(sale_rows), BULK_INSERT_CHUNK_SIZE):
+                    db.execute(insert(sales_table).values(sale_rows[start:start + BULK_INSERT_CHUNK_SIZE]))
+
+                decrement = case(sold, value=inventory_table.c.product_id)
+                db.execute(update(inventory_table)
+                           .where(inventory_table.c.product_id.in_(sold.keys()))
+                           .values(quantity=inventory_table.c.quantity - decrement))
+
+                events = _flag_low_stock(db, [(pid, remaining[pid], inventory[pid].low_stock_threshold, inventory[pid].is_low_stock)
+                                              for pid in sold])
+                for (day, pid, category), (revenue, quantity, count) in rollup.items():
+                    _add_to_daily_revenue(db, day, pid, category, revenue, quantity, count)
+
+            if checkpoint is None:
+                db.add(models.SalesWalCheckpoint(name=wal_name, applied_sequence=sales[-1].sequence))
+            else:
+                checkpoint.applied_sequence = sales[-1].sequence
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        low_stock.notifier.publish(events)
+        cache.inventory_cache.invalidate(*sold.keys())
+        return applied, rejected, {pid: (remaining[pid], inventory[pid].price, inventory[pid].category_norm)
+                                   for pid in remaining}
+
+
+def _filter_sales(query, start_date: Optional[datetime], end_date: Optional[datetime],
+                  product_id: Optional[int], category: Optional[str]):
+        """Applies the sales list filters to an ORM Query or a select() over Sale."""
+        if category:
+            query = query.filter(models.Sale.category == _normalize_category(category))
+
+        if product_id:
+            query = query.filter(models.Sale.product_id == product_id)
+        if start_date:
+            query = query.filter(models.Sale.sale_date >= start_date)
+        if end_date:
+             query = query.filter(models.Sale.sale_date <= end_date)
+        return query
+
+
+def get_sales_rows(db: Session, skip: int = 0, limit: int = 100,
+                   start_date: Optional[datetime] = None,
+                   end_date: Optional[datetime] = None,
+                   product_id: Optional[int] = None,
+                   category: Optional[str] = None,
+                   cursor: Optional[str] = None) -> List[dict]:
+        """
+        Fetches sales records with filtering and pagination, newest first, as plain dicts shaped like
+        schemas.Sale (read as column tuples).
+        If a cursor is given, seeks on (sale_date, id) past the last row of the previous page
+        instead of using skip, so deep pages cost the same as the first one.
+        """
+        query = _page_sales(db.query(*SALE_LIST_COLUMNS), skip, limit, start_date, end_date, product_id, category, cursor)
+        return _row_dicts(query, SALE_LIST_COLUMNS)
+
+def _page_sales(query, skip: int, limit: int, start_date: Optional[datetime], end_date: Optional[datetime],
+                product_id: Optional[int], category: Optional[str], cursor: Optional[str]):
+        query = _filter_sales(query, start_date, end_date, product_id, category)
+        query = query.order_by(models.Sale.sale_date.desc(), models.Sale.id.desc())
+        if cursor:
+            values = decode_cursor(cursor)
+            if len(values) != 2:
+                raise ValueError("Invalid pagination cursor.")
+            try:
+                last_date, last_id = datetime.fromisoformat(values[0]), int(values[1])
+            except (TypeError, ValueError):
+                raise ValueError("Invalid pagination cursor.")
+            # Expanded form of (sale_date, id) < (last_date, last_id); the leading
+            # sale_date <= bound lets MySQL use a range scan on ix_sales_sale_date
+            # (or ix_sale_product_date_revenue when filtering by product).
+            query = query.filter(
+                models.Sale.sale_date <= last_date,
+                or_(models.Sale.sale_date < last_date, models.Sale.id < last_id)
+            )
+            return query.limit(limit)
+        return query.offset(skip).limit(limit)
+
+
+def _normalize_category(category: Optional[str]) -> str:
+        """Key used for categories in the daily_revenue rollup (same as products.category_norm)."""
+        return models.normalize_lookup(category)
+
+def _add_to_daily_revenue(db: Session, day: date, product_id: int, category: Optional[str],
+                          revenue: float, quantity: int, count: int = 1):
+        """
+        Adds sales to the (day, product_id, category) rollup row inside the caller's transaction.
+        Uses a native upsert on MySQL/SQLite, otherwise update-then-insert.
+        """
+        table = models.DailyRevenue.__table__
+        values = dict(day=day, product_id=product_id, category=_normalize_category(category),
+                      total_revenue=revenue, quantity_sold=quantity, sale_count=count)
+        increments = dict(total_revenue=table.c.total_revenue + revenue,
+                          quantity_sold=table.c.quantity_sold + quantity,
+                          sale_count=table.c.sale_count + count)
+        dialect = db.get_bind().dialect.name
+        if dialect == "mysql":
+            from sqlalchemy.dialects.mysql import insert as mysql_insert
+            db.execute(mysql_insert(table).values(**values).on_duplicate_key_update(**increments))
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+            db.execute(sqlite_insert(table).values(**values).on_conflict_do_update(
+                index_elements=["day", "product_id", "category"], set_=increments))
+        else:
+            result = db.execute(table.update().where(
+                table.c.day == values["day"],
+                table.c.product_id == product_id,
+                table.c.category == values["category"]
+            ).values(**increments))
+            if result.rowcount == 0:
+                db.execute(insert(table).values(**values))
+
+def rebuild_daily_revenue(db: Session, start_date: Optional[date] = None, end_date: Optional[date] = None):
+        """
+        Backfills the daily_revenue rollup from raw sales for the given day range (all history by default).
+        Existing rollup rows in the range are replaced. Returns the number of rollup rows written.
+        Months whose sales were archived (sales_archive) are skipped, so their rollup rows are kept.
+        """
+        archived_through = db.query(func.max(models.SalesArchive.month)).scalar()
+        if archived_through:
+            first_live_day = (archived_through.replace(day=28) + timedelta(days=4)).replace(day=1)
+            start_date = max(start_date or first_live_day, first_live_day)
+            if end_date and end_date < start_date:
+                return 0
+        table = models.DailyRevenue.__table__
+        sale_day = func.date(models.Sale.sale_date)
+
+        clear = delete(table)
+        if start_date:
+            clear = clear.where(table.c.day >= start_date)
+        if end_date:
+            clear = clear.where(table.c.day <= end_date)
+
+        source = db.query(
+            sale_day.label("day"),
+            models.Sale.product_id,
+            models.Sale.category,
+            func.sum(models.Sale.total_revenue),
+            func.sum(models.Sale.quantity_sold),
+            func.count(models.Sale.id)
+        )
+        if start_date:
+            source = source.filter(models.Sale.sale_date >= datetime.combine(start_date, time.min))
+        if end_date:
+            source = source.filter(models.Sale.sale_date < datetime.combine(end_date + timedelta(days=1), time.min))
+        source = source.group_by(sale_day, models.Sale.product_id, models.Sale.category)
+
+        try:
+            db.execute(clear)
+            result = db.execute(insert(table).from_select(
+                ["day", "product_id", "category", "total_revenue", "quantity_sold", "sale_count"],
+                source.statement
+            ))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        cache.revenue_cache.bump_version()
+        cache.revenue_series_cache.bump_version()
+        cache.leaderboard_cache.bump_version()
+        return result.rowcount
+
+
+SALE_CATEGORY_BACKFILL_BATCH_SIZE = 10000
+
+def backfill_sale_categories(db: Session, batch_size: int = SALE_CATEGORY_BACKFILL_BATCH_SIZE):
+        """
+        Fills sales.category for rows written before the column existed, from the product's current
+        category_norm (the best snapshot available for them). Walks the primary key in batch_size ranges,
+        committing each, so it can run on a live table. Returns the number of sales updated.
+        """
+        sales_table = models.Sale.__table__
+        products_table = models.Product.__table__
+        last_id = db.execute(select(func.max(sales_table.c.id))).scalar() or 0
+        current_category = (select(products_table.c.category_norm)
+                            .where(products_table.c.id == sales_table.c.product_id)
+                            .scalar_subquery())
+        updated = 0
+        for low in range(0, last_id + 1, batch_size):
+            try:
+                updated += db.execute(
+                    update(sales_table)
+                    .where(sales_table.c.id >= low, sales_table.c.id < low + batch_size,
+                           sales_table.c.category == "")
+                    .values(category=current_category)
+                ).rowcount
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+        return updated
+
+
+def naive_utc(value: datetime) -> datetime:
+        """
+        Converts an offset-aware datetime to naive UTC, the form sale_date is stored in; naive values are
+        returned unchanged. Lets clients mix 'Z', '+02:00' and naive bounds without comparing aware
+        and naive datetimes.
+        """
+        if value.tzinfo is None:
+            return value
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def _split_day_range(start_date: datetime, end_date: datetime):
+        """
+        Splits [start_date, end_date] into whole days answerable from the rollup and the partial-day
+        edges that must be read from raw sales.
+        Returns (first_full_day, last_full_day, [(edge_start, edge_end_exclusive), ...]).
+        If the range contains no whole day, first_full_day > last_full_day and the range is one edge.
+        """
+        first_full_day = start_date.date() if start_date.time() == time.min else start_date.date() + timedelta(days=1)
+        last_full_day = end_date.date() if end_date.time() == time.max else end_date.date() - timedelta(days=1)
+        if first_full_day > last_full_day:
+            return first_full_day, last_full_day, [(start_date, end_date + timedelta(microseconds=1))]
+
+        edges = []
+        full_start = datetime.combine(first_full_day, time.min, tzinfo=start_date.tzinfo)
+        if start_date < full_start:
+            edges.append((start_date, full_start))
+        full_end = datetime.combine(last_full_day + timedelta(days=1), time.min, tzinfo=end_date.tzinfo)
+        if end_date >= full_end:
+            edges.append((full_end, end_date + timedelta(microseconds=1)))
+        return first_full_day, last_full_day, edges
+
+def _filter_raw_sales(query, edge_start: datetime, edge_end: datetime,
+                      product_id: Optional[int], category: Optional[str]):
+        query = query.filter(models.Sale.sale_date >= edge_start, models.Sale.sale_date < edge_end)
+        if product_id:
+            query = query.filter(models.Sale.product_id == product_id)
+        if category:
+            query = query.filter(models.Sale.category == _normalize_category(category))
+        return query
+
+def _filter_rollup(query, first_day: date, last_day: date,
+                   product_id: Optional[int], category: Optional[str]):
+        query = query.filter(models.DailyRevenue.day >= first_day, models.DailyRevenue.day <= last_day)
+        if product_id:
+            query = query.filter(models.DailyRevenue.product_id == product_id)
+        if category:
+            query = query.filter(models.DailyRevenue.category == _normalize_category(category))
+        return query
+
+
+EXPORT_COLUMNS = ("id", "product_id", "quantity_sold", "sale_price_per_unit", "total_revenue", "sale_date")
+EXPORT_BATCH_SIZE = 5000
+
+def iter_sales_batches(db: Session, start_date: Optional[datetime] = None,
+                       end_date: Optional[datetime] = None,
+                       product_id: Optional[int] = None,
+                       category: Optional[str] = None,
+                       batch_size: int = EXPORT_BATCH_SIZE,
+                       with_category: bool = False):
+        """
+        Streams filtered sales as lists of plain Row tuples (EXPORT_COLUMNS order, plus the sale's
+        category last when with_category is set), oldest first.
+        The category is sales.category, the lowercased product category at the time of sale, so no join
+        with products is needed and archived months keep the category their revenue was rolled up under.
+        Each batch is its own keyset query (sale_date, id) > (last row's) ... LIMIT batch_size, so only
+        one batch is held in memory at a time on any driver; mysql-connector, for one, buffers the whole
+        result of a single query on the client, server-side cursor or not.
+        """
+        columns = [getattr(models.Sale, column) for column in EXPORT_COLUMNS]
+        if with_category:
+            columns.append(models.Sale.category)
+        query = _filter_sales(select(*columns), start_date, end_date, product_id, category)
+        query = query.order_by(models.Sale.sale_date, models.Sale.id).limit(batch_size)
+        batch = db.execute(query).all()
+        while batch:
+            yield batch
+            if len(batch) < batch_size:
+                return
+            last = batch[-1]
+            # Expanded form of (sale_date, id) > (last_date, last_id), as in _page_sales
+            batch = db.execute(query.where(
+                models.Sale.sale_date >= last.sale_date,
+                or_(models.Sale.sale_date > last.sale_date, models.Sale.id > last.id)
+            )).all()
+
+
+def get_revenue_summary(db: Session, start_date: datetime, end_date: datetime,
+                            product_id: Optional[int] = None,
+                            category: Optional[str] = None):
+        """
+        Calculates total revenue within a date range, optionally filtered.
+        Whole days are read from the daily_revenue rollup; only partial days at the edges touch raw sales.
+        """
+        first_day, last_day, edges = _split_day_range(start_date, end_date)
+        total = 0.0
+
+        if first_day <= last_day:
+            query = db.query(func.sum(models.DailyRevenue.total_revenue))
+            total += _filter_rollup(query, first_day, last_day, product_id, category).scalar() or 0.0
+
+        for edge_start, edge_end in edges:
+            query = db.query(func.sum(models.Sale.total_revenue))
+            total += _filter_raw_sales(query, edge_start, edge_end, product_id, category).scalar() or 0.0
+
+        return total
+
+
+REVENUE_GROUPS = ('product', 'category')
+MAX_COMPARISON_PERIODS = 60
+
+def get_revenue_matrix(db: Session, periods: List[Tuple[datetime, datetime]],
+                       group_by: Optional[str] = None,
+                       product_ids: Optional[List[int]] = None,
+                       categories: Optional[List[str]] = None):
+        """
+        Total revenue for N periods x M products or categories (or one overall row).
+        One conditional-aggregation query (SUM(CASE WHEN day BETWEEN ...)) over the daily_revenue rollup
+        answers every whole day, plus one UNION ALL of per-edge range queries over raw sales for the
+        partial-day edges if any period has them, so the round trips do not grow with N or M.
+        Returns (keys, matrix[M, N]); keys are product ids, lowercased categories, or [None].
+        Requested product_ids/categories are always present as rows, zero if they had no sales.
+        """
+        if group_by is not None and group_by not in REVENUE_GROUPS:
+            raise ValueError("Invalid group_by specified. Use 'product' or 'category'.")
+        normalized = sorted({_normalize_category(category) for category in categories}) if categories else None
+        periods = [(naive_utc(start), naive_utc(end)) for start, end in periods]
+        splits = [_split_day_range(start, end) for start, end in periods]
+        totals = {}
+
+        if group_by == 'product':
+            keys = list(product_ids) if product_ids else []
+        elif group_by == 'category':
+            keys = list(normalized) if normalized else []
+        else:
+            keys = [None]
+        for key in keys:
+            totals[key] = np.zeros(len(periods))
+
+        def accumulate(rows, indexes):
+            for row in rows:
+                key = row[0] if group_by else None
+                values = totals.setdefault(key, np.zeros(len(periods)))
+                for offset, index in enumerate(indexes):
+                    values[index] += row[offset + (1 if group_by else 0)] or 0.0
+
+        # Whole days, from the rollup
+        rollup = models.DailyRevenue
+        indexes = [index for index, (first_day, last_day, _) in enumerate(splits) if first_day <= last_day]
+        if indexes:
+            sums = [func.sum(case((rollup.day.between(splits[index][0], splits[index][1]), rollup.total_revenue), else_=0.0))
+                    for index in indexes]
+            dims = [rollup.product_id] if group_by == 'product' else [rollup.category] if group_by == 'category' else []
+            query = db.query(*dims, *sums).filter(or_(*[rollup.day.between(splits[index][0], splits[index][1]) for index in indexes]))
+            if product_ids:
+                query = query.filter(rollup.product_id.in_(product_ids))
+            if normalized:
+                query = query.filter(rollup.category.in_(normalized))
+            accumulate(query.group_by(*dims).all() if dims else query.all(), indexes)
+
+        # Partial-day edges, from raw sales. Each distinct edge is its own sale_date range query, so every
+        # branch is an index range scan (an OR of ranges makes the planner scan sales); periods sharing an
+        # edge reuse its totals, and empty edges are skipped.
+        edges = sorted({edge for _, _, period_edges in splits for edge in period_edges if edge[0] < edge[1]})
+        if edges:
+            sale = models.Sale
+            dims = [sale.product_id] if group_by == 'product' else [sale.category] if group_by == 'category' else []
+            branches = []
+            for number, (edge_start, edge_end) in enumerate(edges):
+                branch = select(literal(number), *dims, func.sum(sale.total_revenue)) \
+                    .where(sale.sale_date >= edge_start, sale.sale_date < edge_end)
+                if product_ids:
+                    branch = branch.where(sale.product_id.in_(product_ids))
+                if normalized:
+                    branch = branch.where(sale.category.in_(normalized))
+                branches.append(branch.group_by(*dims) if dims else branch)
+            edge_totals = [[] for _ in edges]
+            for row in db.execute(union_all(*branches) if len(branches) > 1 else branches[0]):
+                edge_totals[row[0]].append((row[1] if group_by else None, row[-1] or 0.0))
+            edge_numbers = {edge: number for number, edge in enumerate(edges)}
+            for index, (_, _, period_edges) in enumerate(splits):
+                for edge in period_edges:
+                    for key, revenue in edge_totals[edge_numbers[edge]] if edge in edge_numbers else []:
+                        totals.setdefault(key, np.zeros(len(periods)))[index] += revenue
+
+        keys = sorted(totals) if group_by else [None]
+        matrix = np.array([totals[key] for key in keys]).reshape(len(keys), len(periods))
+        return keys, matrix
+
+
+def get_daily_revenue_rows(db: Session, start_date: datetime, end_date: datetime,
+                           group_by: Optional[str] = None,
+                           product_id: Optional[int] = None,
+                           category: Optional[str] = None):
+        """
+        Per-day revenue in the range as numpy arrays (days datetime64[D], keys or None, revenue float64),
+        read from the daily_revenue rollup plus raw sales for partial-day edges.
+        group_by='product' keys rows by product id, 'category' by lowercased category ('' if none).
+        Days may repeat across keys and edges; analytics.aggregate sums them.
+        """
+        if group_by is not None and group_by not in REVENUE_GROUPS:
+            raise ValueError("Invalid group_by specified. Use 'product' or 'category'.")
+        first_day, last_day, edges = _split_day_range(start_date, end_date)
+        rows = []
+
+        if first_day <= last_day:
+            dims = [models.DailyRevenue.day]
+            if group_by == 'product':
+                dims.append(models.DailyRevenue.product_id)
+            elif group_by == 'category':
+                dims.append(models.DailyRevenue.category)
+            query = db.query(*dims, func.sum(models.DailyRevenue.total_revenue))
+            rows.extend(_filter_rollup(query, first_day, last_day, product_id, category).group_by(*dims).all())
+
+        sale_day = func.date(models.Sale.sale_date)
+        for edge_start, edge_end in edges:
+            dims = [sale_day]
+            if group_by == 'product':
+                dims.append(models.Sale.product_id)
+            elif group_by == 'category':
+                dims.append(models.Sale.category)
+            query = db.query(*dims, func.sum(models.Sale.total_revenue))
+            query = _filter_raw_sales(query, edge_start, edge_end, product_id, category)
+            rows.extend(query.group_by(*dims).all())
+
+        days = analytics.to_day_array([row[0] for row in rows])
+        revenue = np.array([row[-1] or 0.0 for row in rows], dtype=np.float64)
+        keys = np.array([row[1] for row in rows]) if group_by else None
+        return days, keys, revenue
+
+
+def get_revenue_by_period(db: Session, period: str, start_date: datetime, end_date: datetime):
+        """
+        Calculates revenue grouped by a specific period (day, week, month, year).
+        Returns a list of tuples: (period_start_date, revenue)
+        Per-day totals come from the daily_revenue rollup and are bucketed with numpy (analytics.py),
+        so the cost is O(days in range) and the result is the same on MySQL and SQLite.
+        """
+        if period not in analytics.PERIODS:
+            raise ValueError("Invalid period specified. Use 'day', 'week', 'month', or 'year'.")
+
+        days, _, revenue = get_daily_revenue_rows(db, start_date, end_date)
+        periods, _, matrix = analytics.aggregate(days, revenue, period)
+        return list(zip(analytics.to_datetimes(periods), matrix[0].tolist()))
+
+
+def get_revenue_series(db: Session, period: str, start_date: datetime, end_date: datetime,
+                       group_by: Optional[str] = None,
+                       product_id: Optional[int] = None,
+                       category: Optional[str] = None) -> schemas.RevenueSeriesResponse:
+        """
+        Revenue per period for one series, or one series per product or category (group_by), with
+        period-over-period changes, computed from a single rollup read.
+        Every series is aligned to the same list of periods: every period from start_date through end_date,
+        zero where there were no sales, so each change compares adjacent periods.
+        """
+        if period not in analytics.PERIODS:
+            raise ValueError("Invalid period specified. Use 'day', 'week', 'month', or 'year'.")
+
+        days, keys, revenue = get_daily_revenue_rows(db, start_date, end_date, group_by=group_by,
+                                                     product_id=product_id, category=category)
+        periods = analytics.period_range(start_date.date(), end_date.date(), period)
+        periods, series_keys, matrix = analytics.aggregate(days, revenue, period, keys=keys, periods=periods)
+        change, percent = analytics.deltas(matrix)
+        starts = analytics.to_datetimes(periods)
+        ends = [min(end, end_date.replace(tzinfo=None)) for end in analytics.to_datetimes(analytics.period_ends(periods, period))]
+
+        series = []
+        for index in range(matrix.shape[0]):
+            key = series_keys[index].item() if series_keys is not None else None
+            series.append(schemas.RevenueSeries(
+                product_id=key if group_by == 'product' else product_id,
+                category=(key or None) if group_by == 'category' else category,
+                total_revenue=float(matrix[index].sum()),
+                revenue=matrix[index].tolist(),
+                change=analytics.nan_to_none(change[index]),
+                percentage_change=analytics.nan_to_none(percent[index]),
+            ))
+
+        return schemas.RevenueSeriesResponse(
+            period=period,
+            start_date=start_date,
+            end_date=end_date,
+            group_by=group_by,
+            period_starts=starts,
+            period_ends=ends,
+            series=series,
+        )
+
+
+def get_revenue_summary_cached(db: Session, start_date: datetime, end_date: datetime,
+                               product_id: Optional[int] = None,
+                               category: Optional[str] = None) -> float:
+        """get_revenue_summary through the revenue cache (stale by at most REVENUE_CACHE_TTL_SECONDS)."""
+        key = cache.make_key(cache.revenue_cache.version(), start_date, end_date, product_id,
+                             category.lower() if category else None)
+        cached = cache.revenue_cache.get(key)
+        if cached is not cache.MISSING:
+            return cached
+        total = get_revenue_summary(db, start_date, end_date, product_id=product_id, category=category)
+        cache.revenue_cache.set(key, total)
+        return total
+
+
+def get_revenue_by_period_cached(db: Session, period: str, start_date: datetime, end_date: datetime):
+        """get_revenue_by_period through the revenue cache (stale by at most REVENUE_CACHE_TTL_SECONDS)."""
+        key = cache.make_key(cache.revenue_series_cache.version(), period, start_date, end_date)
+        cached = cache.revenue_series_cache.get(key)
+        if cached is not cache.MISSING:
+            return cached
+        series = get_revenue_by_period(db, period, start_date, end_date)
+        cache.revenue_series_cache.set(key, series)
+        return series
+
+
+LEADERBOARD_METRICS = ('revenue', 'units')
+
+def get_leaderboard(db: Session, group_by: str = 'product', metric: str = 'revenue',
+                    window_days: int = 7, limit: int = 10,
+                    end_day: Optional[date] = None) -> schemas.Leaderboard:
+        """
+        Top `limit` products or categories by revenue or units sold over the `window_days` days ending
+        on end_day (today on the database clock by default, including today's sales so far; the rollup's
+        days come from sales.sale_date, which is also stamped by the database clock).
+        Reads the per-day partials in daily_revenue (kept current by every sale) instead of scanning
+        sales, and picks the top N with a heap. Ties are broken by the other metric, then by key.
+        """
+        if group_by not in REVENUE_GROUPS:
+            raise ValueError("Invalid group_by specified. Use 'product' or 'category'.")
+        if metric not in LEADERBOARD_METRICS:
+            raise ValueError("Invalid metric specified. Use 'revenue' or 'units'.")
+        end_day = end_day or database_now(db).date()
+        start_day = end_day - timedelta(days=window_days - 1)
+
+        rollup = models.DailyRevenue
+        key_column = rollup.product_id if group_by == 'product' else rollup.category
+        rows = db.query(
+            key_column,
+            func.sum(rollup.total_revenue),
+            func.sum(rollup.quantity_sold),
+            func.sum(rollup.sale_count)
+        ).filter(rollup.day >= start_day, rollup.day <= end_day).group_by(key_column).all()
+
+        if metric == 'revenue':
+            rank_key = lambda row: (-(row[1] or 0.0), -(row[2] or 0), row[0])
+        else:
+            rank_key = lambda row: (-(row[2] or 0), -(row[1] or 0.0), row[0])
+        top = heapq.nsmallest(limit, rows, key=rank_key)
+
+        names = {}
+        if group_by == 'product' and top:
+            names = dict(db.query(models.Product.id, models.Product.name)
+                         .filter(models.Product.id.in_([row[0] for row in top])).all())
+
+        entries = [schemas.LeaderboardEntry(
+            rank=rank,
+            product_id=key if group_by == 'product' else None,
+            product_name=names.get(key) if group_by == 'product' else None,
+            category=(key or None) if group_by == 'category' else None,
+            total_revenue=revenue or 0.0,
+            units_sold=units or 0,
+            sale_count=count or 0,
+        ) for rank, (key, revenue, units, count) in enumerate(top, start=1)]
+
+        return schemas.Leaderboard(group_by=group_by, metric=metric, window_days=window_days,
+                                   start_date=start_day, end_date=end_day, entries=entries)
+
+
+def get_leaderboard_cached(db: Session, group_by: str = 'product', metric: str = 'revenue',
+                           window_days: int = 7, limit: int = 10,
+                           end_day: Optional[date] = None) -> schemas.Leaderboard:
+        """
+        get_leaderboard through the leaderboard cache (stale by at most REVENUE_CACHE_TTL_SECONDS).
+        Windows ending today are cached under end_day None, so a hit costs no database round trip: the
+        database clock's date is only read on a miss (for up to the TTL after midnight, a hit may still
+        be the window that ended yesterday; its end_date says so).
+        """
+        key = cache.make_key(cache.leaderboard_cache.version(), group_by, metric, window_days, limit, end_day)
+        cached = cache.leaderboard_cache.get(key)
+        if cached is not cache.MISSING:
+            return cached
+        leaderboard = get_leaderboard(db, group_by=group_by, metric=metric, window_days=window_days,
+                                      limit=limit, end_day=end_day)
+        cache.leaderboard_cache.set(key, leaderboard)
+        return leaderboard
@@ -0,0 +1,109 @@
+import asyncio
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import Optional
+
+import cache
+import crud
+import schemas
+
+# Async counterparts of the crud functions used by the async routers (DB_ASYNC_MODE).
+# Each one runs the sync query code from crud.py through AsyncSession.run_sync, so the I/O goes
+# through the async driver without holding a threadpool thread, and there is a single
+# implementation of every query. Results are converted to Pydantic models inside run_sync so
+# no lazy load can be triggered after the greenlet context has exited; the list endpoints use
+# crud's *_rows functions, which already return plain dicts.
+# Cache lookups and writes, and low-stock events, are kept out of run_sync: with a shared backend
+# (CACHE_BACKEND=redis) they are blocking redis-py calls, which _off_loop runs on a worker thread.
+
+
+async def _off_loop(fn, *args):
+        """Runs a cache or notifier call: inline when it is in-process, on a worker thread when it talks to Redis."""
+        if cache.backend is None:
+            return fn(*args)
+        return await asyncio.to_thread(fn, *args)
+
+
+async def _run(db: AsyncSession, schema, fn, *args, **kwargs):
+        def call(session):
+            result = fn(session, *args, **kwargs)
+            if result is None:
+                return None
+            if isinstance(result, list):
+                return [schema.model_validate(row) for row in result]
+            return schema.model_validate(result)
+        return await db.run_sync(call)
+
+
+async def _run_rows(db: AsyncSession, fn, *args, **kwargs):
+        return await db.run_sync(lambda session: fn(session, *args, **kwargs))
+
+
+async def _cached(named_cache: cache.Cache, key, load):
+        """Cache-aside around an awaitable loader; None results are not cached."""
+        cached = await _off_loop(named_cache.get, key)
+        if cached is not cache.MISSING:
+            return cached
+        value = await load()
+        if value is not None:
+            await _off_loop(named_cache.set, key, value)
+        return value
+
+
+async def get_product_cached(db: AsyncSession, product_id: int):
+        """Async version of crud.get_product_cached."""
+        cached = await _off_loop(cache.product_cache.get, product_id)
+        if cached is not cache.MISSING:
+            return cached
+        product = await _run(db, schemas.Product, crud.get_product, product_id)
+        return await _off_loop(crud.cache_product, product) if product is not None else None
+
+async def get_product_view(db: AsyncSession, product_id: int):
+        """Product with its current inventory, served from the caches when possible."""
+        product = await get_product_cached(db, product_id)
+        if product is None or product.inventory is None:
+            return product
+        inventory = await _cached(cache.inventory_cache, product_id,
+                                  lambda: _run(db, schemas.Inventory, crud.get_inventory, product_id))
+        return product.model_copy(update={"inventory": inventory})
+
+async def get_products(db: AsyncSession, skip: int = 0, limit: int = 100, category: Optional[str] = None,
+                       cursor: Optional[str] = None):
+        """Fetches a list of products, with pagination and optional category filtering."""
+        key = await _off_loop(crud.products_page_key, skip, limit, category, cursor)
+        return await _cached(cache.product_page_cache, key,
+                             lambda: _run_rows(db, crud.get_products_rows, skip=skip, limit=limit,
+                                               category=category, cursor=cursor))
+
+async def get_inventory(db: AsyncSession, product_id: int):
+        """Fetches inventory for a specific product."""
+        return await _run(db, schemas.Inventory, crud.get_inventory, product_id)
+
+async def get_all_inventory(db: AsyncSession, skip: int = 0, limit: int = 100, low_stock: bool = False,
+                            cursor: Optional[str] = None):
+        """Fetches all inventory records, with pagination and optional low stock filtering."""
+        return await _run_rows(db, crud.get_all_inventory_rows, skip=skip, limit=limit,
+                               low_stock=low_stock, cursor=cursor)
+
+async def create_sale(db: AsyncSession, sale: schemas.SaleCreate):
+        """Creates a new sale record, updates inventory and the daily revenue rollup in one transaction."""
+        crud.check_sale_product(await get_product_cached(db, sale.product_id), sale)
+
+        def record(session):
+            db_sale, events = crud.record_sale(session, sale)
+            session.refresh(db_sale)
+            return schemas.Sale.model_validate(db_sale), events
+        created, events = await db.run_sync(record)
+        await _off_loop(crud.publish_sale, sale, events)
+        return created
+
+async def get_sales(db: AsyncSession, skip: int = 0, limit: int = 100,
+                    start_date: Optional[datetime] = None,
+                    end_date: Optional[datetime] = None,
+                    product_id: Optional[int] = None,
+                    category: Optional[str] = None,
+                    cursor: Optional[str] = None):
+        """Fetches sales records with filtering and pagination, newest first."""
+        return await _run_rows(db, crud.get_sales_rows, skip=skip, limit=limit,
+                               start_date=start_date, end_date=end_date,
+                               product_id=product_id, category=category, cursor=cursor)
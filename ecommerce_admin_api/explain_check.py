@@ -0,0 +1,118 @@
+import argparse
+import logging
+import re
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func, select, text, true
+
+from database import engine
+import models
+import partitions
+
+# Checks with EXPLAIN that the hot lookups use the indexes meant for them, on MySQL or SQLite, and
+# on a partitioned MySQL sales table that date-range queries only touch the months in range.
+# Run it against a seeded database (e.g. python populate_db.py --bulk); on near-empty tables the
+# planner may legitimately prefer a full scan.
+#   python explain_check.py            # exits 1 if any query misses its index
+#   python explain_check.py --verbose  # also prints every plan
+# tests/test_indexes.py runs the same checks under pytest on a seeded SQLite database.
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def checks():
+        """(description, statement, expected index, must be covering)"""
+        today = date.today()
+        since = datetime.combine(today - timedelta(days=30), datetime.min.time())
+        product, sale, inventory, rollup = models.Product, models.Sale, models.Inventory, models.DailyRevenue
+        return [
+            ("product by name (get_product_by_name)",
+             select(product.id).where(product.name_norm == models.normalize_lookup("Example")),
+             "ix_products_name_norm", False),
+            ("products by category (get_products_rows)",
+             select(product.id, product.name).where(product.category_norm == "electronics").order_by(product.id).limit(100),
+             "ix_products_category_norm", False),
+            ("sales by category (get_sales_rows)",
+             select(sale.id).where(sale.category == "electronics", sale.sale_date >= since),
+             "ix_sale_category_date", False),
+            ("per-product revenue range (raw sales edges)",
+             select(func.sum(sale.total_revenue)).where(sale.product_id == 1, sale.sale_date >= since),
+             "ix_sale_product_date_revenue", True),
+            ("low-stock listing (get_all_inventory_rows)",
+             select(inventory.id).where(inventory.is_low_stock == true()).order_by(inventory.id).limit(100),
+             "ix_inventory_low_stock_id", False),
+            ("category revenue from rollup (get_revenue_summary)",
+             select(func.sum(rollup.total_revenue)).where(rollup.category == "electronics", rollup.day >= since.date()),
+             "ix_daily_revenue_category_day", False),
+        ]
+
+
+def explain(connection, statement):
+        """Returns the plan as a list of strings (SQLite EXPLAIN QUERY PLAN / MySQL EXPLAIN)."""
+        sql = str(statement.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+        if connection.dialect.name == "sqlite":
+            return [row[-1] for row in connection.execute(text("EXPLAIN QUERY PLAN " + sql))]
+        if connection.dialect.name == "mysql":
+            return [" ".join(f"{key}={value}" for key, value in row._mapping.items())
+                    for row in connection.execute(text("EXPLAIN " + sql))]
+        raise RuntimeError(f"EXPLAIN check is not implemented for {connection.dialect.name}")
+
+
+def uses_index(plan, index_name: str, covering: bool, dialect: str) -> bool:
+        for line in plan:
+            if dialect == "sqlite":
+                if f"INDEX {index_name}" in line and (not covering or "COVERING INDEX" in line):
+                    return True
+            elif f"key={index_name}" in line and (not covering or "Using index" in line):
+                return True
+        return False
+
+
+def check_pruning(connection, verbose: bool = False) -> bool:
+        """A 30-day sales range must only read the partitions of the months it spans (MySQL only)."""
+        if partitions.existing_partitions(connection) is None:
+            return True
+        today = date.today()
+        since = datetime.combine(today - timedelta(days=30), datetime.min.time())
+        until = datetime.combine(today + timedelta(days=1), datetime.min.time())
+        statement = select(func.sum(models.Sale.total_revenue)).where(models.Sale.sale_date >= since,
+                                                                      models.Sale.sale_date < until)
+        expected = {partitions.partition_name(month) for month in partitions.month_range(since.date(), today)}
+        plan = explain(connection, statement)
+        read = set()
+        for line in plan:
+            match = re.search(r"partitions=(\S+)", line)
+            if match and match.group(1) != "None":
+                read.update(match.group(1).split(","))
+        passed = bool(read) and read <= expected
+        logger.info(f"{'OK  ' if passed else 'MISS'} sales range pruning: expects {', '.join(sorted(expected))}, reads {', '.join(sorted(read)) or 'none'}")
+        if verbose or not passed:
+            for line in plan:
+                logger.info(f"       {line}")
+        return passed
+
+
+def run(verbose: bool = False) -> bool:
+        ok = True
+        with engine.connect() as connection:
+            for description, statement, index_name, covering in checks():
+                plan = explain(connection, statement)
+                passed = uses_index(plan, index_name, covering, connection.dialect.name)
+                ok = ok and passed
+                expectation = f"{index_name}{' (covering)' if covering else ''}"
+                logger.info(f"{'OK  ' if passed else 'MISS'} {description}: expects {expectation}")
+                if verbose or not passed:
+                    for line in plan:
+                        logger.info(f"       {line}")
+            ok = check_pruning(connection, verbose) and ok
+        return ok
+
+
+    # --- Run the check ---
+if __name__ == "__main__":
+        parser = argparse.ArgumentParser(description="Verify with EXPLAIN that hot queries use their indexes.")
+        parser.add_argument("--verbose", action="store_true", help="Print every query plan")
+        args = parser.parse_args()
+        if not run(verbose=args.verbose):
+            raise SystemExit(1)
@@ -0,0 +1,150 @@
+import queue
+import threading
+import time
+
+# In-memory stand-in for a Redis server, implementing the subset of the redis-py client API that
+# cache.RedisBackend uses (GET/SET with expiry, PTTL, DELETE, INCR, PUBLISH/SUBSCRIBE, and pipelines
+# of those). Several FakeRedis
+# clients sharing one FakeRedisServer behave like several workers connected to one Redis.
+
+
+class FakeRedisServer:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {} # key -> (value bytes, expires_at monotonic or None)
+        self.subscribers = {} # channel -> [queue.Queue, ...]
+
+    def _live(self, key):
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+
+def _to_bytes(value) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode()
+
+
+class FakeRedis:
+
+    def __init__(self, server: FakeRedisServer = None):
+        self.server = server or FakeRedisServer()
+
+    def get(self, key):
+        with self.server.lock:
+            return self.server._live(key)
+
+    def set(self, key, value, ex=None, px=None):
+        expires_at = None
+        if px is not None:
+            expires_at = time.monotonic() + px / 1000
+        elif ex is not None:
+            expires_at = time.monotonic() + ex
+        with self.server.lock:
+            self.server.data[key] = (_to_bytes(value), expires_at)
+        return True
+
+    def pttl(self, key):
+        """Milliseconds left to live; -1 for a key without expiry, -2 for a missing key."""
+        with self.server.lock:
+            if self.server._live(key) is None:
+                return -2
+            expires_at = self.server.data[key][1]
+            return -1 if expires_at is None else max(int((expires_at - time.monotonic()) * 1000), 0)
+
+    def delete(self, *keys):
+        with self.server.lock:
+            removed = 0
+            for key in keys:
+                if self.server._live(key) is not None:
+                    removed += 1
+                self.server.data.pop(key, None)
+            return removed
+
+    def incr(self, key, amount=1):
+        with self.server.lock:
+            current = self.server._live(key)
+            value = int(current or 0) + amount
+            expires_at = self.server.data[key][1] if current is not None else None
+            self.server.data[key] = (_to_bytes(value), expires_at)
+            return value
+
+    def publish(self, channel, message):
+        with self.server.lock:
+            subscribers = list(self.server.subscribers.get(channel, ()))
+        for inbox in subscribers:
+            inbox.put({"type": "message", "channel": _to_bytes(channel), "data": _to_bytes(message)})
+        return len(subscribers)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakePubSub(self.server, ignore_subscribe_messages)
+
+    def flushall(self):
+        with self.server.lock:
+            self.server.data.clear()
+        return True
+
+
+class FakePipeline:
+    """Queues commands and runs them in order on execute(), returning their results."""
+
+    def __init__(self, client: FakeRedis):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        command = getattr(self.client, name)
+        def queue_command(*args, **kwargs):
+            self.commands.append((command, args, kwargs))
+            return self
+        return queue_command
+
+    def execute(self):
+        commands, self.commands = self.commands, []
+        return [command(*args, **kwargs) for command, args, kwargs in commands]
+
+
+class FakePubSub:
+
+    def __init__(self, server: FakeRedisServer, ignore_subscribe_messages=False):
+        self.server = server
+        self.ignore_subscribe_messages = ignore_subscribe_messages
+        self.inbox = queue.Queue()
+        self.channels = []
+
+    def subscribe(self, *channels):
+        with self.server.lock:
+            for channel in channels:
+                self.server.subscribers.setdefault(channel, []).append(self.inbox)
+                self.channels.append(channel)
+        if not self.ignore_subscribe_messages:
+            for channel in channels:
+                self.inbox.put({"type": "subscribe", "channel": _to_bytes(channel), "data": 1})
+
+    def get_message(self, timeout=0.0):
+        try:
+            return self.inbox.get(timeout=timeout) if timeout else self.inbox.get_nowait()
+        except queue.Empty:
+            return None
+
+    def listen(self):
+        while True:
+            yield self.inbox.get()
+
+    def close(self):
+        with self.server.lock:
+            for channel in self.channels:
+                inboxes = self.server.subscribers.get(channel, [])
+                if self.inbox in inboxes:
+                    inboxes.remove(self.inbox)
+        self.channels = []
@@ -0,0 +1,40 @@
+import json
+from datetime import date, datetime
+
+from fastapi.responses import JSONResponse
+
+# JSON encoding for the app's responses (FastAPI default_response_class) and for the list
+# endpoints, which return crud's plain row dicts in a FastJSONResponse directly: no Pydantic model
+# is built per row and FastAPI does not validate the response_model again.
+# orjson is an optional dependency (pip install orjson); without it the standard json module is used.
+
+try:
+    import orjson
+except ImportError: # pragma: no cover - optional dependency
+    orjson = None
+
+
+def _default(value):
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+        """Compact UTF-8 JSON; datetimes in ISO 8601, as Pydantic writes them."""
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+        return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def page_response(rows: list, limit: int, next_cursor) -> FastJSONResponse:
+        """A list endpoint's page; a full page carries next_cursor(last row) in the X-Next-Cursor header."""
+        headers = {"X-Next-Cursor": next_cursor(rows[-1])} if len(rows) == limit else None
+        return FastJSONResponse(rows, headers=headers)
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from typing import List
+
+import cache
+import schemas
+
+logger = logging.getLogger(__name__)
+
+# Low-stock threshold crossings, pushed to GET /inventory/low-stock/stream subscribers.
+#
+# crud publishes one event per product whose inventory.is_low_stock flag flips, after the change
+# is committed. With a shared cache backend (CACHE_BACKEND=redis) events go through
+# LOW_STOCK_CHANNEL so every worker's subscribers see crossings made by any worker; otherwise
+# they are delivered in-process.
+LOW_STOCK_CHANNEL = os.getenv("LOW_STOCK_CHANNEL", "ecommerce_admin:low-stock")
+LOW_STOCK_QUEUE_SIZE = int(os.getenv("LOW_STOCK_QUEUE_SIZE", "1000"))
+LOW_STOCK_KEEPALIVE_SECONDS = float(os.getenv("LOW_STOCK_KEEPALIVE_SECONDS", "15"))
+
+
+class LowStockNotifier:
+    """Fans low-stock events out to per-connection asyncio queues, from any thread."""
+
+    def __init__(self, backend=None, channel: str = LOW_STOCK_CHANNEL, queue_size: int = LOW_STOCK_QUEUE_SIZE):
+        self.backend = backend
+        self.channel = channel
+        self.queue_size = queue_size
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._listener = None
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self) -> asyncio.Queue:
+        """Registers a queue on the running event loop; pair with unsubscribe."""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers[queue] = asyncio.get_running_loop()
+        if self.backend is not None:
+            self._start_listener()
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        with self._lock:
+            self._subscribers.pop(queue, None)
+
+    def publish(self, events: List[schemas.LowStockEvent]):
+        if not events:
+            return
+        self.published += len(events)
+        if self.backend is None:
+            self._deliver(events)
+            return
+        try:
+            self.backend.client.publish(self.channel, json.dumps([event.model_dump(mode="json") for event in events]))
+        except Exception as e:
+            logger.warning(f"Low-stock publish failed, delivering locally only: {e}")
+            self._deliver(events)
+
+    def _deliver(self, events: List[schemas.LowStockEvent]):
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+        for queue, loop in subscribers:
+            for event in events:
+                try:
+                    loop.call_soon_threadsafe(self._put, queue, event)
+                except RuntimeError:
+                    # Loop already closed; the subscriber is gone
+                    self.unsubscribe(queue)
+
+    def _put(self, queue: asyncio.Queue, event: schemas.LowStockEvent):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A stalled client must not hold up everyone else
+            self.dropped += 1
+
+    def _start_listener(self):
+        with self._lock:
+            if self._listener is not None:
+                return
+            self._listener = threading.Thread(target=self._listen, name="low-stock-listener", daemon=True)
+        self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.backend.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    self._deliver([schemas.LowStockEvent(**event) for event in json.loads(message["data"])])
+            except Exception as e:
+                logger.warning(f"Low-stock subscription failed: {e}")
+                time.sleep(1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            subscribers = len(self._subscribers)
+        return {"subscribers": subscribers, "published": self.published, "dropped": self.dropped}
+
+
+notifier = LowStockNotifier(backend=cache.backend)
+
+
+def format_sse(event: schemas.LowStockEvent) -> str:
+    """One Server-Sent Events message; the event name says which way the threshold was crossed."""
+    name = "low_stock" if event.is_low_stock else "restocked"
+    return f"event: {name}\ndata: {event.model_dump_json()}\n\n"
@@ -1,68 +1,145 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index, CheckConstraint
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
-from database import Base
-
-class Product(Base):
-    __tablename__ = "products"
-
-    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    name = Column(String(255), index=True, nullable=False, unique=True)
-    description = Column(String(1000), nullable=True)
-    category = Column(String(100), index=True, nullable=True)
-    price = Column(Float, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
-
-    inventory = relationship("Inventory", back_populates="product", uselist=False, cascade="all, delete-orphan")
-    sales = relationship("Sale", back_populates="product", cascade="all, delete-orphan")
-
-    __table_args__ = (
-        CheckConstraint('price >= 0', name='check_product_price_positive'),
-    )
-
-    def __repr__(self):
-        return f"<Product(id={self.id}, name='{self.name}', price={self.price})>"
-
-
-class Inventory(Base):
-    __tablename__ = "inventory"
-
-    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    product_id = Column(Integer, ForeignKey("products.id"), unique=True, nullable=False, index=True)
-    quantity = Column(Integer, nullable=False, default=0)
-    low_stock_threshold = Column(Integer, nullable=False, default=10)
-    last_updated = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
-
-    product = relationship("Product", back_populates="inventory")
-
-    __table_args__ = (
-        CheckConstraint('quantity >= 0', name='check_inventory_quantity_non_negative'),
-        CheckConstraint('low_stock_threshold >= 0', name='check_low_stock_threshold_non_negative'),
-    )
-
-    def __repr__(self):
-        return f"<Inventory(product_id={self.product_id}, quantity={self.quantity})>"
-
-
-class Sale(Base):
-    __tablename__ = "sales"
-
-    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
-    quantity_sold = Column(Integer, nullable=False)
-    sale_price_per_unit = Column(Float, nullable=False)
-    total_revenue = Column(Float, nullable=False)
-    sale_date = Column(DateTime(timezone=True), server_default=func.now(), index=True)
-
-    product = relationship("Product", back_populates="sales")
-
-    __table_args__ = (
-        CheckConstraint('quantity_sold > 0', name='check_sale_quantity_positive'),
-        CheckConstraint('sale_price_per_unit >= 0', name='check_sale_price_non_negative'),
-        CheckConstraint('total_revenue >= 0', name='check_total_revenue_non_negative'),
-        Index('ix_sale_product_date', 'product_id', 'sale_date'),
-    )
-
-    def __repr__(self):
-        return f"<Sale(id={self.id}, product_id={self.product_id}, quantity={self.quantity_sold}, date={self.sale_date})>"
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Date, DateTime, Boolean, ForeignKey, Index, CheckConstraint, false
+from sqlalchemy.orm import relationship, validates
+from sqlalchemy.sql import func
+from typing import Optional
+from database import Base
+
+
+def normalize_lookup(value: Optional[str]) -> str:
+    """Case-insensitive lookup key stored in the *_norm columns (and daily_revenue.category)."""
+    return value.strip().lower() if value else ""
+
+def _normalized_default(column_name: str):
+    # Fills a *_norm column on Core inserts (e.g. bulk loads) that only pass the source column
+    def default(context):
+        return normalize_lookup(context.get_current_parameters().get(column_name))
+    return default
+
+
+class Product(Base):
+    __tablename__ = "products"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    name = Column(String(255), index=True, nullable=False, unique=True)
+    description = Column(String(1000), nullable=True)
+    category = Column(String(100), index=True, nullable=True)
+    # Normalized copies of name/category for case-insensitive filters that can use an index
+    # (lower(column) = ... cannot); kept in sync by the validator below and the insert defaults
+    name_norm = Column(String(255), index=True, unique=True, nullable=False, default=_normalized_default("name"))
+    category_norm = Column(String(100), index=True, nullable=False, default=_normalized_default("category"), server_default="")
+    price = Column(Float, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    inventory = relationship("Inventory", back_populates="product", uselist=False, cascade="all, delete-orphan")
+    sales = relationship("Sale", back_populates="product", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        CheckConstraint('price >= 0', name='check_product_price_positive'),
+    )
+
+    @validates("name", "category")
+    def _sync_normalized(self, key, value):
+        setattr(self, f"{key}_norm", normalize_lookup(value))
+        return value
+
+    def __repr__(self):
+        return f"<Product(id={self.id}, name='{self.name}', price={self.price})>"
+
+
+class Inventory(Base):
+    __tablename__ = "inventory"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    product_id = Column(Integer, ForeignKey("products.id"), unique=True, nullable=False, index=True)
+    quantity = Column(Integer, nullable=False, default=0)
+    low_stock_threshold = Column(Integer, nullable=False, default=10)
+    # Materialized quantity <= low_stock_threshold, kept in sync by every crud write that changes either
+    is_low_stock = Column(Boolean, nullable=False, default=False, server_default=false())
+    last_updated = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    product = relationship("Product", back_populates="inventory")
+
+    __table_args__ = (
+        CheckConstraint('quantity >= 0', name='check_inventory_quantity_non_negative'),
+        CheckConstraint('low_stock_threshold >= 0', name='check_low_stock_threshold_non_negative'),
+        Index('ix_inventory_low_stock_id', 'is_low_stock', 'id'), # Low-stock listing in id (cursor) order
+    )
+
+    def __repr__(self):
+        return f"<Inventory(product_id={self.product_id}, quantity={self.quantity})>"
+
+
+class Sale(Base):
+    __tablename__ = "sales"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
+    quantity_sold = Column(Integer, nullable=False)
+    sale_price_per_unit = Column(Float, nullable=False)
+    total_revenue = Column(Float, nullable=False)
+    sale_date = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    # Snapshot of the product's category_norm at sale time, so category reports need no join and
+    # keep attributing old sales to the category they were made in after a recategorization
+    category = Column(String(100), nullable=False, default="", server_default="")
+
+    product = relationship("Product", back_populates="sales")
+
+    __table_args__ = (
+        CheckConstraint('quantity_sold > 0', name='check_sale_quantity_positive'),
+        CheckConstraint('sale_price_per_unit >= 0', name='check_sale_price_non_negative'),
+        CheckConstraint('total_revenue >= 0', name='check_total_revenue_non_negative'),
+        # Covers per-product revenue scans (product_id, date range, SUM(total_revenue)) without table lookups
+        Index('ix_sale_product_date_revenue', 'product_id', 'sale_date', 'total_revenue'),
+        Index('ix_sale_category_date', 'category', 'sale_date'),
+    )
+
+    def __repr__(self):
+        return f"<Sale(id={self.id}, product_id={self.product_id}, quantity={self.quantity_sold}, date={self.sale_date})>"
+
+
+class DailyRevenue(Base):
+    """Per-day revenue rollup of `sales`, maintained by crud.create_sale and rebuilt by crud.rebuild_daily_revenue."""
+    __tablename__ = "daily_revenue"
+
+    day = Column(Date, primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    # Lowercased product category at the time of sale ('' when uncategorized)
+    category = Column(String(100), primary_key=True, default="")
+    total_revenue = Column(Float, nullable=False, default=0.0)
+    quantity_sold = Column(Integer, nullable=False, default=0)
+    sale_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index('ix_daily_revenue_product_day', 'product_id', 'day'),
+        Index('ix_daily_revenue_category_day', 'category', 'day'),
+    )
+
+    def __repr__(self):
+        return f"<DailyRevenue(day={self.day}, product_id={self.product_id}, revenue={self.total_revenue})>"
+
+
+class SalesArchive(Base):
+    """One month of `sales` moved to a cold storage file by partitions.archive_months."""
+    __tablename__ = "sales_archive"
+
+    month = Column(Date, primary_key=True) # First day of the archived month
+    path = Column(String(500), nullable=False)
+    row_count = Column(Integer, nullable=False)
+    total_revenue = Column(Float, nullable=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<SalesArchive(month={self.month}, rows={self.row_count}, path={self.path})>"
+
+
+class SalesWalCheckpoint(Base):
+    """Highest write-behind log sequence number committed to `sales`, per log (see sale_buffer.py)."""
+    __tablename__ = "sales_wal_checkpoints"
+
+    name = Column(String(100), primary_key=True)
+    applied_sequence = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<SalesWalCheckpoint(name={self.name}, applied_sequence={self.applied_sequence})>"
@@ -0,0 +1,213 @@
+import argparse
+import logging
+import os
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import delete, func, inspect, select, text
+
+import arrow_export
+import models
+from database import engine, SessionLocal
+
+# Monthly partitioning and archival of `sales`.
+#
+# On MySQL, `sales` is RANGE-partitioned on TO_DAYS(sale_date): one partition per month named
+# pYYYYMM, plus a catch-all pmax that stays empty as long as future months are split out ahead of
+# time. Every date-filtered sales query in crud bounds sale_date, so MySQL prunes it to the months in
+# range. ensure_partitions() runs at API startup and should also run from cron; archive_months()
+# writes whole past months to Parquet under SALES_ARCHIVE_DIR, records them in sales_archive and
+# drops their partitions. The daily_revenue rollup is kept, so revenue reports still cover them.
+# Other backends (SQLite) keep a single unpartitioned table, where archival deletes the month's rows.
+#   python partitions.py setup                      # one-off: partition an existing MySQL sales table
+#   python partitions.py ensure                     # create the next SALES_PARTITION_MONTHS_AHEAD months
+#   python partitions.py archive --before 2024-01   # archive every month before January 2024
+SALES_PARTITION_MONTHS_AHEAD = int(os.getenv("SALES_PARTITION_MONTHS_AHEAD", "3"))
+SALES_ARCHIVE_DIR = os.getenv("SALES_ARCHIVE_DIR", "archive/sales")
+MAX_PARTITION = "pmax"
+ARCHIVE_DELETE_BATCH_SIZE = 10000
+
+logger = logging.getLogger(__name__)
+
+
+def month_start(value) -> date:
+        return date(value.year, value.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+        index = month.year * 12 + month.month - 1 + months
+        return date(index // 12, index % 12 + 1, 1)
+
+
+def month_range(first: date, last: date):
+        """Month starts from first through last, inclusive."""
+        month = month_start(first)
+        while month <= last:
+            yield month
+            month = add_months(month, 1)
+
+
+def partition_name(month: date) -> str:
+        return f"p{month:%Y%m}"
+
+
+def _partition_definition(month: date) -> str:
+        return f"PARTITION {partition_name(month)} VALUES LESS THAN (TO_DAYS('{add_months(month, 1).isoformat()}'))"
+
+
+def existing_partitions(connection):
+        """Sorted month starts of the sales partitions (pmax excluded), or None if the table is not partitioned."""
+        if connection.dialect.name != "mysql":
+            return None
+        names = connection.execute(text(
+            "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL"
+        ), {"table": models.Sale.__tablename__}).scalars().all()
+        if not names:
+            return None
+        return sorted(datetime.strptime(name[1:], "%Y%m").date() for name in names if name != MAX_PARTITION)
+
+
+def partition_sales_table(bind=engine, months_ahead: int = SALES_PARTITION_MONTHS_AHEAD):
+        """
+        One-off migration that partitions an existing MySQL sales table by month, from its oldest sale
+        through months_ahead months after the current one. Returns the partitioned months.
+        MySQL requires every unique key of a partitioned table to include the partitioning column and
+        does not allow foreign keys on it, so the primary key becomes (id, sale_date) and the
+        products foreign key is dropped; product deletes still cascade to sales through the ORM.
+        The table is rebuilt, so run it in a maintenance window on large tables.
+        """
+        with bind.connect() as connection:
+            if connection.dialect.name != "mysql":
+                raise RuntimeError(f"Partitioning sales is only implemented for MySQL, not {connection.dialect.name}.")
+            if existing_partitions(connection) is not None:
+                logger.info("sales is already partitioned.")
+                return ensure_partitions(bind, months_ahead)
+
+            oldest = connection.execute(select(func.min(models.Sale.sale_date))).scalar()
+            last = add_months(month_start(date.today()), months_ahead)
+            months = list(month_range(oldest or date.today(), last))
+            for foreign_key in inspect(connection).get_foreign_keys(models.Sale.__tablename__):
+                connection.execute(text(f"ALTER TABLE sales DROP FOREIGN KEY `{foreign_key['name']}`"))
+            connection.execute(text(
+                "ALTER TABLE sales MODIFY sale_date DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP, "
+                "DROP PRIMARY KEY, ADD PRIMARY KEY (id, sale_date)"
+            ))
+            definitions = ", ".join([_partition_definition(month) for month in months]
+                                    + [f"PARTITION {MAX_PARTITION} VALUES LESS THAN MAXVALUE"])
+            connection.execute(text(f"ALTER TABLE sales PARTITION BY RANGE (TO_DAYS(sale_date)) ({definitions})"))
+            connection.commit()
+        logger.info(f"Partitioned sales into {len(months)} monthly partitions ({months[0]:%Y-%m} .. {months[-1]:%Y-%m}).")
+        return months
+
+
+def ensure_partitions(bind=engine, months_ahead: int = SALES_PARTITION_MONTHS_AHEAD):
+        """
+        Splits partitions for the months up to months_ahead after the current one out of pmax.
+        Returns the months created; a no-op when sales is not partitioned.
+        """
+        with bind.connect() as connection:
+            months = existing_partitions(connection)
+            if months is None:
+                return []
+            first = add_months(months[-1], 1) if months else month_start(date.today())
+            created = list(month_range(first, add_months(month_start(date.today()), months_ahead)))
+            if created:
+                definitions = ", ".join([_partition_definition(month) for month in created]
+                                        + [f"PARTITION {MAX_PARTITION} VALUES LESS THAN MAXVALUE"])
+                connection.execute(text(f"ALTER TABLE sales REORGANIZE PARTITION {MAX_PARTITION} INTO ({definitions})"))
+                connection.commit()
+                logger.info(f"Created sales partitions {', '.join(partition_name(month) for month in created)}.")
+        return created
+
+
+def archive_months(before: date, out_dir: str = SALES_ARCHIVE_DIR, export_format: str = "parquet"):
+        """
+        Moves every month of sales before the month of `before` to cold storage, oldest first:
+        the month is written to out_dir/sale_month=YYYY-MM/ (arrow_export.write_partitioned), the row
+        count is checked, a sales_archive row is committed, and only then is the month's partition
+        dropped (MySQL) or its rows deleted. Re-running after a failure resumes where it stopped.
+        Returns the list of models.SalesArchive rows written by this run.
+        """
+        arrow_export.require_pyarrow()
+        cutoff = month_start(before)
+        db = SessionLocal()
+        archived = []
+        try:
+            partitioned = existing_partitions(db.connection())
+            oldest = db.execute(select(func.min(models.Sale.sale_date))).scalar()
+            first = min(([month_start(oldest)] if oldest else []) + (partitioned or [])[:1], default=cutoff)
+            for month in month_range(first, add_months(cutoff, -1)):
+                start = datetime.combine(month, time.min)
+                end = datetime.combine(add_months(month, 1) - timedelta(days=1), time.max)
+                row_count, revenue = db.execute(
+                    select(func.count(models.Sale.id), func.coalesce(func.sum(models.Sale.total_revenue), 0.0))
+                    .where(models.Sale.sale_date >= start, models.Sale.sale_date <= end)
+                ).one()
+                record = db.get(models.SalesArchive, month)
+                if record is None and row_count:
+                    counts = arrow_export.write_partitioned(db, out_dir, export_format, "month", start_date=start, end_date=end)
+                    written = sum(counts.values())
+                    if written != row_count:
+                        raise RuntimeError(f"Archived {written} of {row_count} sales for {month:%Y-%m}; the month was left in place.")
+                    record = models.SalesArchive(month=month, path=os.path.join(out_dir, f"sale_month={month:%Y-%m}"),
+                                                 row_count=row_count, total_revenue=revenue)
+                    db.add(record)
+                    db.commit()
+                    db.refresh(record)
+                    db.expunge(record)
+                    archived.append(record)
+                    logger.info(f"Archived {row_count} sales for {month:%Y-%m} to {record.path}")
+                elif record is not None and row_count and row_count != record.row_count:
+                    raise RuntimeError(f"{month:%Y-%m} was archived with {record.row_count} sales but now has {row_count}; "
+                                       "archive the new rows manually before dropping it.")
+
+                if partitioned is not None and month in partitioned:
+                    db.execute(text(f"ALTER TABLE sales DROP PARTITION {partition_name(month)}"))
+                    db.commit()
+                elif row_count:
+                    _delete_range(db, start, end)
+        finally:
+            db.close()
+        return archived
+
+
+def _delete_range(db, start: datetime, end: datetime):
+        """Deletes one month of sales in primary-key batches, committing each."""
+        sales_table = models.Sale.__table__
+        while True:
+            ids = db.execute(select(sales_table.c.id)
+                             .where(sales_table.c.sale_date >= start, sales_table.c.sale_date <= end)
+                             .limit(ARCHIVE_DELETE_BATCH_SIZE)).scalars().all()
+            if not ids:
+                return
+            try:
+                db.execute(delete(sales_table).where(sales_table.c.id.in_(ids)))
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+
+
+    # --- Run partition maintenance ---
+if __name__ == "__main__":
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        parser = argparse.ArgumentParser(description="Monthly partitioning and archival of the sales table.")
+        parser.add_argument("command", choices=("setup", "ensure", "archive"))
+        parser.add_argument("--months-ahead", type=int, default=SALES_PARTITION_MONTHS_AHEAD,
+                            help="Future months to keep partitions for (setup, ensure)")
+        parser.add_argument("--before", type=lambda value: date.fromisoformat(value + "-01"), default=None,
+                            help="Archive every month before this one (YYYY-MM)")
+        parser.add_argument("--out", default=SALES_ARCHIVE_DIR, help="Cold storage directory for archived months")
+        parser.add_argument("--format", choices=arrow_export.FORMATS, default="parquet")
+        args = parser.parse_args()
+
+        if args.command == "setup":
+            partition_sales_table(months_ahead=args.months_ahead)
+        elif args.command == "ensure":
+            created = ensure_partitions(months_ahead=args.months_ahead)
+            logger.info(f"{len(created)} partitions created.")
+        else:
+            if args.before is None:
+                parser.error("archive requires --before YYYY-MM")
+            records = archive_months(args.before, args.out, args.format)
+            logger.info(f"Archived {len(records)} months ({sum(record.row_count for record in records)} sales).")
@@ -0,0 +1,83 @@
+import threading
+import time
+from bisect import bisect_left
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+# Upper bounds (ms) of the checkout latency histogram buckets; the last bucket is open-ended.
+CHECKOUT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class PoolMetrics:
+    """Thread-safe counters for connection checkouts from an instrumented pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.total_wait_ms = 0.0
+            self.max_wait_ms = 0.0
+            self.buckets = [0] * (len(CHECKOUT_BUCKETS_MS) + 1)
+
+    def observe(self, wait_ms: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                self.buckets[bisect_left(CHECKOUT_BUCKETS_MS, wait_ms)] += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            histogram = {f"le_{bound}ms": count for bound, count in zip(CHECKOUT_BUCKETS_MS, self.buckets)}
+            histogram["gt_%dms" % CHECKOUT_BUCKETS_MS[-1]] = self.buckets[-1]
+            return {
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.timeouts,
+                "avg_checkout_wait_ms": round(self.total_wait_ms / attempts, 3) if attempts else 0.0,
+                "max_checkout_wait_ms": round(self.max_wait_ms, 3),
+                "checkout_latency_histogram": histogram,
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout takes (queue wait + connect + pre-ping)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.metrics.observe((time.perf_counter() - start) * 1000, timed_out=True)
+            raise
+        self.metrics.observe((time.perf_counter() - start) * 1000)
+        return connection
+
+
+def pool_status(pool) -> dict:
+    """Live occupancy of a QueuePool-style pool, plus checkout metrics when instrumented."""
+    status = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+            "timeout_seconds": pool.timeout(),
+        })
+    if isinstance(pool, InstrumentedQueuePool):
+        status.update(pool.metrics.snapshot())
+    return status
@@ -1,222 +1,335 @@
-import random
-import logging
-from datetime import datetime, timedelta, time
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError # To handle potential unique constraint violations
-
-    # Import necessary components from your project
-from database import SessionLocal, engine # Use the same session/engine setup
-import models
-import schemas
-import crud # We can use CRUD functions to add data
-
-    # --- Configure Logging ---
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-logger = logging.getLogger(__name__)
-
-    # --- Sample Data ---
-    # More realistic product names and categories
-PRODUCT_DATA = [
-        {"name": "Wireless Noise Cancelling Headphones", "category": "Electronics", "price": 149.99, "desc": "Over-ear headphones with active noise cancellation and 30-hour battery life."},
-        {"name": "Smart LED TV 55-Inch 4K UHD", "category": "Electronics", "price": 479.00, "desc": "Ultra high definition smart TV with built-in streaming apps (Netflix, Hulu, etc.)."},
-        {"name": "Organic Cotton T-Shirt (White)", "category": "Apparel", "price": 19.95, "desc": "Soft and breathable 100% GOTS certified organic cotton t-shirt."},
-        {"name": "Men's Running Shoes Size 10", "category": "Footwear", "price": 85.50, "desc": "Lightweight and supportive running shoes with breathable mesh upper."},
-        {"name": "Stainless Steel Water Bottle 1L", "category": "Home & Kitchen", "price": 22.00, "desc": "Double-wall insulated vacuum flask, keeps drinks cold for 24 hours or hot for 12 hours. BPA-free."},
-        {"name": "Non-Stick Frying Pan Set (3-Piece)", "category": "Home & Kitchen", "price": 45.99, "desc": "Durable non-stick ceramic coated pans (8-inch, 10-inch, 12-inch) for everyday cooking."},
-        {"name": "Yoga Mat Extra Thick (6mm)", "category": "Sports & Outdoors", "price": 29.99, "desc": "Comfortable and non-slip TPE yoga mat with carrying strap."},
-        {"name": "Laptop Backpack with USB Charging Port", "category": "Accessories", "price": 39.99, "desc": "Water-resistant durable backpack with padded laptop compartment (up to 15.6 inch) and external USB port."},
-        {"name": "Instant Read Meat Thermometer", "category": "Home & Kitchen", "price": 15.75, "desc": "Digital food thermometer with backlight and magnet. Reads temperature in 3-5 seconds."},
-        {"name": "Scented Soy Candle (Lavender)", "category": "Home Decor", "price": 12.50, "desc": "Relaxing lavender essential oil scented candle made from natural soy wax. 45-hour burn time."},
-        {"name": "Bluetooth Speaker Portable Waterproof", "category": "Electronics", "price": 35.00, "desc": "Compact portable speaker with IPX7 waterproof rating and 12-hour playtime."},
-        {"name": "Electric Kettle 1.7L Fast Boil", "category": "Home & Kitchen", "price": 28.99, "desc": "Stainless steel electric kettle with auto shut-off and boil-dry protection."},
-    ]
-
-    # --- Helper Functions ---
-def get_random_datetime(start_date, end_date):
-        """Generates a random datetime between start_date and end_date."""
-        time_between_dates = end_date - start_date
-        # Ensure time difference is positive
-        if time_between_dates.total_seconds() <= 0:
-            return start_date # Or handle error appropriately
-        seconds_between_dates = time_between_dates.total_seconds()
-        random_number_of_seconds = random.randrange(int(seconds_between_dates))
-        random_date = start_date + timedelta(seconds=random_number_of_seconds)
-        return random_date
-
-    # --- Main Population Logic ---
-def populate():
-        logger.info("--- Starting database population ---")
-        db: Session = SessionLocal() # Get a new session
-
-        created_products_map = {} # Store created products by name for quick lookup
-
-        try:
-            # 1. Create Products and Initial Inventory
-            logger.info("Step 1: Creating products and initial inventory...")
-            for item in PRODUCT_DATA:
-                product_name = item['name']
-                logger.info(f"  Processing product: {product_name}")
-
-                # Check if product already exists in this run or in DB
-                if product_name in created_products_map:
-                    logger.info(f"    Product '{product_name}' already processed in this run. Skipping.")
-                    continue
-
-                existing_product = crud.get_product_by_name(db, name=product_name)
-                if existing_product:
-                    logger.info(f"    Product '{product_name}' already exists in DB (ID: {existing_product.id}). Skipping creation.")
-                    created_products_map[product_name] = existing_product # Store existing product
-                    continue
-
-                # Create product using schema
-                product_in = schemas.ProductCreate(
-                    name=product_name,
-                    description=item.get('desc'), # Use get with default None
-                    category=item.get('category', 'Uncategorized'), # Provide default category
-                    price=item['price'],
-                    initial_quantity=random.randint(20, 150), # Random initial stock (adjusted range)
-                    low_stock_threshold=random.randint(5, 15)  # Random low stock threshold (adjusted range)
-                )
-                try:
-                    # Use the CRUD function to create product and inventory
-                    created_product = crud.create_product(db=db, product=product_in)
-                    if created_product:
-                        created_products_map[product_name] = created_product
-                        logger.info(f"    Successfully created product '{created_product.name}' with ID {created_product.id}")
-                    else:
-                        # This case might happen if there's a race condition not caught above
-                        logger.warning(f"    Failed to create product '{product_name}' (CRUD function returned None). Might be duplicate.")
-                        db.rollback() # Rollback potential partial changes
-
-                except IntegrityError:
-                    db.rollback() # Rollback the specific failed transaction
-                    logger.warning(f"    IntegrityError: Product '{product_name}' likely already exists (concurrent creation?). Skipping.")
-                except ValueError as ve:
-                     db.rollback()
-                     logger.error(f"    ValueError creating product '{product_name}': {ve}")
-                except Exception as e:
-                     db.rollback()
-                     logger.error(f"    Unexpected error creating product '{product_name}': {e}", exc_info=True)
-
-
-            # Get list of product objects that were successfully created or found
-            available_products = list(created_products_map.values())
-            if not available_products:
-                logger.warning("No products available in the database to generate sales for. Exiting population script.")
-                return # Exit if no products were created or found
-
-            logger.info(f"Total available products for sales generation: {len(available_products)}")
-
-            # 2. Create Sales Data
-            logger.info("\nStep 2: Creating sales data...")
-            num_sales_to_create = 500 # Create more sales records
-            sales_created_count = 0
-            sales_skipped_stock = 0
-            # Sales over the last 6 months for more data
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=180)
-
-            for i in range(num_sales_to_create):
-                # Select a random product
-                if not available_products:
-                    logger.warning("Ran out of available products for sales.")
-                    break
-                product_to_sell = random.choice(available_products)
-
-                # Determine quantity to sell
-                sell_qty = random.randint(1, 3) # Sell smaller quantities more often
-
-                sale_in = schemas.SaleCreate(
-                    product_id=product_to_sell.id,
-                    quantity_sold=sell_qty
-                )
-
-                try:
-                    # Use the CRUD function to create the sale and update inventory
-                    # This function now includes the stock check
-                    sale = crud.create_sale(db=db, sale=sale_in)
-
-                    # Manually set a random sale date *after* creating the sale record
-                    # because crud.create_sale uses the DB default (current time) initially.
-                    random_sale_date = get_random_datetime(start_date, end_date)
-                    sale.sale_date = random_sale_date
-                    db.add(sale) # Add the modified sale object back to the session
-                    db.commit() # Commit the date change
-                    # db.refresh(sale) # Refresh not strictly needed after commit unless reading back immediately
-
-                    sales_created_count += 1
-                    if sales_created_count % 100 == 0: # Print progress periodically
-                         logger.info(f"  Created {sales_created_count}/{num_sales_to_create} sales records...")
-
-                except ValueError as e:
-                     # Catch insufficient stock errors specifically
-                     if "Insufficient stock" in str(e):
-                         sales_skipped_stock += 1
-                         # Optionally remove product from available list if consistently out of stock
-                         # available_products.remove(product_to_sell)
-                     else:
-                         logger.warning(f"  Skipping sale for '{product_to_sell.name}': {e}")
-                     db.rollback() # Rollback the failed sale attempt
-                except Exception as e:
-                     db.rollback()
-                     logger.error(f"  Error creating sale for product ID {product_to_sell.id}: {e}", exc_info=True)
-
-
-            logger.info(f"\nFinished creating sales records.")
-            logger.info(f"  Successfully created: {sales_created_count}")
-            logger.info(f"  Skipped due to insufficient stock: {sales_skipped_stock}")
-
-            # 3. Optional: Simulate some inventory updates (e.g., restocking)
-            logger.info("\nStep 3: Simulating inventory updates (restocking)...")
-            restock_count = 0
-            # Get products again to ensure we have latest state if needed
-            products_to_consider_restock = crud.get_products(db, limit=len(available_products) + 5) # Fetch slightly more
-            for product in products_to_consider_restock:
-                # Restock about 25% of the products randomly
-                if random.random() < 0.25:
-                    restock_qty = random.randint(10, 50)
-                    # Need current quantity to add to it
-                    current_inventory = crud.get_inventory(db, product.id)
-                    if not current_inventory:
-                        logger.warning(f"  Cannot restock '{product.name}', inventory record missing.")
-                        continue
-
-                    new_quantity = current_inventory.quantity + restock_qty
-                    inventory_update = schemas.InventoryUpdate(quantity=new_quantity)
-                    try:
-                        updated = crud.update_inventory(db, product_id=product.id, inventory_update=inventory_update)
-                        if updated:
-                            logger.info(f"  Restocked '{product.name}' by {restock_qty} units. New quantity: {updated.quantity}")
-                            restock_count += 1
-                        else:
-                            logger.warning(f"  Restock failed for '{product.name}' (update returned None).")
-                            db.rollback()
-                    except Exception as e:
-                        logger.error(f"  Error restocking '{product.name}': {e}", exc_info=True)
-                        db.rollback()
-
-            logger.info(f"Simulated {restock_count} restocking events.")
-
-
-            logger.info("\n--- Database population script finished successfully. ---")
-
-        except Exception as e:
-            db.rollback() # Rollback any changes if a major error occurs during the process
-            logger.error(f"\n--- An error occurred during database population: {e} ---", exc_info=True)
-        finally:
-            db.close() # Always close the session
-            logger.info("Database session closed.")
-
-
-    # --- Run the population script ---
-if __name__ == "__main__":
-        logger.info("Running database population script...")
-        # Optional: Add confirmation step?
-        # confirm = input("This will add demo data to the database defined in .env. Proceed? (y/n): ")
-        # if confirm.lower() == 'y':
-        #     populate()
-        # else:
-        #     logger.info("Population cancelled by user.")
-        populate() # Run directly
-        logger.info("Script execution complete.")
-    
\ No newline at end of file
+import argparse
+import random
+import logging
+import time as timer
+from datetime import datetime, timedelta, time
+import numpy as np
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError # To handle potential unique constraint violations
+
+    # Import necessary components from your project
+from database import SessionLocal, engine # Use the same session/engine setup
+import models
+import schemas
+import crud # We can use CRUD functions to add data
+
+    # --- Configure Logging ---
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+    # --- Sample Data ---
+    # More realistic product names and categories
+PRODUCT_DATA = [
+        {"name": "Wireless Noise Cancelling Headphones", "category": "Electronics", "price": 149.99, "desc": "Over-ear headphones with active noise cancellation and 30-hour battery life."},
+        {"name": "Smart LED TV 55-Inch 4K UHD", "category": "Electronics", "price": 479.00, "desc": "Ultra high definition smart TV with built-in streaming apps (Netflix, Hulu, etc.)."},
+        {"name": "Organic Cotton T-Shirt (White)", "category": "Apparel", "price": 19.95, "desc": "Soft and breathable 100% GOTS certified organic cotton t-shirt."},
+        {"name": "Men's Running Shoes Size 10", "category": "Footwear", "price": 85.50, "desc": "Lightweight and supportive running shoes with breathable mesh upper."},
+        {"name": "Stainless Steel Water Bottle 1L", "category": "Home & Kitchen", "price": 22.00, "desc": "Double-wall insulated vacuum flask, keeps drinks cold for 24 hours or hot for 12 hours. BPA-free."},
+        {"name": "Non-Stick Frying Pan Set (3-Piece)", "category": "Home & Kitchen", "price": 45.99, "desc": "Durable non-stick ceramic coated pans (8-inch, 10-inch, 12-inch) for everyday cooking."},
+        {"name": "Yoga Mat Extra Thick (6mm)", "category": "Sports & Outdoors", "price": 29.99, "desc": "Comfortable and non-slip TPE yoga mat with carrying strap."},
+        {"name": "Laptop Backpack with USB Charging Port", "category": "Accessories", "price": 39.99, "desc": "Water-resistant durable backpack with padded laptop compartment (up to 15.6 inch) and external USB port."},
+        {"name": "Instant Read Meat Thermometer", "category": "Home & Kitchen", "price": 15.75, "desc": "Digital food thermometer with backlight and magnet. Reads temperature in 3-5 seconds."},
+        {"name": "Scented Soy Candle (Lavender)", "category": "Home Decor", "price": 12.50, "desc": "Relaxing lavender essential oil scented candle made from natural soy wax. 45-hour burn time."},
+        {"name": "Bluetooth Speaker Portable Waterproof", "category": "Electronics", "price": 35.00, "desc": "Compact portable speaker with IPX7 waterproof rating and 12-hour playtime."},
+        {"name": "Electric Kettle 1.7L Fast Boil", "category": "Home & Kitchen", "price": 28.99, "desc": "Stainless steel electric kettle with auto shut-off and boil-dry protection."},
+    ]
+
+    # --- Helper Functions ---
+def get_random_datetime(start_date, end_date):
+        """Generates a random datetime between start_date and end_date."""
+        time_between_dates = end_date - start_date
+        # Ensure time difference is positive
+        if time_between_dates.total_seconds() <= 0:
+            return start_date # Or handle error appropriately
+        seconds_between_dates = time_between_dates.total_seconds()
+        random_number_of_seconds = random.randrange(int(seconds_between_dates))
+        random_date = start_date + timedelta(seconds=random_number_of_seconds)
+        return random_date
+
+    # --- Main Population Logic ---
+def populate():
+        logger.info("--- Starting database population ---")
+        db: Session = SessionLocal() # Get a new session
+
+        created_products_map = {} # Store created products by name for quick lookup
+
+        try:
+            # 1. Create Products and Initial Inventory
+            logger.info("Step 1: Creating products and initial inventory...")
+            for item in PRODUCT_DATA:
+                product_name = item['name']
+                logger.info(f"  Processing product: {product_name}")
+
+                # Check if product already exists in this run or in DB
+                if product_name in created_products_map:
+                    logger.info(f"    Product '{product_name}' already processed in this run. Skipping.")
+                    continue
+
+                existing_product = crud.get_product_by_name(db, name=product_name)
+                if existing_product:
+                    logger.info(f"    Product '{product_name}' already exists in DB (ID: {existing_product.id}). Skipping creation.")
+                    created_products_map[product_name] = existing_product # Store existing product
+                    continue
+
+                # Create product using schema
+                product_in = schemas.ProductCreate(
+                    name=product_name,
+                    description=item.get('desc'), # Use get with default None
+                    category=item.get('category', 'Uncategorized'), # Provide default category
+                    price=item['price'],
+                    initial_quantity=random.randint(20, 150), # Random initial stock (adjusted range)
+                    low_stock_threshold=random.randint(5, 15)  # Random low stock threshold (adjusted range)
+                )
+                try:
+                    # Use the CRUD function to create product and inventory
+                    created_product = crud.create_product(db=db, product=product_in)
+                    if created_product:
+                        created_products_map[product_name] = created_product
+                        logger.info(f"    Successfully created product '{created_product.name}' with ID {created_product.id}")
+                    else:
+                        # This case might happen if there's a race condition not caught above
+                        logger.warning(f"    Failed to create product '{product_name}' (CRUD function returned None). Might be duplicate.")
+                        db.rollback() # Rollback potential partial changes
+
+                except IntegrityError:
+                    db.rollback() # Rollback the specific failed transaction
+                    logger.warning(f"    IntegrityError: Product '{product_name}' likely already exists (concurrent creation?). Skipping.")
+                except ValueError as ve:
+                     db.rollback()
+                     logger.error(f"    ValueError creating product '{product_name}': {ve}")
+                except Exception as e:
+                     db.rollback()
+                     logger.error(f"    Unexpected error creating product '{product_name}': {e}", exc_info=True)
+
+
+            # Get list of product objects that were successfully created or found
+            available_products = list(created_products_map.values())
+            if not available_products:
+                logger.warning("No products available in the database to generate sales for. Exiting population script.")
+                return # Exit if no products were created or found
+
+            logger.info(f"Total available products for sales generation: {len(available_products)}")
+
+            # 2. Create Sales Data
+            logger.info("\nStep 2: Creating sales data...")
+            num_sales_to_create = 500 # Create more sales records
+            sales_created_count = 0
+            sales_skipped_stock = 0
+            # Sales over the last 6 months for more data
+            end_date = datetime.now()
+            start_date = end_date - timedelta(days=180)
+
+            for i in range(num_sales_to_create):
+                # Select a random product
+                if not available_products:
+                    logger.warning("Ran out of available products for sales.")
+                    break
+                product_to_sell = random.choice(available_products)
+
+                # Determine quantity to sell
+                sell_qty = random.randint(1, 3) # Sell smaller quantities more often
+
+                sale_in = schemas.SaleCreate(
+                    product_id=product_to_sell.id,
+                    quantity_sold=sell_qty
+                )
+
+                try:
+                    # Use the CRUD function to create the sale and update inventory
+                    # This function now includes the stock check
+                    sale = crud.create_sale(db=db, sale=sale_in)
+
+                    # Manually set a random sale date *after* creating the sale record
+                    # because crud.create_sale uses the DB default (current time) initially.
+                    random_sale_date = get_random_datetime(start_date, end_date)
+                    sale.sale_date = random_sale_date
+                    db.add(sale) # Add the modified sale object back to the session
+                    db.commit() # Commit the date change
+                    # db.refresh(sale) # Refresh not strictly needed after commit unless reading back immediately
+
+                    sales_created_count += 1
+                    if sales_created_count % 100 == 0: # Print progress periodically
+                         logger.info(f"  Created {sales_created_count}/{num_sales_to_create} sales records...")
+
+                except ValueError as e:
+                     # Catch insufficient stock errors specifically
+                     if "Insufficient stock" in str(e):
+                         sales_skipped_stock += 1
+                         # Optionally remove product from available list if consistently out of stock
+                         # available_products.remove(product_to_sell)
+                     else:
+                         logger.warning(f"  Skipping sale for '{product_to_sell.name}': {e}")
+                     db.rollback() # Rollback the failed sale attempt
+                except Exception as e:
+                     db.rollback()
+                     logger.error(f"  Error creating sale for product ID {product_to_sell.id}: {e}", exc_info=True)
+
+
+            logger.info(f"\nFinished creating sales records.")
+            logger.info(f"  Successfully created: {sales_created_count}")
+            logger.info(f"  Skipped due to insufficient stock: {sales_skipped_stock}")
+
+            # 3. Optional: Simulate some inventory updates (e.g., restocking)
+            logger.info("\nStep 3: Simulating inventory updates (restocking)...")
+            # Get products again to ensure we have latest state if needed
+            products_to_consider_restock = crud.get_products_rows(db, limit=len(available_products) + 5) # Fetch slightly more
+            # Restock about 25% of the products randomly, as one bulk adjustment (one transaction)
+            adjustments = [schemas.InventoryAdjustment(product_id=product["id"], delta=random.randint(10, 50))
+                           for product in products_to_consider_restock if random.random() < 0.25]
+            restock_count = 0
+            if adjustments:
+                try:
+                    results = crud.adjust_inventory_bulk(db, adjustments)
+                    for result in results:
+                        if result.accepted:
+                            logger.info(f"  Restocked product {result.product_id}. New quantity: {result.quantity}")
+                            restock_count += 1
+                        else:
+                            logger.warning(f"  Restock failed for product {result.product_id}: {result.detail}")
+                except Exception as e:
+                    logger.error(f"  Error restocking products: {e}", exc_info=True)
+
+            logger.info(f"Simulated {restock_count} restocking events.")
+
+            # 4. Rebuild the revenue rollup, since sale dates were rewritten after creation
+            logger.info("\nStep 4: Rebuilding daily revenue rollup...")
+            rollup_rows = crud.rebuild_daily_revenue(db)
+            logger.info(f"Wrote {rollup_rows} daily_revenue rows.")
+
+
+            logger.info("\n--- Database population script finished successfully. ---")
+
+        except Exception as e:
+            db.rollback() # Rollback any changes if a major error occurs during the process
+            logger.error(f"\n--- An error occurred during database population: {e} ---", exc_info=True)
+        finally:
+            db.close() # Always close the session
+            logger.info("Database session closed.")
+
+
+    # --- Bulk Load (synthetic data for load tests) ---
+BULK_BATCH_SIZE = 50000
+BULK_CATEGORIES = ["Electronics", "Apparel", "Footwear", "Home & Kitchen", "Sports & Outdoors",
+                   "Accessories", "Home Decor", "Books", "Toys", "Beauty", "Grocery", "Garden"]
+
+def _insert_batches(db: Session, table, columns, arrays, batch_size: int, label: str = None):
+        """Inserts parallel column arrays with executemany, one transaction per batch."""
+        total = len(arrays[0])
+        for start in range(0, total, batch_size):
+            rows = [dict(zip(columns, values))
+                    for values in zip(*[array[start:start + batch_size].tolist() for array in arrays])]
+            db.execute(insert(table), rows)
+            db.commit()
+            if label:
+                logger.info(f"  {min(start + batch_size, total)}/{total} {label}")
+
+def bulk_load(num_products: int = 1000, num_sales: int = 1000000, days: int = 365, skew: float = 1.1,
+              seed: int = 42, batch_size: int = BULK_BATCH_SIZE, end_date: datetime = None):
+        """
+        Generates synthetic products, inventory and sales with numpy and inserts them in executemany
+        batches, bypassing the per-row crud paths, then rebuilds the daily revenue rollup.
+        Product popularity follows a Zipf-like law (weight of the k-th most popular product is 1/k**skew,
+        0 = uniform); sales are spread uniformly over `days` days ending at end_date and inserted in
+        date order. The same seed (and end_date) produces the same data.
+        With num_products=0, sales are generated for the products already in the database.
+        Seeded sales are history: they do not decrement the (independently generated) inventory.
+        """
+        rng = np.random.default_rng(seed)
+        end_date = end_date or datetime.combine(datetime.now().date(), time.min)
+        start_date = end_date - timedelta(days=days)
+        db: Session = SessionLocal()
+        started = timer.perf_counter()
+        try:
+            # 1. Products and inventory
+            if num_products:
+                names = np.array([f"Synthetic Product {seed}-{i:08d}" for i in range(num_products)])
+                if db.query(models.Product.id).filter(models.Product.name == names[0].item()).first():
+                    raise ValueError(f"Synthetic products for seed {seed} already exist; use another --seed or a fresh database.")
+                categories = rng.choice(np.array(BULK_CATEGORIES), size=num_products)
+                prices = np.round(np.clip(rng.lognormal(mean=3.3, sigma=1.0, size=num_products), 1, 5000), 2)
+                logger.info(f"Step 1: Inserting {num_products} products...")
+                _insert_batches(db, models.Product.__table__, ("name", "category", "price"),
+                                (names, categories, prices), batch_size, label="products")
+
+                rows = db.execute(select(models.Product.id, models.Product.name)
+                                  .where(models.Product.name.like(f"Synthetic Product {seed}-%"))).all()
+                ids_by_name = {name: pid for pid, name in rows}
+                product_ids = np.array([ids_by_name[name] for name in names.tolist()])
+                quantities = rng.integers(0, 500, size=num_products)
+                thresholds = rng.integers(5, 16, size=num_products)
+                _insert_batches(db, models.Inventory.__table__,
+                                ("product_id", "quantity", "low_stock_threshold", "is_low_stock"),
+                                (product_ids, quantities, thresholds, quantities <= thresholds), batch_size, label="inventory rows")
+                categories = np.array([models.normalize_lookup(category) for category in categories.tolist()])
+            else:
+                rows = db.execute(select(models.Product.id, models.Product.price, models.Product.category_norm)
+                                  .order_by(models.Product.id)).all()
+                if not rows:
+                    raise ValueError("No products in the database; pass --products to create some.")
+                product_ids = np.array([row.id for row in rows])
+                prices = np.array([row.price for row in rows])
+                categories = np.array([row.category_norm for row in rows])
+            logger.info(f"  Products ready after {timer.perf_counter() - started:.1f}s")
+
+            # 2. Sales, one date slice per batch so rows arrive in sale_date order
+            n = len(product_ids)
+            weights = 1.0 / np.arange(1, n + 1) ** skew
+            weights /= weights.sum()
+            popularity = rng.permutation(n) # Popularity rank -> product index
+            span_seconds = int((end_date - start_date).total_seconds())
+            sales_table = models.Sale.__table__
+            logger.info(f"Step 2: Inserting {num_sales} sales from {start_date} to {end_date} (skew {skew})...")
+            for start in range(0, num_sales, batch_size):
+                size = min(batch_size, num_sales - start)
+                low = span_seconds * start // num_sales
+                high = max(span_seconds * (start + size) // num_sales, low + 1)
+                index = popularity[rng.choice(n, size=size, p=weights)]
+                quantity = rng.integers(1, 4, size=size)
+                price = prices[index]
+                seconds = np.sort(rng.integers(low, high, size=size))
+                sale_dates = np.datetime64(start_date, 's') + seconds.astype('timedelta64[s]')
+                _insert_batches(db, sales_table,
+                                ("product_id", "quantity_sold", "sale_price_per_unit", "total_revenue", "sale_date", "category"),
+                                (product_ids[index], quantity, price, np.round(quantity * price, 2), sale_dates,
+                                 categories[index]), size)
+                done = start + size
+                elapsed = timer.perf_counter() - started
+                logger.info(f"  {done}/{num_sales} sales ({done / elapsed:,.0f} rows/s overall)")
+
+            # 3. Revenue rollup for the loaded range
+            logger.info("Step 3: Rebuilding daily revenue rollup...")
+            rollup_rows = crud.rebuild_daily_revenue(db, start_date=start_date.date(), end_date=end_date.date())
+            logger.info(f"Wrote {rollup_rows} daily_revenue rows.")
+            logger.info(f"--- Bulk load finished in {timer.perf_counter() - started:.1f}s ---")
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+    # --- Run the population script ---
+if __name__ == "__main__":
+        # Example: python populate_db.py --bulk --products 10000 --sales 10000000 --days 730 --skew 1.2 --seed 7
+        parser = argparse.ArgumentParser(description="Populate the database with demo data, or bulk-load synthetic data for load tests.")
+        parser.add_argument("--bulk", action="store_true", help="Generate synthetic data in batches instead of the small demo data set")
+        parser.add_argument("--products", type=int, default=1000, help="Products to create with --bulk (0 = use existing products)")
+        parser.add_argument("--sales", type=int, default=1000000, help="Sales to create with --bulk")
+        parser.add_argument("--days", type=int, default=365, help="Days of sales history ending today")
+        parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent for product popularity (0 = uniform)")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed; the same seed reproduces the same data")
+        parser.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE, help="Rows per INSERT batch / transaction")
+        args = parser.parse_args()
+
+        if args.bulk:
+            logger.info("Running bulk load...")
+            try:
+                bulk_load(num_products=args.products, num_sales=args.sales, days=args.days, skew=args.skew,
+                          seed=args.seed, batch_size=args.batch_size)
+            except ValueError as e:
+                logger.error(f"Bulk load aborted: {e}")
+        else:
+            logger.info("Running database population script...")
+            populate() # Run directly
+        logger.info("Script execution complete.")
@@ -0,0 +1,178 @@
+import contextvars
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+from sqlalchemy import event
+
+logger = logging.getLogger("query_metrics")
+
+# Per-request DB instrumentation.
+#
+# instrument(engine) hooks the engine's cursor events; QueryMetricsMiddleware gives each HTTP request
+# its own RequestQueryStats through a contextvar (copied into the threadpool that runs sync endpoints,
+# and shared with AsyncSession.run_sync greenlets), so every statement is attributed to its request.
+# Each response gets a Server-Timing header:
+#   Server-Timing: db;dur=12.40;desc="5 queries", db-slowest;dur=9.10, app;dur=30.02
+# Statements slower than SLOW_QUERY_MS are logged (a SLOW_QUERY_SAMPLE_RATE fraction of them) as JSON
+# with their parameters, and so is a summary of every request that had one; REQUEST_LOG_SAMPLE_RATE
+# additionally logs a fraction of all requests. QUERY_METRICS_ENABLED=false turns all of it off.
+QUERY_METRICS_ENABLED = os.getenv("QUERY_METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+SLOW_QUERY_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_SAMPLE_RATE", "1.0"))
+REQUEST_LOG_SAMPLE_RATE = float(os.getenv("REQUEST_LOG_SAMPLE_RATE", "0.0"))
+MAX_LOGGED_STATEMENT_CHARS = 1000
+MAX_LOGGED_PARAMS_CHARS = 500
+
+
+class RequestQueryStats:
+    """Statements run on behalf of one request."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest_statement = None
+        self.slowest_parameters = None
+        self.slow_count = 0
+
+    def observe(self, statement: str, parameters, elapsed_ms: float):
+        with self._lock:
+            self.count += 1
+            self.total_ms += elapsed_ms
+            if elapsed_ms >= SLOW_QUERY_MS:
+                self.slow_count += 1
+            if elapsed_ms > self.slowest_ms or self.slowest_statement is None:
+                self.slowest_ms = elapsed_ms
+                self.slowest_statement = statement
+                self.slowest_parameters = parameters
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "db_queries": self.count,
+                "db_time_ms": round(self.total_ms, 3),
+                "slow_queries": self.slow_count,
+                "slowest_ms": round(self.slowest_ms, 3),
+                "slowest_statement": _truncate(self.slowest_statement, MAX_LOGGED_STATEMENT_CHARS),
+                "slowest_parameters": _truncate(_format_parameters(self.slowest_parameters), MAX_LOGGED_PARAMS_CHARS),
+            }
+
+
+_current = contextvars.ContextVar("request_query_stats", default=None)
+
+
+def current_stats():
+    """The RequestQueryStats of the request being handled, or None outside a request."""
+    return _current.get()
+
+
+def _truncate(text, limit: int):
+    if text is None or len(text) <= limit:
+        return text
+    return text[:limit] + "..."
+
+
+def _format_parameters(parameters):
+    if parameters is None:
+        return None
+    if isinstance(parameters, (list, tuple)) and parameters and isinstance(parameters[0], (list, tuple, dict)):
+        # executemany: the first row is enough to reproduce the plan
+        return f"{parameters[0]!r} (+{len(parameters) - 1} more rows)"
+    return repr(parameters)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["query_start_time"].pop()) * 1000
+    stats = _current.get()
+    if stats is not None:
+        stats.observe(statement, parameters, elapsed_ms)
+    if elapsed_ms >= SLOW_QUERY_MS and random.random() < SLOW_QUERY_SAMPLE_RATE:
+        logger.warning(json.dumps({
+            "event": "slow_query",
+            "duration_ms": round(elapsed_ms, 3),
+            "statement": _truncate(statement, MAX_LOGGED_STATEMENT_CHARS),
+            "parameters": _truncate(_format_parameters(parameters), MAX_LOGGED_PARAMS_CHARS),
+            "executemany": executemany,
+            "database": conn.engine.url.get_backend_name(),
+        }))
+
+
+def _handle_error(context):
+    # after_cursor_execute does not run for failed statements
+    if context.connection is not None:
+        starts = context.connection.info.get("query_start_time")
+        if starts:
+            starts.pop()
+
+
+def instrument(engine):
+    """Times every statement on the engine (a sync Engine, or an AsyncEngine's sync_engine)."""
+    if not QUERY_METRICS_ENABLED or engine is None:
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+class QueryMetricsMiddleware:
+    """
+    ASGI middleware that attributes DB statements to requests and reports them in a Server-Timing
+    header and in structured logs.
+    The header is sent with the response start, so statements a streaming response runs while
+    producing its body are only in the log.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not QUERY_METRICS_ENABLED:
+            return await self.app(scope, receive, send)
+        stats = RequestQueryStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                app_ms = (time.perf_counter() - started) * 1000
+                timing = f'db;dur={stats.total_ms:.2f};desc="{stats.count} queries", db-slowest;dur={stats.slowest_ms:.2f}, app;dur={app_ms:.2f}'
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            if stats.slow_count or random.random() < REQUEST_LOG_SAMPLE_RATE:
+                logger.info(json.dumps({
+                    "event": "request_queries",
+                    "method": scope.get("method"),
+                    "path": scope.get("path"),
+                    "status": status[0],
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                    **stats.snapshot(),
+                }))
+
+
+def parse_server_timing(header: str) -> dict:
+    """Parses this middleware's Server-Timing header into {"db_ms", "db_queries", "db_slowest_ms", "app_ms"}."""
+    metrics = {}
+    for metric in header.split(","):
+        name, *params = [part.strip() for part in metric.split(";")]
+        values = dict(param.split("=", 1) for param in params if "=" in param)
+        if "dur" in values:
+            metrics[{"db": "db_ms", "db-slowest": "db_slowest_ms", "app": "app_ms"}.get(name, name)] = float(values["dur"])
+        if name == "db" and "desc" in values:
+            metrics["db_queries"] = int(values["desc"].strip('"').split()[0])
+    return metrics
@@ -1,82 +1,193 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Path, Body
-from sqlalchemy.orm import Session
-from typing import List, Optional
-
-import crud
-import schemas
-from database import get_db
-
-    # Create an API router instance
-router = APIRouter(
-        prefix="/inventory", # All routes start with /inventory
-        tags=["Inventory"], # Tag for API docs
-        responses={404: {"description": "Inventory or Product not found"}},
-    )
-
-    # --- Endpoint to Get All Inventory Status ---
-@router.get("/", response_model=List[schemas.Inventory])
-def read_all_inventory_endpoint( # Renamed endpoint function
-        skip: int = Query(0, ge=0, description="Number of records to skip for pagination"),
-        limit: int = Query(100, ge=1, le=200, description="Maximum number of records to return"),
-        low_stock: bool = Query(False, description="Set to true to only return items at or below low stock threshold"),
-        db: Session = Depends(get_db)
-    ):
-        """
-        Retrieves a list of inventory records for all products.
-        Supports pagination and filtering for low stock items.
-        """
-        inventory_list = crud.get_all_inventory(db, skip=skip, limit=limit, low_stock=low_stock)
-        return inventory_list
-
-
-    # --- Endpoint to Get Inventory for a Specific Product ---
-@router.get("/{product_id}", response_model=schemas.Inventory)
-def read_product_inventory_endpoint( # Renamed endpoint function
-        product_id: int = Path(..., gt=0, description="The ID of the product whose inventory to retrieve"),
-        db: Session = Depends(get_db)
-    ):
-        """
-        Retrieves the current inventory status for a single product by its ID.
-        """
-        # First check if product exists to give a clearer error message
-        db_product = crud.get_product(db, product_id=product_id)
-        if not db_product:
-             raise HTTPException(status_code=404, detail=f"Product with ID {product_id} not found.")
-
-        db_inventory = crud.get_inventory(db, product_id=product_id)
-        if db_inventory is None:
-             # This case implies an inconsistency if product exists but inventory doesn't
-             # Log this situation as it might indicate a problem
-             print(f"WARNING: Product ID {product_id} exists but has no inventory record.")
-             raise HTTPException(status_code=404, detail=f"Inventory record for product ID {product_id} not found (data inconsistency?).")
-        return db_inventory
-
-
-    # --- Endpoint to Update Inventory for a Specific Product ---
-@router.put("/{product_id}", response_model=schemas.Inventory)
-def update_product_inventory_endpoint( # Renamed endpoint function
-        product_id: int = Path(..., gt=0, description="The ID of the product whose inventory to update"),
-        inventory_update: schemas.InventoryUpdate = Body(..., embed=True, description="Inventory fields to update (quantity and/or low_stock_threshold)"),
-        db: Session = Depends(get_db)
-    ):
-        """
-        Updates the inventory details (quantity, low stock threshold) for a specific product.
-        Provide only the fields you want to change.
-        """
-        # Check product exists first
-        db_product = crud.get_product(db, product_id=product_id)
-        if not db_product:
-             raise HTTPException(status_code=404, detail=f"Product with ID {product_id} not found.")
-
-        # Ensure at least one field is being updated
-        if not inventory_update.model_dump(exclude_unset=True):
-             raise HTTPException(status_code=400, detail="No update data provided.")
-
-        updated_inventory = crud.update_inventory(db=db, product_id=product_id, inventory_update=inventory_update)
-
-        if updated_inventory is None:
-            # This could happen if the inventory record somehow didn't exist, despite product existing
-            print(f"WARNING: update_inventory CRUD returned None for existing product ID {product_id}.")
-            raise HTTPException(status_code=404, detail=f"Inventory for product ID {product_id} could not be updated (possibly missing record).")
-
-        return updated_inventory
+from fastapi import APIRouter, Depends, HTTPException, Query, Path, Body, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+import asyncio
+
+import crud
+import crud_async
+import fast_json
+import low_stock
+import schemas
+from database import get_db, get_read_db, get_async_db, get_async_read_db
+
+    # Create an API router instance
+router = APIRouter(
+        prefix="/inventory", # All routes start with /inventory
+        tags=["Inventory"], # Tag for API docs
+        responses={404: {"description": "Inventory or Product not found"}},
+    )
+
+    # --- Endpoint to Get All Inventory Status ---
+@router.get("/", response_model=List[schemas.Inventory])
+def read_all_inventory_endpoint( # Renamed endpoint function
+        skip: int = Query(0, ge=0, description="Number of records to skip for pagination"),
+        limit: int = Query(100, ge=1, le=200, description="Maximum number of records to return"),
+        low_stock: bool = Query(False, description="Set to true to only return items at or below low stock threshold"),
+        cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's X-Next-Cursor header (keyset pagination; skip is ignored)"),
+        db: Session = Depends(get_read_db)
+    ):
+        """
+        Retrieves a list of inventory records for all products.
+        Supports pagination and filtering for low stock items.
+        When a full page is returned, the `X-Next-Cursor` response header holds the cursor for the next page.
+        """
+        try:
+            inventory_list = crud.get_all_inventory_rows(db, skip=skip, limit=limit, low_stock=low_stock, cursor=cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return fast_json.page_response(inventory_list, limit, lambda last: crud.encode_cursor(last["id"]))
+
+
+    # --- Endpoint to Stream Low Stock Threshold Crossings ---
+@router.get("/low-stock/stream")
+async def stream_low_stock_endpoint(request: Request):
+        """
+        Server-Sent Events stream of low stock threshold crossings.
+        Sends a `low_stock` event when a product's quantity drops to or below its threshold and a
+        `restocked` event when it rises above it again; comments are sent as keepalives.
+        """
+        queue = low_stock.notifier.subscribe()
+
+        async def events():
+            try:
+                yield "retry: 5000\n\n"
+                while True:
+                    try:
+                        event = await asyncio.wait_for(queue.get(), timeout=low_stock.LOW_STOCK_KEEPALIVE_SECONDS)
+                    except asyncio.TimeoutError:
+                        if await request.is_disconnected():
+                            break
+                        yield ": keepalive\n\n"
+                        continue
+                    yield low_stock.format_sse(event)
+            finally:
+                low_stock.notifier.unsubscribe(queue)
+
+        return StreamingResponse(events(), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+    # --- Endpoint to Get Inventory for a Specific Product ---
+@router.get("/{product_id}", response_model=schemas.Inventory)
+def read_product_inventory_endpoint( # Renamed endpoint function
+        product_id: int = Path(..., gt=0, description="The ID of the product whose inventory to retrieve"),
+        db: Session = Depends(get_db)
+    ):
+        """
+        Retrieves the current inventory status for a single product by its ID.
+        """
+        db_inventory = crud.get_inventory_cached(db, product_id=product_id)
+        if db_inventory is None:
+             # Check if product exists to give a clearer error message
+             if not crud.get_product_cached(db, product_id=product_id):
+                 raise HTTPException(status_code=404, detail=f"Product with ID {product_id} not found.")
+             # This case implies an inconsistency if product exists but inventory doesn't
+             # Log this situation as it might indicate a problem
+             print(f"WARNING: Product ID {product_id} exists but has no inventory record.")
+             raise HTTPException(status_code=404, detail=f"Inventory record for product ID {product_id} not found (data inconsistency?).")
+        return db_inventory
+
+
+    # --- Endpoint to Update Inventory for a Specific Product ---
+@router.put("/{product_id}", response_model=schemas.Inventory)
+def update_product_inventory_endpoint( # Renamed endpoint function
+        product_id: int = Path(..., gt=0, description="The ID of the product whose inventory to update"),
+        inventory_update: schemas.InventoryUpdate = Body(..., embed=True, description="Inventory fields to update (quantity and/or low_stock_threshold)"),
+        db: Session = Depends(get_db)
+    ):
+        """
+        Updates the inventory details (quantity, low stock threshold) for a specific product.
+        Provide only the fields you want to change.
+        """
+        # Check product exists first
+        db_product = crud.get_product_cached(db, product_id=product_id)
+        if not db_product:
+             raise HTTPException(status_code=404, detail=f"Product with ID {product_id} not found.")
+
+        # Ensure at least one field is being updated
+        if not inventory_update.model_dump(exclude_unset=True):
+             raise HTTPException(status_code=400, detail="No update data provided.")
+
+        updated_inventory = crud.update_inventory(db=db, product_id=product_id, inventory_update=inventory_update)
+
+        if updated_inventory is None:
+            # This could happen if the inventory record somehow didn't exist, despite product existing
+            print(f"WARNING: update_inventory CRUD returned None for existing product ID {product_id}.")
+            raise HTTPException(status_code=404, detail=f"Inventory for product ID {product_id} could not be updated (possibly missing record).")
+
+        return updated_inventory
+
+
+    # --- Endpoint to Adjust Inventory for Many Products ---
+MAX_BULK_ADJUSTMENTS = 10000
+
+@router.patch("/bulk", response_model=schemas.InventoryBulkAdjustResponse)
+def adjust_inventory_bulk_endpoint(
+        adjustments: List[schemas.InventoryAdjustment] = Body(..., embed=True, description="Adjustments to apply, e.g. a warehouse receipt"),
+        db: Session = Depends(get_db)
+    ):
+        """
+        Adjusts inventory for many products in a single transaction.
+        Each item sets an absolute `quantity` or applies a `delta`, and may change `low_stock_threshold`.
+        Items are applied in order; each is reported as accepted or rejected (unknown product,
+        stock would go negative, conflicting fields) without failing the batch.
+        """
+        if not adjustments:
+            raise HTTPException(status_code=400, detail="No adjustments provided.")
+        if len(adjustments) > MAX_BULK_ADJUSTMENTS:
+            raise HTTPException(status_code=400, detail=f"A bulk request may contain at most {MAX_BULK_ADJUSTMENTS} adjustments.")
+
+        try:
+            results = crud.adjust_inventory_bulk(db=db, adjustments=adjustments)
+        except Exception as e:
+            print(f"Error in adjust_inventory_bulk_endpoint: {e}") # Basic logging
+            raise HTTPException(status_code=500, detail="An internal error occurred while adjusting inventory.")
+
+        accepted = sum(1 for r in results if r.accepted)
+        return schemas.InventoryBulkAdjustResponse(
+            accepted=accepted,
+            rejected=len(results) - accepted,
+            results=results
+        )
+
+
+    # --- Async variants (DB_ASYNC_MODE) ---
+    # main.py includes this router ahead of `router` when async mode is enabled, so these
+    # endpoints take precedence for the same paths; the remaining endpoints stay sync.
+async_router = APIRouter(
+        prefix="/inventory",
+        tags=["Inventory"],
+        responses={404: {"description": "Inventory or Product not found"}},
+        include_in_schema=False, # Same contract as the sync endpoints documented above
+    )
+
+@async_router.get("/", response_model=List[schemas.Inventory])
+async def read_all_inventory_async_endpoint(
+        skip: int = Query(0, ge=0, description="Number of records to skip for pagination"),
+        limit: int = Query(100, ge=1, le=200, description="Maximum number of records to return"),
+        low_stock: bool = Query(False, description="Set to true to only return items at or below low stock threshold"),
+        cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's X-Next-Cursor header (keyset pagination; skip is ignored)"),
+        db: AsyncSession = Depends(get_async_read_db)
+    ):
+        """Async version of read_all_inventory_endpoint."""
+        try:
+            inventory_list = await crud_async.get_all_inventory(db, skip=skip, limit=limit, low_stock=low_stock, cursor=cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return fast_json.page_response(inventory_list, limit, lambda last: crud.encode_cursor(last["id"]))
+
+@async_router.get("/{product_id}", response_model=schemas.Inventory)
+async def read_product_inventory_async_endpoint(
+        product_id: int = Path(..., gt=0, description="The ID of the product whose inventory to retrieve"),
+        db: AsyncSession = Depends(get_async_db)
+    ):
+        """Async version of read_product_inventory_endpoint (served from the product/inventory caches when possible)."""
+        db_product = await crud_async.get_product_view(db, product_id=product_id)
+        if not db_product:
+             raise HTTPException(status_code=404, detail=f"Product with ID {product_id} not found.")
+        if db_product.inventory is None:
+             print(f"WARNING: Product ID {product_id} exists but has no inventory record.")
+             raise HTTPException(status_code=404, detail=f"Inventory record for product ID {product_id} not found (data inconsistency?).")
+        return db_product.inventory
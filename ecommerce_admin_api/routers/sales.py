@@ -1,202 +1,495 @@
-
-from fastapi import APIRouter, Depends, HTTPException, Query, Body
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import datetime, date, timedelta, time # Import time for combine
-
-import crud
-import schemas
-from database import get_db
-
-router = APIRouter(
-        prefix="/sales", # All routes start with /sales
-        tags=["Sales & Revenue"], # Tag for API docs
-        responses={404: {"description": "Resource not found"}}, # More generic 404
-    )
-
-@router.post("/", response_model=schemas.Sale, status_code=201)
-def record_sale_endpoint( # Renamed endpoint function
-        sale: schemas.SaleCreate = Body(..., embed=True, description="Details of the sale to record"),
-        db: Session = Depends(get_db)
-    ):
-        """
-        Records a new sale transaction.
-        This will automatically decrease the inventory count for the sold product.
-        The sale price is recorded based on the product's current price at the time of the sale.
-
-        - **product_id**: The ID of the product being sold.
-        - **quantity_sold**: The number of units sold (must be > 0).
-        """
-        try:
-            created_sale = crud.create_sale(db=db, sale=sale)
-            return created_sale
-        except ValueError as e:
-            if "not found" in str(e):
-                 raise HTTPException(status_code=404, detail=str(e))
-            else:
-                 raise HTTPException(status_code=400, detail=str(e))
-        except Exception as e:
-            # Log error e
-            print(f"Error in record_sale_endpoint: {e}") # Basic logging
-            raise HTTPException(status_code=500, detail="An internal error occurred while recording the sale.")
-
-@router.get("/", response_model=List[schemas.Sale])
-def read_sales_endpoint( # Renamed endpoint function
-        skip: int = Query(0, ge=0, description="Number of records to skip for pagination"),
-        limit: int = Query(100, ge=1, le=500, description="Maximum number of records to return"), # Allow more sales records
-        start_date: Optional[date] = Query(None, description="Filter sales from this date (YYYY-MM-DD)"),
-        end_date: Optional[date] = Query(None, description="Filter sales up to this date (YYYY-MM-DD)"),
-        product_id: Optional[int] = Query(None, gt=0, description="Filter sales by product ID"),
-        category: Optional[str] = Query(None, description="Filter sales by product category (case-insensitive)"),
-        db: Session = Depends(get_db)
-    ):
-        """
-        Retrieves a list of sales records, supporting pagination and filtering.
-        Filters can be applied by date range, product ID, and product category.
-        """
-        start_datetime: Optional[datetime] = None
-        end_datetime: Optional[datetime] = None
-        if start_date:
-            start_datetime = datetime.combine(start_date, time.min) # Start of the day
-        if end_date:
-            end_datetime = datetime.combine(end_date, time.max) # End of the day 23:59:59.999999
-
-        if start_datetime and end_datetime and start_datetime > end_datetime:
-             raise HTTPException(status_code=400, detail="Start date cannot be after end date.")
-
-        sales = crud.get_sales(
-            db, skip=skip, limit=limit,
-            start_date=start_datetime, end_date=end_datetime,
-            product_id=product_id, category=category
-        )
-        return sales
-
-@router.get("/revenue/summary", response_model=schemas.RevenueSummary)
-def get_revenue_summary_endpoint( # Renamed endpoint function
-        start_date: date = Query(..., description="Start date for revenue calculation (YYYY-MM-DD)"),
-        end_date: date = Query(..., description="End date for revenue calculation (YYYY-MM-DD)"),
-        product_id: Optional[int] = Query(None, gt=0, description="Optional: Filter revenue by product ID"),
-        category: Optional[str] = Query(None, description="Optional: Filter revenue by product category"),
-        db: Session = Depends(get_db)
-    ):
-        """
-        Calculates the total revenue generated within a specified date range.
-        Optionally filters by product ID or category.
-        """
-        if start_date > end_date:
-            raise HTTPException(status_code=400, detail="Start date cannot be after end date.")
-
-        start_datetime = datetime.combine(start_date, time.min)
-        end_datetime = datetime.combine(end_date, time.max)
-
-        total_revenue = crud.get_revenue_summary(
-            db, start_date=start_datetime, end_date=end_datetime,
-            product_id=product_id, category=category
-        )
-
-        return schemas.RevenueSummary(
-            period="custom", # Indicate it's a custom range based on query params
-            start_date=start_datetime,
-            end_date=end_datetime,
-            total_revenue=total_revenue
-        )
-
-
-@router.get("/revenue/analysis", response_model=List[schemas.RevenueSummary])
-def get_revenue_analysis_endpoint( # Renamed endpoint function
-        period: str = Query(..., pattern="^(day|week|month|year)$", description="Group revenue by 'day', 'week', 'month', or 'year'"),
-        start_date: date = Query(..., description="Start date for analysis (YYYY-MM-DD)"),
-        end_date: date = Query(..., description="End date for analysis (YYYY-MM-DD)"),
-        db: Session = Depends(get_db)
-    ):
-        """
-        Analyzes revenue over a specified date range, grouped by day, week, month, or year.
-        Returns a list of revenue summaries for each period within the range.
-        """
-        if start_date > end_date:
-            raise HTTPException(status_code=400, detail="Start date cannot be after end date.")
-
-        start_datetime = datetime.combine(start_date, time.min)
-        end_datetime = datetime.combine(end_date, time.max)
-
-        try:
-            revenue_data = crud.get_revenue_by_period(db, period=period, start_date=start_datetime, end_date=end_datetime)
-        except ValueError as e:
-            raise HTTPException(status_code=400, detail=str(e)) # Catch invalid period error
-        except Exception as e:
-            print(f"Error in get_revenue_analysis_endpoint: {e}") # Basic logging
-            raise HTTPException(status_code=500, detail="Error during revenue analysis.")
-
-
-        results = []
-        for period_start_dt, revenue in revenue_data:
-            period_end_dt = period_start_dt # Start with the beginning
-
-            if period == 'day':
-                period_end_dt = period_start_dt.replace(hour=23, minute=59, second=59, microsecond=999999)
-            elif period == 'week':
-                 period_end_dt = (period_start_dt + timedelta(days=6)).replace(hour=23, minute=59, second=59, microsecond=999999)
-            elif period == 'month':
-                next_month_start = (period_start_dt.replace(day=1) + timedelta(days=32)).replace(day=1)
-                period_end_dt = next_month_start - timedelta(microseconds=1)
-            elif period == 'year':
-                next_year_start = period_start_dt.replace(year=period_start_dt.year + 1, month=1, day=1)
-                period_end_dt = next_year_start - timedelta(microseconds=1)
-
-            actual_end_dt = min(period_end_dt, end_datetime)
-
-            results.append(schemas.RevenueSummary(
-                period=period,
-                start_date=period_start_dt,
-                end_date=actual_end_dt,
-                total_revenue=revenue
-            ))
-
-        return results
-
-
-@router.post("/revenue/comparison", response_model=schemas.RevenueComparisonResponse)
-def compare_revenue_endpoint( # Renamed endpoint function
-        request: schemas.RevenueComparisonRequest = Body(..., description="Details of the two periods to compare (use full datetime strings like 'YYYY-MM-DDTHH:MM:SS')"),
-        db: Session = Depends(get_db)
-    ):
-        """
-        Compares total revenue between two specified datetime periods.
-        Optionally filters by a specific product category for the comparison.
-        Requires precise start/end datetimes in the request body.
-        """
-        if request.period1_start >= request.period1_end or request.period2_start >= request.period2_end:
-            raise HTTPException(status_code=400, detail="Start datetime must be before end datetime in each period.")
-
-        try:
-            revenue1 = crud.get_revenue_summary(
-                db, start_date=request.period1_start, end_date=request.period1_end,
-                category=request.category
-            )
-            revenue2 = crud.get_revenue_summary(
-                db, start_date=request.period2_start, end_date=request.period2_end,
-                category=request.category
-            )
-        except Exception as e:
-             print(f"Error during revenue comparison calculation: {e}")
-             raise HTTPException(status_code=500, detail="Error calculating revenue for comparison.")
-
-
-        
-        difference = revenue2 - revenue1
-        percentage_change = None
-        if revenue1 != 0:
-            try:
-                percentage_change = (difference / revenue1) * 100
-            except ZeroDivisionError:
-                percentage_change = float('inf') if difference > 0 else float('-inf') if difference < 0 else 0.0
-
-
-        return schemas.RevenueComparisonResponse(
-            period1_revenue=revenue1,
-            period2_revenue=revenue2,
-            difference=difference,
-            percentage_change=percentage_change,
-            category=request.category
-        )
-    
\ No newline at end of file
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Body
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
+from typing import List, Optional
+from datetime import datetime, date, time # Import time for combine
+import csv
+import io
+import json
+
+import analytics
+import arrow_export
+import crud
+import crud_async
+import fast_json
+import sale_buffer
+import schemas
+from database import get_db, get_read_db, get_async_db, get_async_read_db, new_read_session
+
+router = APIRouter(
+        prefix="/sales", # All routes start with /sales
+        tags=["Sales & Revenue"], # Tag for API docs
+        responses={404: {"description": "Resource not found"}}, # More generic 404
+    )
+
+@router.post("/", response_model=schemas.Sale, status_code=201)
+def record_sale_endpoint( # Renamed endpoint function
+        sale: schemas.SaleCreate = Body(..., embed=True, description="Details of the sale to record"),
+        db: Session = Depends(get_db)
+    ):
+        """
+        Records a new sale transaction.
+        This will automatically decrease the inventory count for the sold product.
+        The sale price is recorded based on the product's current price at the time of the sale.
+        Returns HTTP 409 Conflict if there is not enough stock.
+
+        - **product_id**: The ID of the product being sold.
+        - **quantity_sold**: The number of units sold (must be > 0).
+        """
+        try:
+            created_sale = crud.create_sale(db=db, sale=sale)
+            return created_sale
+        except crud.InsufficientStockError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except IntegrityError as e:
+            # check_inventory_quantity_non_negative backstop
+            print(f"IntegrityError in record_sale_endpoint: {e}") # Basic logging
+            raise HTTPException(status_code=409, detail=f"Sale conflicts with current stock for product id {sale.product_id}.")
+        except ValueError as e:
+            if "not found" in str(e):
+                 raise HTTPException(status_code=404, detail=str(e))
+            else:
+                 raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            # Log error e
+            print(f"Error in record_sale_endpoint: {e}") # Basic logging
+            raise HTTPException(status_code=500, detail="An internal error occurred while recording the sale.")
+
+@router.post("/buffered", response_model=schemas.BufferedSale, status_code=202)
+def record_sale_buffered_endpoint(
+        sale: schemas.SaleCreate = Body(..., embed=True, description="Details of the sale to record"),
+        db: Session = Depends(get_db)
+    ):
+        """
+        Records a sale through the write-behind buffer (SALES_WRITE_BEHIND=true, see sale_buffer.py).
+        Stock is checked against the in-memory reservation and the sale is acknowledged as soon as it
+        is in the local write-ahead log; it reaches the sales table with the next group commit, so the
+        response carries the log sequence number instead of a sale id.
+        Returns HTTP 409 Conflict if there is not enough stock, 503 if write-behind is disabled.
+        """
+        if not sale_buffer.buffer.started:
+            raise HTTPException(status_code=503, detail="Write-behind sale ingestion is disabled (set SALES_WRITE_BEHIND=true).")
+        try:
+            return sale_buffer.buffer.submit(db, sale)
+        except crud.InsufficientStockError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except ValueError as e:
+            if "not found" in str(e):
+                 raise HTTPException(status_code=404, detail=str(e))
+            else:
+                 raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            print(f"Error in record_sale_buffered_endpoint: {e}") # Basic logging
+            raise HTTPException(status_code=500, detail="An internal error occurred while recording the sale.")
+
+MAX_BULK_SALE_LINES = 10000
+
+@router.post("/bulk", response_model=schemas.SaleBulkResponse)
+def record_sales_bulk_endpoint(
+        sales: List[schemas.SaleCreate] = Body(..., embed=True, description="Sale lines to record, e.g. a POS batch"),
+        db: Session = Depends(get_db)
+    ):
+        """
+        Records many sales in a single transaction.
+        Lines are checked in order against the remaining stock of their product; each line is
+        reported as accepted or rejected (unknown product, insufficient stock) without failing the batch.
+        All accepted lines share one sale timestamp.
+        """
+        if not sales:
+            raise HTTPException(status_code=400, detail="No sales provided.")
+        if len(sales) > MAX_BULK_SALE_LINES:
+            raise HTTPException(status_code=400, detail=f"A bulk request may contain at most {MAX_BULK_SALE_LINES} sales.")
+
+        try:
+            sale_date, results = crud.create_sales_bulk(db=db, sales=sales)
+        except Exception as e:
+            print(f"Error in record_sales_bulk_endpoint: {e}") # Basic logging
+            raise HTTPException(status_code=500, detail="An internal error occurred while recording the sales.")
+
+        accepted = sum(1 for r in results if r.accepted)
+        return schemas.SaleBulkResponse(
+            accepted=accepted,
+            rejected=len(results) - accepted,
+            sale_date=sale_date if accepted else None,
+            results=results
+        )
+
+@router.get("/", response_model=List[schemas.Sale])
+def read_sales_endpoint( # Renamed endpoint function
+        skip: int = Query(0, ge=0, description="Number of records to skip for pagination"),
+        limit: int = Query(100, ge=1, le=500, description="Maximum number of records to return"), # Allow more sales records
+        start_date: Optional[date] = Query(None, description="Filter sales from this date (YYYY-MM-DD)"),
+        end_date: Optional[date] = Query(None, description="Filter sales up to this date (YYYY-MM-DD)"),
+        product_id: Optional[int] = Query(None, gt=0, description="Filter sales by product ID"),
+        category: Optional[str] = Query(None, description="Filter sales by product category (case-insensitive)"),
+        cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's X-Next-Cursor header (keyset pagination; skip is ignored)"),
+        db: Session = Depends(get_read_db)
+    ):
+        """
+        Retrieves a list of sales records, supporting pagination and filtering.
+        Filters can be applied by date range, product ID, and product category.
+        When a full page is returned, the `X-Next-Cursor` response header holds the cursor for the next page.
+        Passing it back as `cursor` seeks on (sale_date, id), so deep pages are as fast as the first.
+        """
+        start_datetime: Optional[datetime] = None
+        end_datetime: Optional[datetime] = None
+        if start_date:
+            start_datetime = datetime.combine(start_date, time.min) # Start of the day
+        if end_date:
+            end_datetime = datetime.combine(end_date, time.max) # End of the day 23:59:59.999999
+
+        if start_datetime and end_datetime and start_datetime > end_datetime:
+             raise HTTPException(status_code=400, detail="Start date cannot be after end date.")
+
+        try:
+            sales = crud.get_sales_rows(
+                db, skip=skip, limit=limit,
+                start_date=start_datetime, end_date=end_datetime,
+                product_id=product_id, category=category, cursor=cursor
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return fast_json.page_response(sales, limit, lambda last: crud.encode_cursor(last["sale_date"], last["id"]))
+
+def _export_values(row):
+        return tuple(value.isoformat() if isinstance(value, datetime) else value for value in row)
+
+def _stream_sales_export(export_format: str, filters: dict):
+        """Yields the export body one batch at a time; owns its session since it outlives the request's dependencies."""
+        db = new_read_session()
+        try:
+            if export_format == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(crud.EXPORT_COLUMNS)
+                yield buffer.getvalue()
+                for batch in crud.iter_sales_batches(db, **filters):
+                    buffer.seek(0)
+                    buffer.truncate()
+                    writer.writerows(_export_values(row) for row in batch)
+                    yield buffer.getvalue()
+            else:
+                for batch in crud.iter_sales_batches(db, **filters):
+                    yield "".join(json.dumps(dict(zip(crud.EXPORT_COLUMNS, _export_values(row)))) + "\n" for row in batch)
+        finally:
+            db.close()
+
+def _stream_columnar_export(export_format: str, filters: dict):
+        db = new_read_session()
+        try:
+            yield from arrow_export.stream_sales(db, export_format, **filters)
+        finally:
+            db.close()
+
+@router.get("/export")
+def export_sales_endpoint(
+        format: str = Query("ndjson", pattern="^(ndjson|csv|arrow|parquet)$", description="Output format: 'ndjson' (one JSON object per line), 'csv', 'arrow' (Arrow IPC stream) or 'parquet'"),
+        start_date: Optional[date] = Query(None, description="Export sales from this date (YYYY-MM-DD)"),
+        end_date: Optional[date] = Query(None, description="Export sales up to this date (YYYY-MM-DD)"),
+        product_id: Optional[int] = Query(None, gt=0, description="Filter sales by product ID"),
+        category: Optional[str] = Query(None, description="Filter sales by product category (case-insensitive)"),
+    ):
+        """
+        Streams all matching sales records, oldest first, as NDJSON, CSV, Arrow IPC or Parquet.
+        Accepts the same filters as the sales list but has no page limit. Rows are read with a
+        keyset query per batch and written batch by batch, so memory use does not grow with the export size.
+        The Arrow and Parquet formats add each sale's category column (lowercased, as of the sale) and need pyarrow.
+        """
+        start_datetime = datetime.combine(start_date, time.min) if start_date else None
+        end_datetime = datetime.combine(end_date, time.max) if end_date else None
+        if start_datetime and end_datetime and start_datetime > end_datetime:
+             raise HTTPException(status_code=400, detail="Start date cannot be after end date.")
+
+        filters = dict(start_date=start_datetime, end_date=end_datetime, product_id=product_id, category=category)
+        if format in arrow_export.FORMATS:
+            if arrow_export.pa is None:
+                raise HTTPException(status_code=501, detail="Arrow/Parquet export requires pyarrow on the server.")
+            return StreamingResponse(
+                _stream_columnar_export(format, filters),
+                media_type=arrow_export.MEDIA_TYPES[format],
+                headers={"Content-Disposition": f'attachment; filename="sales.{format}"'}
+            )
+
+        media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+        return StreamingResponse(
+            _stream_sales_export(format, filters),
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="sales.{format}"'}
+        )
+
+
+@router.get("/revenue/summary", response_model=schemas.RevenueSummary)
+def get_revenue_summary_endpoint( # Renamed endpoint function
+        start_date: date = Query(..., description="Start date for revenue calculation (YYYY-MM-DD)"),
+        end_date: date = Query(..., description="End date for revenue calculation (YYYY-MM-DD)"),
+        product_id: Optional[int] = Query(None, gt=0, description="Optional: Filter revenue by product ID"),
+        category: Optional[str] = Query(None, description="Optional: Filter revenue by product category"),
+        db: Session = Depends(get_read_db)
+    ):
+        """
+        Calculates the total revenue generated within a specified date range.
+        Optionally filters by product ID or category.
+        """
+        if start_date > end_date:
+            raise HTTPException(status_code=400, detail="Start date cannot be after end date.")
+
+        start_datetime = datetime.combine(start_date, time.min)
+        end_datetime = datetime.combine(end_date, time.max)
+
+        total_revenue = crud.get_revenue_summary_cached(
+            db, start_date=start_datetime, end_date=end_datetime,
+            product_id=product_id, category=category
+        )
+
+        return schemas.RevenueSummary(
+            period="custom", # Indicate it's a custom range based on query params
+            start_date=start_datetime,
+            end_date=end_datetime,
+            total_revenue=total_revenue
+        )
+
+
+@router.get("/revenue/analysis", response_model=List[schemas.RevenueSummary])
+def get_revenue_analysis_endpoint( # Renamed endpoint function
+        period: str = Query(..., pattern="^(day|week|month|year)$", description="Group revenue by 'day', 'week', 'month', or 'year'"),
+        start_date: date = Query(..., description="Start date for analysis (YYYY-MM-DD)"),
+        end_date: date = Query(..., description="End date for analysis (YYYY-MM-DD)"),
+        db: Session = Depends(get_read_db)
+    ):
+        """
+        Analyzes revenue over a specified date range, grouped by day, week, month, or year.
+        Returns a list of revenue summaries for each period within the range.
+        """
+        if start_date > end_date:
+            raise HTTPException(status_code=400, detail="Start date cannot be after end date.")
+
+        start_datetime = datetime.combine(start_date, time.min)
+        end_datetime = datetime.combine(end_date, time.max)
+
+        try:
+            revenue_data = crud.get_revenue_by_period_cached(db, period=period, start_date=start_datetime, end_date=end_datetime)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e)) # Catch invalid period error
+        except Exception as e:
+            print(f"Error in get_revenue_analysis_endpoint: {e}") # Basic logging
+            raise HTTPException(status_code=500, detail="Error during revenue analysis.")
+
+
+        period_starts = [period_start_dt for period_start_dt, _ in revenue_data]
+        period_ends = analytics.to_datetimes(analytics.period_ends(analytics.to_day_array(
+            [period_start_dt.date() for period_start_dt in period_starts]), period))
+
+        results = []
+        for (period_start_dt, revenue), period_end_dt in zip(revenue_data, period_ends):
+            actual_end_dt = min(period_end_dt, end_datetime)
+
+            results.append(schemas.RevenueSummary(
+                period=period,
+                start_date=period_start_dt,
+                end_date=actual_end_dt,
+                total_revenue=revenue
+            ))
+
+        return results
+
+
+@router.get("/revenue/series", response_model=schemas.RevenueSeriesResponse)
+def get_revenue_series_endpoint(
+        period: str = Query(..., pattern="^(day|week|month|year)$", description="Group revenue by 'day', 'week', 'month', or 'year'"),
+        start_date: date = Query(..., description="Start date for analysis (YYYY-MM-DD)"),
+        end_date: date = Query(..., description="End date for analysis (YYYY-MM-DD)"),
+        group_by: Optional[str] = Query(None, pattern="^(product|category)$", description="Optional: one series per 'product' or 'category'"),
+        product_id: Optional[int] = Query(None, gt=0, description="Optional: Filter revenue by product ID"),
+        category: Optional[str] = Query(None, description="Optional: Filter revenue by product category"),
+        db: Session = Depends(get_read_db)
+    ):
+        """
+        Revenue per period with period-over-period change and percentage change,
+        optionally split into one series per product or category.
+        """
+        if start_date > end_date:
+            raise HTTPException(status_code=400, detail="Start date cannot be after end date.")
+
+        start_datetime = datetime.combine(start_date, time.min)
+        end_datetime = datetime.combine(end_date, time.max)
+
+        try:
+            return crud.get_revenue_series(db, period=period, start_date=start_datetime, end_date=end_datetime,
+                                           group_by=group_by, product_id=product_id, category=category)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            print(f"Error in get_revenue_series_endpoint: {e}")
+            raise HTTPException(status_code=500, detail="Error during revenue analysis.")
+
+
+@router.post("/revenue/comparison", response_model=schemas.RevenueComparisonResponse)
+def compare_revenue_endpoint( # Renamed endpoint function
+        request: schemas.RevenueComparisonRequest = Body(..., description="Details of the two periods to compare (use full datetime strings like 'YYYY-MM-DDTHH:MM:SS')"),
+        db: Session = Depends(get_read_db)
+    ):
+        """
+        Compares total revenue between two specified datetime periods.
+        Optionally filters by a specific product category for the comparison.
+        Requires precise start/end datetimes in the request body.
+        """
+        if (crud.naive_utc(request.period1_start) >= crud.naive_utc(request.period1_end)
+                or crud.naive_utc(request.period2_start) >= crud.naive_utc(request.period2_end)):
+            raise HTTPException(status_code=400, detail="Start datetime must be before end datetime in each period.")
+
+        try:
+            _, matrix = crud.get_revenue_matrix(
+                db, periods=[(request.period1_start, request.period1_end), (request.period2_start, request.period2_end)],
+                categories=[request.category] if request.category else None
+            )
+            revenue1, revenue2 = matrix[0].tolist()
+        except Exception as e:
+             print(f"Error during revenue comparison calculation: {e}")
+             raise HTTPException(status_code=500, detail="Error calculating revenue for comparison.")
+
+
+        difference = revenue2 - revenue1
+        percentage_change = None
+        if revenue1 != 0:
+            try:
+                percentage_change = (difference / revenue1) * 100
+            except ZeroDivisionError:
+                percentage_change = float('inf') if difference > 0 else float('-inf') if difference < 0 else 0.0
+
+
+        return schemas.RevenueComparisonResponse(
+            period1_revenue=revenue1,
+            period2_revenue=revenue2,
+            difference=difference,
+            percentage_change=percentage_change,
+            category=request.category
+        )
+
+
+@router.post("/revenue/comparison/matrix", response_model=schemas.RevenueMatrixResponse)
+def compare_revenue_matrix_endpoint(
+        request: schemas.RevenueMatrixRequest = Body(..., description="Periods to compare, optionally split per product or category"),
+        db: Session = Depends(get_read_db)
+    ):
+        """
+        Compares total revenue across N periods for M products or categories (or overall) in one call.
+        Each row holds a total per period plus the change against the period `baseline_offset` positions earlier.
+        """
+        if len(request.periods) > crud.MAX_COMPARISON_PERIODS:
+            raise HTTPException(status_code=400, detail=f"At most {crud.MAX_COMPARISON_PERIODS} periods can be compared.")
+        if any(crud.naive_utc(period.start) >= crud.naive_utc(period.end) for period in request.periods):
+            raise HTTPException(status_code=400, detail="Start datetime must be before end datetime in each period.")
+
+        try:
+            keys, matrix = crud.get_revenue_matrix(
+                db, periods=[(period.start, period.end) for period in request.periods],
+                group_by=request.group_by, product_ids=request.product_ids, categories=request.categories
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            print(f"Error during revenue matrix calculation: {e}")
+            raise HTTPException(status_code=500, detail="Error calculating revenue for comparison.")
+
+        changes, percentages = analytics.deltas(matrix, lag=request.baseline_offset)
+        rows = [schemas.RevenueMatrixRow(
+            product_id=key if request.group_by == 'product' else None,
+            category=key if request.group_by == 'category' else None,
+            totals=matrix[index].tolist(),
+            changes=analytics.nan_to_none(changes[index]),
+            percentage_changes=analytics.nan_to_none(percentages[index]),
+        ) for index, key in enumerate(keys)]
+
+        return schemas.RevenueMatrixResponse(
+            periods=request.periods,
+            group_by=request.group_by,
+            baseline_offset=request.baseline_offset,
+            period_totals=matrix.sum(axis=0).tolist(),
+            rows=rows,
+        )
+
+
+@router.get("/leaderboard", response_model=schemas.Leaderboard)
+def get_leaderboard_endpoint(
+        group_by: str = Query("product", pattern="^(product|category)$", description="Rank 'product's or 'category's"),
+        metric: str = Query("revenue", pattern="^(revenue|units)$", description="Rank by 'revenue' or 'units' sold"),
+        window_days: int = Query(7, ge=1, le=366, description="Sliding window length in days, ending today (e.g. 7, 30, 90)"),
+        limit: int = Query(10, ge=1, le=100, description="Number of entries to return"),
+        end_date: Optional[date] = Query(None, description="Optional: last day of the window (YYYY-MM-DD), defaults to today"),
+        db: Session = Depends(get_read_db)
+    ):
+        """
+        Best sellers by revenue or units over the last `window_days` days, per product or per category.
+        """
+        try:
+            return crud.get_leaderboard_cached(db, group_by=group_by, metric=metric, window_days=window_days,
+                                               limit=limit, end_day=end_date)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            print(f"Error in get_leaderboard_endpoint: {e}")
+            raise HTTPException(status_code=500, detail="Error building leaderboard.")
+
+
+
+    # --- Async variants (DB_ASYNC_MODE) ---
+    # main.py includes this router ahead of `router` when async mode is enabled, so these
+    # endpoints take precedence for the same paths; the remaining endpoints stay sync.
+async_router = APIRouter(
+        prefix="/sales",
+        tags=["Sales & Revenue"],
+        responses={404: {"description": "Resource not found"}},
+        include_in_schema=False, # Same contract as the sync endpoints documented above
+    )
+
+@async_router.post("/", response_model=schemas.Sale, status_code=201)
+async def record_sale_async_endpoint(
+        sale: schemas.SaleCreate = Body(..., embed=True, description="Details of the sale to record"),
+        db: AsyncSession = Depends(get_async_db)
+    ):
+        """Async version of record_sale_endpoint."""
+        try:
+            return await crud_async.create_sale(db=db, sale=sale)
+        except crud.InsufficientStockError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except IntegrityError as e:
+            print(f"IntegrityError in record_sale_async_endpoint: {e}") # Basic logging
+            raise HTTPException(status_code=409, detail=f"Sale conflicts with current stock for product id {sale.product_id}.")
+        except ValueError as e:
+            if "not found" in str(e):
+                 raise HTTPException(status_code=404, detail=str(e))
+            else:
+                 raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            print(f"Error in record_sale_async_endpoint: {e}") # Basic logging
+            raise HTTPException(status_code=500, detail="An internal error occurred while recording the sale.")
+
+@async_router.get("/", response_model=List[schemas.Sale])
+async def read_sales_async_endpoint(
+        skip: int = Query(0, ge=0, description="Number of records to skip for pagination"),
+        limit: int = Query(100, ge=1, le=500, description="Maximum number of records to return"),
+        start_date: Optional[date] = Query(None, description="Filter sales from this date (YYYY-MM-DD)"),
+        end_date: Optional[date] = Query(None, description="Filter sales up to this date (YYYY-MM-DD)"),
+        product_id: Optional[int] = Query(None, gt=0, description="Filter sales by product ID"),
+        category: Optional[str] = Query(None, description="Filter sales by product category (case-insensitive)"),
+        cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's X-Next-Cursor header (keyset pagination; skip is ignored)"),
+        db: AsyncSession = Depends(get_async_read_db)
+    ):
+        """Async version of read_sales_endpoint."""
+        start_datetime = datetime.combine(start_date, time.min) if start_date else None
+        end_datetime = datetime.combine(end_date, time.max) if end_date else None
+        if start_datetime and end_datetime and start_datetime > end_datetime:
+             raise HTTPException(status_code=400, detail="Start date cannot be after end date.")
+
+        try:
+            sales = await crud_async.get_sales(
+                db, skip=skip, limit=limit,
+                start_date=start_datetime, end_date=end_datetime,
+                product_id=product_id, category=category, cursor=cursor
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return fast_json.page_response(sales, limit, lambda last: crud.encode_cursor(last["sale_date"], last["id"]))
@@ -0,0 +1,362 @@
+import atexit
+import glob
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from pydantic import ValidationError
+from sqlalchemy import select
+
+import crud
+import models
+import schemas
+from database import SessionLocal
+
+try:
+    import fcntl
+except ImportError: # pragma: no cover - not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Write-behind ingestion of sales (POST /sales/buffered), enabled with SALES_WRITE_BEHIND=true.
+#
+# A sale is checked against an in-memory stock reservation, appended to a local write-ahead log
+# under SALES_WAL_DIR and acknowledged once the log is fsynced; requests arriving during an fsync
+# share the next one. Every SALES_WAL_FLUSH_MS a background thread moves the log to a new segment
+# and commits the buffered sales in transactions of up to SALES_WAL_BATCH_SIZE, each recording the
+# last sequence number it applied (sales_wal_checkpoints). On startup, segments left by a crash are
+# replayed and sales already committed are skipped.
+#
+# The reservation is each product's stock as of the last commit, minus its buffered sales; it also
+# holds the price and category read from the database with that stock, which buffered sales are
+# recorded at (the product cache only answers whether the product exists). Other writers (another
+# worker, PATCH /inventory) are only seen at the next commit, so write-behind must run in a single
+# API process: start() takes an exclusive lock on <SALES_WAL_DIR>/<SALES_WAL_NAME>.lock (fcntl.flock,
+# POSIX only) and refuses to start while another process holds it. If the database no longer covers
+# a buffered sale at commit time, the sale is written to <SALES_WAL_DIR>/<SALES_WAL_NAME>.rejected for
+# reconciliation and never oversold.
+#
+# Sales are dated on the database clock like every other sale path (crud.database_now), without a
+# round trip per sale: start() measures the database clock's offset from the host's once, and each
+# sale is stamped with the host time plus that offset, to the second like the database clock.
+SALES_WRITE_BEHIND = os.getenv("SALES_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+SALES_WAL_DIR = os.getenv("SALES_WAL_DIR", "wal")
+SALES_WAL_NAME = os.getenv("SALES_WAL_NAME", "sales")
+SALES_WAL_FLUSH_MS = float(os.getenv("SALES_WAL_FLUSH_MS", "50"))
+SALES_WAL_BATCH_SIZE = int(os.getenv("SALES_WAL_BATCH_SIZE", "5000"))
+
+
+class SaleBuffer:
+    """Durable write-behind queue of sales with an in-memory stock reservation."""
+
+    def __init__(self, directory: str = SALES_WAL_DIR, name: str = SALES_WAL_NAME,
+                 flush_ms: float = SALES_WAL_FLUSH_MS, batch_size: int = SALES_WAL_BATCH_SIZE,
+                 session_factory=SessionLocal):
+        self.directory = directory
+        self.name = name
+        self.flush_seconds = flush_ms / 1000
+        self.batch_size = batch_size
+        self.session_factory = session_factory
+        self._lock = threading.Lock() # Sequence, pending sales, reservation and the open segment
+        self._sync_lock = threading.Lock() # One fsync at a time; also held while switching segments
+        self._flush_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._flusher = None
+        self._file = None
+        self._lock_file = None
+        self._segment = None
+        self._closed_segments = []
+        self._sequence = 0
+        self._synced = 0
+        self._pending = []
+        self._pending_units = {}
+        self._stock = {} # product_id -> (quantity, price, category_norm) as of the last commit
+        self._generation = 0
+        self._clock_offset = timedelta()
+        self.started = False
+        self.accepted = 0
+        self.applied = 0
+        self.rejected = 0
+        self.flushes = 0
+        self.last_flush_ms = None
+        self.last_error = None
+
+    def start(self):
+        """
+        Replays segments left by a previous run, then starts accepting sales and the flusher thread.
+        Raises RuntimeError if another process already runs a buffer on the same log.
+        """
+        if self.started:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._acquire_lock()
+        try:
+            self._measure_clock()
+            self._replay()
+        except Exception:
+            self._release_lock()
+            raise
+        with self._lock:
+            self._open_segment()
+            self.started = True
+        self._stopping.clear()
+        self._flusher = threading.Thread(target=self._run, name="sale-buffer-flusher", daemon=True)
+        self._flusher.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Stops accepting sales and commits what is buffered; anything left is replayed on the next start."""
+        with self._lock:
+            if not self.started:
+                return
+            self.started = False
+        self._stopping.set()
+        self._flusher.join()
+        self.flush()
+        with self._sync_lock, self._lock:
+            self._file.close()
+            if not self._pending and os.path.getsize(self._segment) == 0:
+                os.remove(self._segment)
+        self._release_lock()
+
+    def submit(self, db, sale: schemas.SaleCreate) -> schemas.BufferedSale:
+        """
+        Reserves stock for the sale and logs it durably. Raises crud.InsufficientStockError when the
+        reservation does not cover it, ValueError for an unknown product.
+        """
+        product = crud.get_product_cached(db, sale.product_id)
+        if not product:
+            raise ValueError(f"Product with id {sale.product_id} not found.")
+        if not product.inventory:
+            raise ValueError(f"CRITICAL: Inventory record for product id {sale.product_id} not found.")
+        sale_date = self._now()
+
+        while True:
+            with self._lock:
+                if not self.started:
+                    raise RuntimeError("The sale buffer is not running.")
+                known = self._stock.get(sale.product_id)
+                generation = self._generation
+                if known is not None:
+                    quantity, price, category = known
+                    available = quantity - self._pending_units.get(sale.product_id, 0)
+                    if available < sale.quantity_sold:
+                        raise crud.InsufficientStockError(f"Insufficient stock for product id {sale.product_id}. Available: {available}, Requested: {sale.quantity_sold}")
+                    buffered = schemas.BufferedSale(
+                        sequence=self._sequence + 1,
+                        product_id=sale.product_id,
+                        quantity_sold=sale.quantity_sold,
+                        sale_price_per_unit=price,
+                        total_revenue=sale.quantity_sold * price,
+                        sale_date=sale_date,
+                        category=category,
+                    )
+                    self._file.write(buffered.model_dump_json() + "\n")
+                    self._sequence = buffered.sequence
+                    self._pending.append(buffered)
+                    self._pending_units[sale.product_id] = self._pending_units.get(sale.product_id, 0) + sale.quantity_sold
+                    self.accepted += 1
+                    break
+            # First sale of the product since the last commit: load its stock, price and category from a
+            # fresh snapshot. A commit finishing meanwhile may have made them stale, so then read them again.
+            db.rollback()
+            row = db.execute(select(models.Inventory.quantity, models.Product.price, models.Product.category_norm)
+                             .join(models.Product, models.Product.id == models.Inventory.product_id)
+                             .where(models.Inventory.product_id == sale.product_id)).one_or_none()
+            if row is None:
+                raise ValueError(f"Product with id {sale.product_id} not found.")
+            with self._lock:
+                if self._generation == generation:
+                    self._stock.setdefault(sale.product_id, (row.quantity or 0, row.price, row.category_norm))
+
+        self._sync(buffered.sequence)
+        return buffered
+
+    def flush(self) -> int:
+        """Commits every buffered sale to the database. Returns the number of sales committed."""
+        with self._flush_lock:
+            with self._sync_lock:
+                with self._lock:
+                    batch, self._pending = self._pending, []
+                    if not batch:
+                        self._forget_idle_stock()
+                        return 0
+                    previous, target = self._file, self._sequence
+                    self._closed_segments.append(self._segment)
+                    self._open_segment()
+                previous.flush()
+                os.fsync(previous.fileno())
+                previous.close()
+                self._synced = max(self._synced, target)
+
+            started = time.perf_counter()
+            for start in range(0, len(batch), self.batch_size):
+                try:
+                    self._apply(batch[start:start + self.batch_size])
+                except Exception as e:
+                    # Back in front of the queue; the log segments stay until the retry succeeds
+                    self.last_error = str(e)
+                    logger.error(f"Could not commit {len(batch) - start} buffered sales, retrying: {e}")
+                    with self._lock:
+                        self._pending = batch[start:] + self._pending
+                    return start
+            with self._lock:
+                segments, self._closed_segments = self._closed_segments, []
+            for path in segments:
+                os.remove(path)
+            self.flushes += 1
+            self.last_flush_ms = round((time.perf_counter() - started) * 1000, 3)
+            self.last_error = None
+            return len(batch)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.started,
+                "pending": len(self._pending),
+                "sequence": self._sequence,
+                "synced": self._synced,
+                "accepted": self.accepted,
+                "applied": self.applied,
+                "rejected": self.rejected,
+                "flushes": self.flushes,
+                "last_flush_ms": self.last_flush_ms,
+                "last_error": self.last_error,
+                "reserved_products": len(self._stock),
+            }
+
+    def _run(self):
+        while not self._stopping.wait(self.flush_seconds):
+            try:
+                self.flush()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Sale buffer flush failed: {e}")
+
+    def _sync(self, sequence: int):
+        """Waits until the log is fsynced through sequence, fsyncing everything written so far if needed."""
+        with self._sync_lock:
+            if self._synced >= sequence:
+                return
+            with self._lock:
+                target = self._sequence
+                self._file.flush()
+                segment = self._file
+            os.fsync(segment.fileno())
+            self._synced = target
+
+    def _apply(self, sales):
+        db = self.session_factory()
+        try:
+            applied, rejected, products = crud.apply_buffered_sales(db, self.name, sales)
+        finally:
+            db.close()
+        if rejected:
+            self._reject(rejected)
+        with self._lock:
+            for sale in sales:
+                units = self._pending_units.get(sale.product_id, 0) - sale.quantity_sold
+                if units > 0:
+                    self._pending_units[sale.product_id] = units
+                else:
+                    self._pending_units.pop(sale.product_id, None)
+            for product_id, current in products.items():
+                self._stock[product_id] = current
+            self._forget_idle_stock()
+            self._generation += 1
+            self.applied += len(applied)
+            self.rejected += len(rejected)
+
+    def _forget_idle_stock(self):
+        # Products with nothing buffered reload their stock on their next sale, picking up outside changes
+        self._stock = {product_id: current for product_id, current in self._stock.items()
+                       if self._pending_units.get(product_id)}
+
+    def _reject(self, sales):
+        path = os.path.join(self.directory, f"{self.name}.rejected")
+        with open(path, "a", encoding="utf-8") as rejected:
+            rejected.writelines(sale.model_dump_json() + "\n" for sale in sales)
+            rejected.flush()
+            os.fsync(rejected.fileno())
+        logger.error(f"{len(sales)} buffered sales exceed the stock left in the database and were not recorded; see {path}")
+
+    def _measure_clock(self):
+        db = self.session_factory()
+        try:
+            self._clock_offset = crud.database_now(db) - _utc_now()
+        finally:
+            db.close()
+
+    def _now(self) -> datetime:
+        """The database clock's current time (see crud.database_now), from the offset measured at start."""
+        return (_utc_now() + self._clock_offset).replace(microsecond=0)
+
+    def _acquire_lock(self):
+        path = os.path.join(self.directory, f"{self.name}.lock")
+        if fcntl is None:
+            logger.warning(f"fcntl is not available; cannot make sure no other process uses the sales log in '{self.directory}'")
+            return
+        lock_file = open(path, "a")
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            raise RuntimeError(f"Another process is already running the sale buffer on {path}; "
+                               f"write-behind must run in a single API process.")
+        self._lock_file = lock_file
+
+    def _release_lock(self):
+        if self._lock_file is not None:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _open_segment(self):
+        self._segment = os.path.join(self.directory, f"{self.name}.{self._sequence + 1:012d}.wal")
+        self._file = open(self._segment, "a", encoding="utf-8")
+        try:
+            # Make the new file's directory entry durable too
+            directory = os.open(self.directory, os.O_RDONLY)
+            try:
+                os.fsync(directory)
+            finally:
+                os.close(directory)
+        except OSError:
+            pass
+
+    def _replay(self):
+        db = self.session_factory()
+        try:
+            checkpoint = db.get(models.SalesWalCheckpoint, self.name)
+            self._sequence = checkpoint.applied_sequence if checkpoint else 0
+        finally:
+            db.close()
+
+        segments = sorted(glob.glob(os.path.join(glob.escape(self.directory), f"{glob.escape(self.name)}.*.wal")))
+        sales = []
+        for path in segments:
+            with open(path, encoding="utf-8") as segment:
+                for number, line in enumerate(segment, 1):
+                    try:
+                        sales.append(schemas.BufferedSale.model_validate_json(line))
+                    except ValidationError:
+                        # A crash mid-append leaves a torn last line; that sale was never acknowledged
+                        logger.warning(f"Skipping unreadable line {number} of {path}")
+        if sales:
+            self._sequence = max(self._sequence, max(sale.sequence for sale in sales))
+            logger.info(f"Replaying {len(sales)} logged sales from {len(segments)} log segments...")
+            for start in range(0, len(sales), self.batch_size):
+                self._apply(sales[start:start + self.batch_size])
+        for path in segments:
+            os.remove(path)
+        self._synced = self._sequence
+
+
+def _utc_now() -> datetime:
+    return datetime.fromtimestamp(time.time(), timezone.utc).replace(tzinfo=None)
+
+
+buffer = SaleBuffer()
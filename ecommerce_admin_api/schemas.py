@@ -1,95 +1,221 @@
-from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional, List
-from datetime import datetime
-
-
-class BaseConfig:
-    model_config = ConfigDict(from_attributes=True)
-
-
-class InventoryBase(BaseModel):
-    quantity: int = Field(..., ge=0)
-    low_stock_threshold: int = Field(default=10, ge=0)
-
-
-class InventoryCreate(InventoryBase):
-    pass
-
-
-class InventoryUpdate(BaseModel):
-    quantity: Optional[int] = Field(None, ge=0)
-    low_stock_threshold: Optional[int] = Field(None, ge=0)
-
-
-class Inventory(InventoryBase):
-    id: int
-    product_id: int
-    last_updated: datetime
-    model_config = ConfigDict(from_attributes=True)
-
-
-class ProductBase(BaseModel):
-    name: str = Field(..., min_length=1, max_length=255)
-    description: Optional[str] = Field(None, max_length=1000)
-    category: Optional[str] = Field(None, max_length=100)
-    price: float = Field(..., gt=0)
-
-
-class ProductCreate(ProductBase):
-    initial_quantity: int = Field(..., ge=0)
-    low_stock_threshold: Optional[int] = Field(10, ge=0)
-
-
-class ProductUpdate(BaseModel):
-    name: Optional[str] = Field(None, min_length=1, max_length=255)
-    description: Optional[str] = Field(None, max_length=1000)
-    category: Optional[str] = Field(None, max_length=100)
-    price: Optional[float] = Field(None, gt=0)
-
-
-class Product(ProductBase):
-    id: int
-    created_at: datetime
-    updated_at: Optional[datetime] = None
-    inventory: Optional[Inventory] = None
-    model_config = ConfigDict(from_attributes=True)
-
-
-class SaleBase(BaseModel):
-    product_id: int
-    quantity_sold: int = Field(..., gt=0)
-
-
-class SaleCreate(SaleBase):
-    pass
-
-
-class Sale(SaleBase):
-    id: int
-    sale_price_per_unit: float
-    total_revenue: float
-    sale_date: datetime
-    model_config = ConfigDict(from_attributes=True)
-
-
-class RevenueSummary(BaseModel):
-    period: str
-    start_date: datetime
-    end_date: datetime
-    total_revenue: float
-
-
-class RevenueComparisonRequest(BaseModel):
-    period1_start: datetime
-    period1_end: datetime
-    period2_start: datetime
-    period2_end: datetime
-    category: Optional[str] = None
-
-
-class RevenueComparisonResponse(BaseModel):
-    period1_revenue: float
-    period2_revenue: float
-    difference: float
-    percentage_change: Optional[float] = None
-    category: Optional[str] = None
+from pydantic import BaseModel, Field, ConfigDict
+from typing import Optional, List
+from datetime import datetime, date
+
+
+class BaseConfig:
+    model_config = ConfigDict(from_attributes=True)
+
+
+class InventoryBase(BaseModel):
+    quantity: int = Field(..., ge=0)
+    low_stock_threshold: int = Field(default=10, ge=0)
+
+
+class InventoryCreate(InventoryBase):
+    pass
+
+
+class InventoryUpdate(BaseModel):
+    quantity: Optional[int] = Field(None, ge=0)
+    low_stock_threshold: Optional[int] = Field(None, ge=0)
+
+
+class Inventory(InventoryBase):
+    id: int
+    product_id: int
+    is_low_stock: bool = False
+    last_updated: datetime
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ProductBase(BaseModel):
+    name: str = Field(..., min_length=1, max_length=255)
+    description: Optional[str] = Field(None, max_length=1000)
+    category: Optional[str] = Field(None, max_length=100)
+    price: float = Field(..., gt=0)
+
+
+class ProductCreate(ProductBase):
+    initial_quantity: int = Field(..., ge=0)
+    low_stock_threshold: Optional[int] = Field(10, ge=0)
+
+
+class ProductUpdate(BaseModel):
+    name: Optional[str] = Field(None, min_length=1, max_length=255)
+    description: Optional[str] = Field(None, max_length=1000)
+    category: Optional[str] = Field(None, max_length=100)
+    price: Optional[float] = Field(None, gt=0)
+
+
+class Product(ProductBase):
+    id: int
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    inventory: Optional[Inventory] = None
+    model_config = ConfigDict(from_attributes=True)
+
+
+class SaleBase(BaseModel):
+    product_id: int
+    quantity_sold: int = Field(..., gt=0)
+
+
+class SaleCreate(SaleBase):
+    pass
+
+
+class Sale(SaleBase):
+    id: int
+    sale_price_per_unit: float
+    total_revenue: float
+    sale_date: datetime
+    model_config = ConfigDict(from_attributes=True)
+
+
+class BufferedSale(SaleBase):
+    """A sale accepted by the write-behind buffer; one line of its write-ahead log."""
+    sequence: int
+    sale_price_per_unit: float
+    total_revenue: float
+    sale_date: datetime
+    category: str = ""
+
+
+class SaleBulkLineResult(BaseModel):
+    index: int
+    product_id: int
+    quantity_sold: int
+    accepted: bool
+    sale_price_per_unit: Optional[float] = None
+    total_revenue: Optional[float] = None
+    detail: Optional[str] = None
+
+
+class SaleBulkResponse(BaseModel):
+    accepted: int
+    rejected: int
+    sale_date: Optional[datetime] = None
+    results: List[SaleBulkLineResult]
+
+
+class InventoryAdjustment(BaseModel):
+    product_id: int = Field(..., gt=0)
+    quantity: Optional[int] = Field(None, ge=0) # Absolute stock level
+    delta: Optional[int] = None # Relative change, e.g. +500 for a receipt or -3 for shrinkage
+    low_stock_threshold: Optional[int] = Field(None, ge=0)
+
+
+class InventoryAdjustmentResult(BaseModel):
+    index: int
+    product_id: int
+    accepted: bool
+    quantity: Optional[int] = None
+    low_stock_threshold: Optional[int] = None
+    is_low_stock: Optional[bool] = None
+    detail: Optional[str] = None
+
+
+class InventoryBulkAdjustResponse(BaseModel):
+    accepted: int
+    rejected: int
+    results: List[InventoryAdjustmentResult]
+
+
+class RevenueSummary(BaseModel):
+    period: str
+    start_date: datetime
+    end_date: datetime
+    total_revenue: float
+
+
+class RevenueSeries(BaseModel):
+    product_id: Optional[int] = None
+    category: Optional[str] = None
+    total_revenue: float
+    revenue: List[float]
+    change: List[Optional[float]]
+    percentage_change: List[Optional[float]]
+
+
+class RevenueSeriesResponse(BaseModel):
+    period: str
+    start_date: datetime
+    end_date: datetime
+    group_by: Optional[str] = None
+    period_starts: List[datetime]
+    period_ends: List[datetime]
+    series: List[RevenueSeries]
+
+
+class RevenueComparisonRequest(BaseModel):
+    period1_start: datetime
+    period1_end: datetime
+    period2_start: datetime
+    period2_end: datetime
+    category: Optional[str] = None
+
+
+class RevenueComparisonResponse(BaseModel):
+    period1_revenue: float
+    period2_revenue: float
+    difference: float
+    percentage_change: Optional[float] = None
+    category: Optional[str] = None
+
+
+class RevenuePeriod(BaseModel):
+    start: datetime
+    end: datetime
+    label: Optional[str] = Field(None, max_length=100)
+
+
+class RevenueMatrixRequest(BaseModel):
+    periods: List[RevenuePeriod] = Field(..., min_length=1)
+    group_by: Optional[str] = Field(None, pattern="^(product|category)$")
+    product_ids: Optional[List[int]] = None
+    categories: Optional[List[str]] = None
+    baseline_offset: int = Field(default=1, ge=1) # Compare each period with the one this many positions earlier (12 over monthly periods = year-over-year)
+
+
+class RevenueMatrixRow(BaseModel):
+    product_id: Optional[int] = None
+    category: Optional[str] = None
+    totals: List[float]
+    changes: List[Optional[float]]
+    percentage_changes: List[Optional[float]]
+
+
+class RevenueMatrixResponse(BaseModel):
+    periods: List[RevenuePeriod]
+    group_by: Optional[str] = None
+    baseline_offset: int
+    period_totals: List[float]
+    rows: List[RevenueMatrixRow]
+
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    product_id: Optional[int] = None
+    product_name: Optional[str] = None
+    category: Optional[str] = None
+    total_revenue: float
+    units_sold: int
+    sale_count: int
+
+
+class Leaderboard(BaseModel):
+    group_by: str
+    metric: str
+    window_days: int
+    start_date: date
+    end_date: date
+    entries: List[LeaderboardEntry]
+
+
+class LowStockEvent(BaseModel):
+    product_id: int
+    quantity: int
+    low_stock_threshold: int
+    is_low_stock: bool
+    at: datetime
@@ -0,0 +1,82 @@
+import contextlib
+import os
+import sys
+import tempfile
+
+import pytest
+from sqlalchemy import event
+
+# The app modules import each other by top-level name (import crud, ...) and read their settings
+# from the environment at import time, so the test database and settings are set up before any of
+# them is imported. Every test starts from empty tables and caches on a throwaway SQLite file.
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+TEST_DB_DIR = tempfile.mkdtemp(prefix="ecommerce-admin-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_DB_DIR, 'test.db')}"
+os.environ["REPLICA_DATABASE_URL"] = ""
+# TEST_DB_ASYNC_MODE=true runs the suite against the async routes (tests/test_async_mode.py does)
+os.environ["DB_ASYNC_MODE"] = os.getenv("TEST_DB_ASYNC_MODE", "false")
+os.environ["CACHE_BACKEND"] = "local"
+os.environ["SALES_WRITE_BEHIND"] = "false"
+os.environ["SALES_WAL_DIR"] = os.path.join(TEST_DB_DIR, "wal")
+
+import cache # noqa: E402
+import database # noqa: E402
+import main # noqa: E402
+import models # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fresh_database():
+        models.Base.metadata.drop_all(bind=database.engine)
+        models.Base.metadata.create_all(bind=database.engine)
+        for named_cache in cache.CACHES.values():
+            named_cache.bump_version()
+            named_cache.local.clear()
+        yield
+
+
+@pytest.fixture
+def client():
+        from fastapi.testclient import TestClient
+        return TestClient(main.app)
+
+
+@pytest.fixture
+def db():
+        session = database.SessionLocal()
+        try:
+            yield session
+        finally:
+            session.close()
+
+
+@pytest.fixture
+def count_statements():
+        """Context manager collecting the SQL statements run on the engine inside it."""
+        @contextlib.contextmanager
+        def counting():
+            statements = []
+            def record(conn, cursor, statement, parameters, context, executemany):
+                statements.append(statement)
+            engines = [database.engine] + ([database.async_engine.sync_engine] if database.async_engine is not None else [])
+            for engine in engines:
+                event.listen(engine, "before_cursor_execute", record)
+            try:
+                yield statements
+            finally:
+                for engine in engines:
+                    event.remove(engine, "before_cursor_execute", record)
+        return counting
+
+
+def create_products(client, count: int, quantity: int = 50, categories=("Cat0", "Cat1", "Cat2"), price: float = 10.0):
+        """Creates products P0..P<count-1> through the API and returns their ids."""
+        ids = []
+        for i in range(count):
+            response = client.post("/products/", json={"product": {
+                "name": f"P{i}", "category": categories[i % len(categories)] if categories else None,
+                "price": price + i, "initial_quantity": quantity}})
+            assert response.status_code == 201, response.text
+            ids.append(response.json()["id"])
+        return ids
@@ -0,0 +1,79 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+
+import cache
+import database
+import low_stock
+import main
+from fake_redis import FakeRedis
+from routers import inventory, products, sales
+from tests.conftest import APP_DIR, create_products
+
+# main picks the async routes (DB_ASYNC_MODE) when it is imported, so the API tests are run again in a
+# subprocess with TEST_DB_ASYNC_MODE=true, on aiosqlite; the async-only tests below run there.
+ASYNC_SUITE = ("tests/test_async_mode.py", "tests/test_list_queries.py", "tests/test_sales_pagination.py",
+               "tests/test_sale_pricing.py", "tests/test_sales_concurrency.py", "tests/test_replica.py")
+requires_async_mode = pytest.mark.skipif(not database.ASYNC_MODE, reason="runs in the async-mode subprocess")
+
+
+@pytest.mark.skipif(database.ASYNC_MODE, reason="already running in async mode")
+def test_api_tests_pass_on_the_async_routes():
+        pytest.importorskip("aiosqlite")
+        result = subprocess.run([sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", *ASYNC_SUITE],
+                                cwd=APP_DIR, env={**os.environ, "TEST_DB_ASYNC_MODE": "true"},
+                                capture_output=True, text=True, timeout=600)
+        assert result.returncode == 0, result.stdout[-5000:]
+
+
+@requires_async_mode
+@pytest.mark.parametrize("method,path", [("GET", "/products/"), ("GET", "/products/{product_id}"), ("GET", "/inventory/"),
+                                         ("GET", "/inventory/{product_id}"), ("GET", "/sales/"), ("POST", "/sales/")])
+def test_async_routes_serve_the_hot_endpoints(method, path):
+        async_endpoints = {route.endpoint for router in (products.async_router, inventory.async_router, sales.async_router)
+                           for route in router.routes}
+        route = next(route for route in main.app.routes if getattr(route, "path", None) == path and method in route.methods)
+        assert route.endpoint in async_endpoints
+
+
+def on_event_loop() -> bool:
+        try:
+            asyncio.get_running_loop()
+            return True
+        except RuntimeError:
+            return False
+
+
+@pytest.fixture
+def shared_backend(monkeypatch):
+        """FakeRedis as the shared cache and low-stock backend; returns the (command, ran on the event loop) calls made."""
+        client = FakeRedis()
+        calls = []
+        for name in ("get", "pipeline", "set", "delete", "incr", "publish"):
+            def record(*args, _name=name, _command=getattr(client, name), **kwargs):
+                calls.append((_name, on_event_loop()))
+                return _command(*args, **kwargs)
+            setattr(client, name, record)
+        backend = cache.RedisBackend(client)
+        monkeypatch.setattr(cache, "backend", backend)
+        for named_cache in cache.CACHES.values():
+            monkeypatch.setattr(named_cache, "backend", backend)
+        monkeypatch.setattr(low_stock.notifier, "backend", backend)
+        return calls
+
+
+@requires_async_mode
+def test_redis_calls_stay_off_the_event_loop(client, shared_backend):
+        product_id = create_products(client, 1, quantity=50)[0]
+        shared_backend.clear()
+        for _ in range(2): # Misses that load and store, then hits
+            assert client.get(f"/products/{product_id}").status_code == 200
+            assert client.get("/products/").status_code == 200
+        # Crosses the low-stock threshold: a published event and an invalidation
+        assert client.post("/sales/", json={"sale": {"product_id": product_id, "quantity_sold": 45}}).status_code == 201
+
+        assert {"pipeline", "set", "delete", "publish"} <= {command for command, _ in shared_backend}
+        assert [command for command, on_loop in shared_backend if on_loop] == []
@@ -0,0 +1,44 @@
+import time
+
+import pytest
+
+import cache
+from fake_redis import FakeRedis, FakeRedisServer
+
+
+@pytest.fixture
+def clock(monkeypatch):
+        """Drives time.monotonic, which both the local TTLs and FakeRedis expiry read."""
+        now = [1000.0]
+        monkeypatch.setattr(time, "monotonic", lambda: now[0])
+        return now
+
+
+def workers(count: int, ttl: float = 10):
+        """The same named cache in `count` workers sharing one Redis."""
+        server = FakeRedisServer()
+        return [cache.Cache("numbers", int, ttl=ttl, backend=cache.RedisBackend(FakeRedis(server))) for _ in range(count)]
+
+
+def test_shared_hit_expires_locally_with_the_shared_entry(clock):
+        writer, reader = workers(2)
+        writer.set("k", 1)
+        clock[0] += 8
+        assert reader.get("k") == 1 # From Redis, with 2 s left
+        assert reader.stats()["shared_hits"] == 1
+
+        clock[0] += 1.5
+        assert reader.local.get("k") == 1
+        clock[0] += 1
+        assert reader.local.get("k") is cache.MISSING # Not kept for a full TTL after the read
+        assert reader.get("k") is cache.MISSING
+
+
+def test_shared_hit_without_expiry_gets_the_local_ttl(clock):
+        writer, reader = workers(2)
+        writer.backend.client.set(writer.backend.prefix + writer._key("k"), b"7")
+        assert reader.get("k") == 7
+        clock[0] += 9
+        assert reader.local.get("k") == 7
+        clock[0] += 2
+        assert reader.local.get("k") is cache.MISSING
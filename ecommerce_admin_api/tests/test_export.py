@@ -0,0 +1,50 @@
+import io
+
+import pytest
+
+import crud
+import models
+from tests.conftest import create_products
+
+
+def test_columnar_export_reads_the_category_stored_on_each_sale(client, db, count_statements):
+        pa = pytest.importorskip("pyarrow")
+        product_ids = create_products(client, 2, categories=("Garden Tools", "Books"))
+        for product_id in product_ids:
+            assert client.post("/sales/", json={"sale": {"product_id": product_id, "quantity_sold": 1}}).status_code == 201
+        # Recategorizing a product must not rewrite the category of its past sales
+        response = client.put(f"/products/{product_ids[0]}", json={"product_update": {"category": "Outdoor"}})
+        assert response.status_code == 200, response.text
+
+        with count_statements() as statements:
+            rows = [row for batch in crud.iter_sales_batches(db, with_category=True) for row in batch]
+        assert [(row.product_id, row.category) for row in rows] == [(product_ids[0], "garden tools"), (product_ids[1], "books")]
+        assert not any("products" in statement for statement in statements)
+
+        response = client.get("/sales/export?format=arrow")
+        assert response.status_code == 200, response.text
+        table = pa.ipc.open_stream(io.BytesIO(response.content)).read_all()
+        assert table.column("category").to_pylist() == ["garden tools", "books"]
+
+
+def test_batches_are_fetched_lazily_one_keyset_query_each(client, db, count_statements):
+        product_ids = create_products(client, 3)
+        # Bulk sales share one sale_date, so the keyset must break ties on id
+        bulk = {"sales": [{"product_id": product_ids[i % 3], "quantity_sold": 1} for i in range(7)]}
+        assert client.post("/sales/bulk", json=bulk).status_code in (200, 201)
+        assert client.post("/sales/", json={"sale": {"product_id": product_ids[0], "quantity_sold": 1}}).status_code == 201
+        expected = [sale_id for (sale_id,) in db.query(models.Sale.id).order_by(models.Sale.sale_date, models.Sale.id)]
+
+        with count_statements() as statements:
+            batches = crud.iter_sales_batches(db, batch_size=3)
+            assert statements == []
+            first = next(batches)
+            assert len(statements) == 1 and "LIMIT" in statements[0]
+            rest = list(batches)
+        assert [len(batch) for batch in [first, *rest]] == [3, 3, 2]
+        assert len(statements) == 3
+        assert [row.id for batch in [first, *rest] for row in batch] == expected
+
+        with count_statements() as statements:
+            assert [len(batch) for batch in crud.iter_sales_batches(db, batch_size=4)] == [4, 4]
+        assert len(statements) == 3 # A full last batch needs one more (empty) query to end
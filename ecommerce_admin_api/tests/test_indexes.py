@@ -0,0 +1,37 @@
+import pytest
+from sqlalchemy import text
+
+import database
+import explain_check
+import populate_db
+
+# explain_check's EXPLAIN assertions, run on a seeded database: on near-empty tables the planner may
+# legitimately prefer a scan, so each test bulk-loads synthetic data and runs ANALYZE first.
+CHECKS = explain_check.checks()
+
+
+@pytest.fixture
+def seeded():
+        populate_db.bulk_load(num_products=300, num_sales=20000, days=120, seed=7)
+        with database.engine.begin() as connection:
+            connection.execute(text("ANALYZE"))
+
+
+@pytest.mark.parametrize("description,statement,index_name,covering", CHECKS, ids=[check[0] for check in CHECKS])
+def test_query_uses_its_index(seeded, description, statement, index_name, covering):
+        with database.engine.connect() as connection:
+            plan = explain_check.explain(connection, statement)
+            assert explain_check.uses_index(plan, index_name, covering, connection.dialect.name), \
+                f"{description} does not use {index_name}{' (covering)' if covering else ''}:\n" + "\n".join(plan)
+
+
+def test_missing_index_fails_the_check(seeded):
+        description, statement, index_name, covering = CHECKS[0]
+        with database.engine.begin() as connection:
+            connection.execute(text(f"DROP INDEX {index_name}"))
+            assert not explain_check.uses_index(explain_check.explain(connection, statement), index_name, covering,
+                                                connection.dialect.name)
+
+
+def test_explain_check_run_passes(seeded):
+        assert explain_check.run()
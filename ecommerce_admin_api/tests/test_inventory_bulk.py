@@ -0,0 +1,65 @@
+import models
+from tests.conftest import create_products
+
+
+def adjust(client, *adjustments):
+        response = client.patch("/inventory/bulk", json={"adjustments": list(adjustments)})
+        assert response.status_code == 200, response.text
+        return response.json()
+
+
+def outcomes(body):
+        return [(result["accepted"], result["quantity"], result["low_stock_threshold"]) for result in body["results"]]
+
+
+def stock(db):
+        db.expire_all()
+        return {row.product_id: (row.quantity, row.low_stock_threshold) for row in db.query(models.Inventory)}
+
+
+def test_items_apply_in_request_order_to_the_running_values(client, db):
+        product_id = create_products(client, 1, quantity=50)[0]
+        body = adjust(client, {"product_id": product_id, "quantity": 20}, {"product_id": product_id, "delta": -5},
+                      {"product_id": product_id, "delta": -16}, # Only 15 left at this point
+                      {"product_id": product_id, "delta": 1, "low_stock_threshold": 16})
+        assert outcomes(body) == [(True, 20, 10), (True, 15, 10), (False, None, None), (True, 16, 16)]
+        assert (body["accepted"], body["rejected"]) == (3, 1)
+        assert body["results"][3]["is_low_stock"] is True
+        assert stock(db) == {product_id: (16, 16)}
+
+
+def test_invalid_items_are_rejected_without_failing_the_batch(client, db):
+        product_ids = create_products(client, 2, quantity=50)
+        body = adjust(client, {"product_id": product_ids[0], "quantity": 5, "delta": 1},
+                      {"product_id": product_ids[0], "delta": -51},
+                      {"product_id": 999, "delta": 1},
+                      {"product_id": product_ids[1]},
+                      {"product_id": product_ids[1], "delta": -50})
+        details = [result["detail"] for result in body["results"]]
+        assert [result["accepted"] for result in body["results"]] == [False, False, False, False, True]
+        assert details[0] == "Provide either quantity or delta, not both."
+        assert details[1].startswith(f"Adjustment would make stock negative for product id {product_ids[0]}")
+        assert details[2] == "Inventory for product id 999 not found."
+        assert details[3] == "No adjustment provided."
+        assert stock(db) == {product_ids[0]: (50, 10), product_ids[1]: (0, 10)}
+
+
+def test_threshold_only_item_keeps_the_quantity(client, db):
+        product_id = create_products(client, 1, quantity=50)[0]
+        body = adjust(client, {"product_id": product_id, "low_stock_threshold": 60})
+        assert outcomes(body) == [(True, 50, 60)]
+        assert body["results"][0]["is_low_stock"] is True
+        assert stock(db) == {product_id: (50, 60)}
+        assert client.get(f"/inventory/{product_id}").json()["is_low_stock"] is True
+
+
+def test_statement_count_does_not_grow_with_the_batch(client, db, count_statements):
+        product_ids = create_products(client, 40, quantity=50)
+        counts = []
+        for size in (4, 40):
+            with count_statements() as statements:
+                body = adjust(client, *[{"product_id": product_id, "delta": -1} for product_id in product_ids[:size]])
+            assert body["accepted"] == size
+            counts.append(len(statements))
+        assert counts[0] == counts[1]
+        assert set(stock(db).values()) == {(48, 10), (49, 10)}
@@ -0,0 +1,100 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import crud
+import models
+from tests.conftest import create_products
+
+END_DAY = date(2024, 5, 31)
+
+
+def add_sales(db, sales):
+        """Inserts (product_id, sale_date, quantity, unit_price) sales directly and rebuilds the daily rollup."""
+        for product_id, sale_date, quantity, unit_price in sales:
+            product = db.get(models.Product, product_id)
+            db.add(models.Sale(product_id=product_id, quantity_sold=quantity, sale_price_per_unit=unit_price,
+                               total_revenue=quantity * unit_price, sale_date=sale_date, category=product.category_norm))
+        db.commit()
+        crud.rebuild_daily_revenue(db)
+
+
+def brute_force(db, group_by, metric, window_days, limit, end_day):
+        """The leaderboard as a plain SUM over sales, ranked by sorting every group."""
+        start = datetime.combine(end_day - timedelta(days=window_days - 1), datetime.min.time())
+        end = datetime.combine(end_day + timedelta(days=1), datetime.min.time())
+        totals = defaultdict(lambda: [0.0, 0, 0])
+        for sale in db.query(models.Sale).filter(models.Sale.sale_date >= start, models.Sale.sale_date < end):
+            total = totals[sale.product_id if group_by == 'product' else sale.category]
+            total[0] += sale.total_revenue
+            total[1] += sale.quantity_sold
+            total[2] += 1
+        if metric == 'revenue':
+            ranked = sorted(totals.items(), key=lambda item: (-item[1][0], -item[1][1], item[0]))
+        else:
+            ranked = sorted(totals.items(), key=lambda item: (-item[1][1], -item[1][0], item[0]))
+        return [(key, pytest.approx(revenue), units, count) for key, (revenue, units, count) in ranked[:limit]]
+
+
+def entries(leaderboard):
+        return [(entry.product_id if leaderboard.group_by == 'product' else entry.category,
+                 entry.total_revenue, entry.units_sold, entry.sale_count) for entry in leaderboard.entries]
+
+
+@pytest.fixture
+def sales(client, db):
+        product_ids = create_products(client, 9, categories=("Alpha", "Beta", "Gamma"))
+        rows = []
+        for offset in range(60):
+            product_id = product_ids[(offset * 7) % len(product_ids)]
+            sale_day = datetime.combine(END_DAY, datetime.min.time()) - timedelta(days=offset % 45)
+            rows.append((product_id, sale_day + timedelta(hours=offset % 24), 1 + offset % 4, 5.0 + offset % 3))
+        # Exact ties: two products with identical revenue and units, and a pair tied on revenue only
+        rows += [(product_ids[0], datetime(2024, 5, 30, 10), 3, 20.0), (product_ids[1], datetime(2024, 5, 30, 11), 3, 20.0),
+                 (product_ids[2], datetime(2024, 5, 29, 0), 2, 30.0), (product_ids[3], datetime(2024, 5, 31, 23, 59), 6, 10.0)]
+        add_sales(db, rows)
+        return product_ids
+
+
+@pytest.mark.parametrize("group_by", ["product", "category"])
+@pytest.mark.parametrize("metric", ["revenue", "units"])
+@pytest.mark.parametrize("window_days,limit", [(1, 10), (7, 3), (30, 5), (90, 100)])
+def test_leaderboard_matches_brute_force(db, sales, group_by, metric, window_days, limit):
+        leaderboard = crud.get_leaderboard(db, group_by=group_by, metric=metric, window_days=window_days,
+                                           limit=limit, end_day=END_DAY)
+        assert entries(leaderboard) == brute_force(db, group_by, metric, window_days, limit, END_DAY)
+        assert [entry.rank for entry in leaderboard.entries] == list(range(1, len(leaderboard.entries) + 1))
+
+
+def test_leaderboard_breaks_exact_ties_by_key(db, sales):
+        leaderboard = crud.get_leaderboard(db, window_days=1, end_day=date(2024, 5, 30), limit=100)
+        tied = [entry.product_id for entry in leaderboard.entries if entry.total_revenue == 60.0 and entry.units_sold == 3]
+        assert tied == sorted(sales[:2])
+
+
+@pytest.mark.parametrize("end_day", [date(2023, 1, 1), date(2030, 1, 1)])
+def test_leaderboard_empty_window(db, sales, end_day):
+        leaderboard = crud.get_leaderboard(db, window_days=7, end_day=end_day)
+        assert leaderboard.entries == []
+        assert brute_force(db, 'product', 'revenue', 7, 10, end_day) == []
+
+
+def test_leaderboard_defaults_to_today_on_the_database_clock(client, db):
+        product_id = create_products(client, 1)[0]
+        assert client.post("/sales/", json={"sale": {"product_id": product_id, "quantity_sold": 2}}).status_code == 201
+
+        body = client.get("/sales/leaderboard?window_days=1").json()
+        assert body["end_date"] == crud.database_now(db).date().isoformat()
+        assert [(entry["product_id"], entry["units_sold"]) for entry in body["entries"]] == [(product_id, 2)]
+
+
+def test_cached_default_window_costs_no_database_round_trip(client, db, count_statements):
+        product_id = create_products(client, 1)[0]
+        assert client.post("/sales/", json={"sale": {"product_id": product_id, "quantity_sold": 2}}).status_code == 201
+        first = crud.get_leaderboard_cached(db, window_days=1)
+        assert first.end_date == crud.database_now(db).date()
+
+        with count_statements() as statements:
+            assert crud.get_leaderboard_cached(db, window_days=1) == first
+        assert statements == []
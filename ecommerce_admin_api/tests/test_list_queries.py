@@ -0,0 +1,41 @@
+import pytest
+
+from tests.conftest import create_products
+
+# Listing endpoints must read a page in a fixed number of statements, whatever its size (no N+1).
+LIST_STATEMENTS = 1
+
+
+@pytest.mark.parametrize("path", ["/products/", "/inventory/", "/sales/"])
+def test_list_statement_count_is_independent_of_page_size(client, count_statements, path):
+        product_ids = create_products(client, 30)
+        for product_id in product_ids:
+            assert client.post("/sales/", json={"sale": {"product_id": product_id, "quantity_sold": 1}}).status_code == 201
+
+        counts = {}
+        for limit in (1, 10, 30):
+            with count_statements() as statements:
+                response = client.get(f"{path}?limit={limit}")
+            assert response.status_code == 200
+            assert len(response.json()) == limit
+            counts[limit] = len(statements)
+        assert set(counts.values()) == {LIST_STATEMENTS}, counts
+
+
+def test_product_list_includes_inventory_without_extra_statements(client, count_statements):
+        create_products(client, 20, quantity=7)
+        with count_statements() as statements:
+            products = client.get("/products/?limit=20").json()
+        assert len(statements) == LIST_STATEMENTS
+        assert [product["inventory"]["quantity"] for product in products] == [7] * 20
+
+
+def test_product_reads_eager_load_inventory(db, count_statements, client):
+        import crud
+        create_products(client, 3)
+        with count_statements() as statements:
+            product = crud.get_product(db, 2)
+            by_name = crud.get_product_by_name(db, "p1")
+            quantities = (product.inventory.quantity, by_name.inventory.quantity)
+        assert quantities == (50, 50)
+        assert len(statements) == 2
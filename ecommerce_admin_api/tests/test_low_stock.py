@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+
+import low_stock
+import main
+import models
+import sale_buffer
+import schemas
+from tests.conftest import create_products
+
+# Products start with 12 units and the default threshold of 10; every write path must keep
+# inventory.is_low_stock equal to quantity <= threshold and publish exactly the crossings.
+
+
+@pytest.fixture
+def published(monkeypatch):
+        """The low-stock events published, as (product_id, quantity, is_low_stock)."""
+        events = []
+        publish = low_stock.notifier.publish
+        def record(batch):
+            events.extend((event.product_id, event.quantity, event.is_low_stock) for event in batch)
+            publish(batch)
+        monkeypatch.setattr(low_stock.notifier, "publish", record)
+        return events
+
+
+def low_flags(db):
+        """{product_id: is_low_stock}, after checking the flag matches quantity and threshold on every row."""
+        db.expire_all()
+        rows = db.query(models.Inventory).all()
+        assert [row.product_id for row in rows if row.is_low_stock != (row.quantity <= row.low_stock_threshold)] == []
+        return {row.product_id: row.is_low_stock for row in rows}
+
+
+def test_single_sales_flag_the_crossing_once(client, db, published):
+        product_id = create_products(client, 1, quantity=12)[0]
+        for expected in ({product_id: False}, {product_id: True}, {product_id: True}): # 11, 10, 9 left
+            assert client.post("/sales/", json={"sale": {"product_id": product_id, "quantity_sold": 1}}).status_code == 201
+            assert low_flags(db) == expected
+        assert published == [(product_id, 10, True)]
+
+
+def test_bulk_sale_flags_only_the_products_that_cross(client, db, published):
+        product_ids = create_products(client, 2, quantity=12)
+        lines = [{"product_id": product_ids[0], "quantity_sold": 1}, {"product_id": product_ids[1], "quantity_sold": 1},
+                 {"product_id": product_ids[0], "quantity_sold": 2}]
+        assert client.post("/sales/bulk", json={"sales": lines}).status_code in (200, 201)
+        assert low_flags(db) == {product_ids[0]: True, product_ids[1]: False}
+        assert published == [(product_ids[0], 9, True)]
+
+
+def test_inventory_updates_flag_and_clear(client, db, published):
+        product_id = create_products(client, 1, quantity=12)[0]
+        updates = [({"quantity": 5}, True), ({"quantity": 5}, True), ({"quantity": 50}, False),
+                   ({"low_stock_threshold": 60}, True), ({"low_stock_threshold": 10, "quantity": 11}, False)]
+        for update, expected in updates:
+            response = client.put(f"/inventory/{product_id}", json={"inventory_update": update})
+            assert response.status_code == 200, response.text
+            assert response.json()["is_low_stock"] is expected
+            assert low_flags(db) == {product_id: expected}
+        assert published == [(product_id, 5, True), (product_id, 50, False), (product_id, 50, True), (product_id, 11, False)]
+
+
+def test_bulk_adjustments_publish_the_net_crossing_per_product(client, db, published):
+        product_ids = create_products(client, 3, quantity=12)
+        adjustments = [{"product_id": product_ids[0], "delta": -5},
+                       {"product_id": product_ids[1], "low_stock_threshold": 20},
+                       {"product_id": product_ids[2], "delta": -5}, {"product_id": product_ids[2], "delta": 5}, # Down and back up
+                       {"product_id": product_ids[0], "delta": -1}]
+        response = client.patch("/inventory/bulk", json={"adjustments": adjustments})
+        assert response.status_code == 200, response.text
+        assert low_flags(db) == {product_ids[0]: True, product_ids[1]: True, product_ids[2]: False}
+        assert sorted(published) == [(product_ids[0], 6, True), (product_ids[1], 12, True)]
+
+        published.clear()
+        response = client.patch("/inventory/bulk", json={"adjustments": [{"product_id": product_ids[0], "quantity": 40}]})
+        assert response.status_code == 200, response.text
+        assert low_flags(db)[product_ids[0]] is False
+        assert published == [(product_ids[0], 40, False)]
+
+
+def test_buffered_sales_flag_the_crossing_when_committed(client, db, published, tmp_path):
+        product_id = create_products(client, 1, quantity=12)[0]
+        buffer = sale_buffer.SaleBuffer(directory=str(tmp_path), flush_ms=60000)
+        buffer.start()
+        try:
+            for _ in range(3):
+                buffer.submit(db, schemas.SaleCreate(product_id=product_id, quantity_sold=1))
+            assert published == [] and low_flags(db) == {product_id: False} # Nothing committed yet
+            assert buffer.flush() == 3
+        finally:
+            buffer.stop()
+        assert low_flags(db) == {product_id: True}
+        assert published == [(product_id, 9, True)]
+
+
+async def read_stream(trigger):
+        """
+        Opens GET /inventory/low-stock/stream on the ASGI app, runs trigger() on a thread once subscribed,
+        and returns the stream's text up to the first event, then disconnects.
+        """
+        chunks, disconnected = asyncio.Queue(), asyncio.Event()
+        async def receive():
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+        async def send(message):
+            if message["type"] == "http.response.start":
+                assert message["status"] == 200
+                assert (b"content-type", b"text/event-stream; charset=utf-8") in message["headers"]
+            elif message["type"] == "http.response.body":
+                await chunks.put(message.get("body", b"").decode())
+        scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+                 "path": "/inventory/low-stock/stream", "raw_path": b"/inventory/low-stock/stream", "query_string": b"",
+                 "root_path": "", "headers": [(b"host", b"testserver")], "client": ("testclient", 50000),
+                 "server": ("testserver", 80)}
+        app = asyncio.create_task(main.app(scope, receive, send))
+        text = await asyncio.wait_for(chunks.get(), timeout=5) # The retry hint: the queue is subscribed
+        await asyncio.to_thread(trigger)
+        while "\n\n" not in text.split("retry: 5000\n\n", 1)[-1]:
+            text += await asyncio.wait_for(chunks.get(), timeout=5)
+        disconnected.set()
+        await asyncio.wait_for(app, timeout=5)
+        return text
+
+
+def test_stream_sends_crossings_as_server_sent_events(client):
+        product_id = create_products(client, 1, quantity=12)[0]
+        def sell():
+            assert client.post("/sales/", json={"sale": {"product_id": product_id, "quantity_sold": 2}}).status_code == 201
+
+        text = asyncio.run(read_stream(sell))
+        retry, message = text.split("\n\n")[:2]
+        assert retry == "retry: 5000"
+        name, data = message.split("\n")
+        assert name == "event: low_stock"
+        event = schemas.LowStockEvent.model_validate_json(data.removeprefix("data: "))
+        assert (event.product_id, event.quantity, event.is_low_stock) == (product_id, 10, True)
+        assert low_stock.notifier.stats()["subscribers"] == 0 # Unsubscribed on disconnect
@@ -0,0 +1,73 @@
+import os
+from datetime import date, datetime
+
+import pytest
+
+import crud
+import models
+import partitions
+from tests.conftest import create_products
+from tests.test_leaderboard import add_sales
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+# SQLite keeps sales unpartitioned, so archive_months deletes the archived months' rows
+MARCH, APRIL, MAY = date(2024, 3, 1), date(2024, 4, 1), date(2024, 5, 1)
+
+
+def rollup(db):
+        db.expire_all()
+        return sorted((row.day, row.product_id, row.total_revenue, row.quantity_sold, row.sale_count)
+                      for row in db.query(models.DailyRevenue))
+
+
+def sale_months(db):
+        return sorted({partitions.month_start(sale_date) for (sale_date,) in db.query(models.Sale.sale_date)})
+
+
+@pytest.fixture
+def sales(client, db):
+        product_ids = create_products(client, 2)
+        rows = [(product_ids[i % 2], datetime(2024, 3, 1 + i, 9), 1 + i % 3, 10.0) for i in range(5)]
+        rows += [(product_ids[i % 2], datetime(2024, 4, 10 + i, 12), 2, 7.5) for i in range(3)]
+        rows += [(product_ids[0], datetime(2024, 4, 30, 23, 59, 59), 1, 4.0)] # Last second of the month
+        rows += [(product_ids[1], datetime(2024, 5, 2, 8), 1, 3.0)]
+        add_sales(db, rows)
+        return rows
+
+
+def test_archive_moves_past_months_to_parquet_and_keeps_their_revenue(db, sales, tmp_path):
+        rollup_before = rollup(db)
+        march_revenue = crud.get_revenue_summary(db, datetime(2024, 3, 1), datetime(2024, 4, 1))
+        archived_ids = {month: sorted(sale_id for (sale_id, sale_date) in db.query(models.Sale.id, models.Sale.sale_date)
+                                      if partitions.month_start(sale_date) == month) for month in (MARCH, APRIL)}
+
+        records = partitions.archive_months(date(2024, 5, 15), out_dir=str(tmp_path))
+
+        assert [(record.month, record.row_count, record.total_revenue) for record in records] == \
+            [(MARCH, 5, pytest.approx(90.0)), (APRIL, 4, pytest.approx(49.0))]
+        for month in (MARCH, APRIL):
+            path = tmp_path / f"sale_month={month:%Y-%m}"
+            table = pq.read_table(path / "part-0.parquet")
+            assert sorted(table.column("id").to_pylist()) == archived_ids[month]
+            stored = db.get(models.SalesArchive, month)
+            assert (stored.path, stored.row_count) == (str(path), len(archived_ids[month]))
+        assert sale_months(db) == [MAY]
+
+        # The rollup still covers the archived months, also after a full rebuild from the remaining sales
+        assert rollup(db) == rollup_before
+        crud.rebuild_daily_revenue(db)
+        assert rollup(db) == rollup_before
+        assert crud.get_revenue_summary(db, datetime(2024, 3, 1), datetime(2024, 4, 1)) == pytest.approx(march_revenue)
+
+
+def test_archive_rerun_is_a_no_op(db, sales, tmp_path):
+        partitions.archive_months(date(2024, 5, 1), out_dir=str(tmp_path))
+        files = {path: os.path.getmtime(path) for path in tmp_path.rglob("*.parquet")}
+        rollup_before = rollup(db)
+
+        assert partitions.archive_months(date(2024, 5, 1), out_dir=str(tmp_path)) == []
+        assert {path: os.path.getmtime(path) for path in tmp_path.rglob("*.parquet")} == files
+        assert [record.month for record in db.query(models.SalesArchive).order_by(models.SalesArchive.month)] == [MARCH, APRIL]
+        assert sale_months(db) == [MAY]
+        assert rollup(db) == rollup_before
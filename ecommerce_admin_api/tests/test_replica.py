@@ -0,0 +1,70 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+import database
+import models
+from tests.conftest import create_products
+
+REPLICA_QUANTITY = 777
+
+
+@pytest.fixture
+def replica(tmp_path, monkeypatch):
+        """A second SQLite file standing in for the read replica, holding different stock than the primary."""
+        url = f"sqlite:///{tmp_path / 'replica.db'}"
+        replica_engine = create_engine(url)
+        models.Base.metadata.create_all(bind=replica_engine)
+        with Session(replica_engine) as db:
+            db.add(models.Product(name="On replica", price=1.0, inventory=models.Inventory(quantity=REPLICA_QUANTITY)))
+            db.commit()
+        engines = [replica_engine]
+        monkeypatch.setattr(database, "replica_engine", replica_engine)
+        monkeypatch.setattr(database, "ReplicaSessionLocal", database.replica_sessionmaker(replica_engine, database.engine))
+        monkeypatch.setattr(database, "replica_health", database.ReplicaHealth())
+        if database.ASYNC_MODE:
+            from sqlalchemy.ext.asyncio import create_async_engine
+            async_replica_engine = create_async_engine(database.to_async_url(url))
+            engines.append(async_replica_engine.sync_engine)
+            monkeypatch.setattr(database, "async_replica_engine", async_replica_engine)
+            monkeypatch.setattr(database, "AsyncReplicaSessionLocal",
+                                database.async_replica_sessionmaker(async_replica_engine, database.async_engine))
+        yield engines
+        for replica_engine in engines:
+            replica_engine.dispose()
+
+
+def kill(engines):
+        """Every new connection to the replica fails, as if its server went away."""
+        for replica_engine in engines:
+            def refuse(dialect, connection_record, cargs, cparams):
+                raise dialect.loaded_dbapi.OperationalError("unable to open database file")
+            event.listen(replica_engine, "do_connect", refuse)
+            replica_engine.dispose()
+
+
+def listed_quantities(client):
+        response = client.get("/inventory/")
+        assert response.status_code == 200, response.text
+        return [row["quantity"] for row in response.json()]
+
+
+def test_reads_use_the_replica_and_fall_back_to_the_primary_when_it_dies(client, replica):
+        create_products(client, 1, quantity=50) # Writes always go to the primary
+        assert listed_quantities(client) == [REPLICA_QUANTITY]
+        assert database.replica_health.status()["usable"] is True
+
+        # The replica dies while its last health check still says it is usable
+        kill(replica)
+        assert database.replica_health.is_fresh()
+        assert listed_quantities(client) == [50]
+        status = database.replica_health.status()
+        assert status["usable"] is False and status["reason"].startswith("replica failed")
+        assert listed_quantities(client) == [50]
+
+
+def test_unreachable_replica_is_not_used(client, replica):
+        create_products(client, 1, quantity=50)
+        kill(replica)
+        assert listed_quantities(client) == [50]
+        assert database.replica_health.status()["reason"].startswith("replica unavailable")
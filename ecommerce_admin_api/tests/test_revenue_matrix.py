@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func
+
+import crud
+import models
+from tests.conftest import create_products
+from tests.test_revenue_series import add_sales
+
+BASE = datetime(2024, 3, 1)
+
+
+@pytest.fixture
+def sales(client, db):
+        product_ids = create_products(client, 4)
+        rows = []
+        for i in range(120):
+            # Spread over ~40 days, some exactly at midnight and some late in the day
+            sale_date = BASE + timedelta(hours=8 * i) + (timedelta(hours=23, minutes=59) if i % 7 == 3 else timedelta())
+            rows.append((product_ids[i % 4], sale_date, float(1 + i % 9)))
+        add_sales(db, rows)
+        return product_ids
+
+
+def brute_force(db, start, end, group_by):
+        key = {"product": models.Sale.product_id, "category": models.Sale.category}.get(group_by)
+        query = db.query(*([key] if key is not None else []), func.sum(models.Sale.total_revenue)) \
+            .filter(models.Sale.sale_date >= start, models.Sale.sale_date <= end)
+        rows = query.group_by(key).all() if key is not None else query.all()
+        return {(row[0] if key is not None else None): row[-1] or 0.0 for row in rows}
+
+
+PERIOD_SETS = {
+    "midnight to midnight": [(BASE + timedelta(days=7 * k), BASE + timedelta(days=7 * (k + 1))) for k in range(5)],
+    "whole days": [(BASE + timedelta(days=10 * k), BASE + timedelta(days=10 * (k + 1), microseconds=-1)) for k in range(4)],
+    "partial days": [(BASE + timedelta(days=k, hours=5), BASE + timedelta(days=k + 3, hours=17)) for k in range(0, 30, 6)],
+    "within one day": [(BASE + timedelta(days=2, hours=1), BASE + timedelta(days=2, hours=20))],
+    "no sales": [(BASE - timedelta(days=30), BASE - timedelta(days=20, hours=3))],
+}
+
+
+@pytest.mark.parametrize("group_by", [None, "product", "category"])
+@pytest.mark.parametrize("name", PERIOD_SETS)
+def test_matrix_matches_raw_sales(db, sales, name, group_by):
+        periods = PERIOD_SETS[name]
+        keys, matrix = crud.get_revenue_matrix(db, periods, group_by=group_by)
+        for index, (start, end) in enumerate(periods):
+            expected = brute_force(db, start, end, group_by)
+            got = {key: matrix[row, index] for row, key in enumerate(keys) if matrix[row, index]}
+            assert got == pytest.approx({key: value for key, value in expected.items() if value}), (name, index)
+
+
+def test_matrix_round_trips_do_not_grow_with_periods(db, sales, count_statements):
+        for count in (2, 12):
+            periods = [(BASE + timedelta(days=3 * k, hours=6), BASE + timedelta(days=3 * k + 2, hours=18)) for k in range(count)]
+            with count_statements() as statements:
+                crud.get_revenue_matrix(db, periods, group_by="category")
+            assert len(statements) == 2 # rollup + one UNION ALL of the edge ranges
+
+
+def test_periods_may_mix_utc_offsets_and_naive_datetimes(client, db, sales):
+        # 2024-03-02T00:00:00+02:00 is 2024-03-01T22:00:00 UTC; sale_date is stored as naive UTC
+        periods = [{"start": "2024-03-01T00:00:00Z", "end": "2024-03-05T12:00:00"},
+                   {"start": "2024-03-02T00:00:00+02:00", "end": "2024-03-09T00:00:00Z"}]
+        response = client.post("/sales/revenue/comparison/matrix", json={"periods": periods})
+        assert response.status_code == 200, response.text
+        expected = [brute_force(db, datetime(2024, 3, 1), datetime(2024, 3, 5, 12), None)[None],
+                    brute_force(db, datetime(2024, 3, 1, 22), datetime(2024, 3, 9), None)[None]]
+        assert response.json()["period_totals"] == pytest.approx(expected)
+
+        response = client.post("/sales/revenue/comparison", json={
+            "period1_start": periods[0]["start"], "period1_end": periods[0]["end"],
+            "period2_start": periods[1]["start"], "period2_end": periods[1]["end"]})
+        assert response.status_code == 200, response.text
+        assert [response.json()["period1_revenue"], response.json()["period2_revenue"]] == pytest.approx(expected)
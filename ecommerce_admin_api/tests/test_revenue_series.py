@@ -0,0 +1,64 @@
+from datetime import date, datetime
+
+import numpy as np
+
+import analytics
+import crud
+import models
+from tests.conftest import create_products
+
+
+def add_sales(db, sales):
+        """Inserts (product_id, sale_date, revenue) sales directly and rebuilds the daily rollup."""
+        for product_id, sale_date, revenue in sales:
+            product = db.get(models.Product, product_id)
+            db.add(models.Sale(product_id=product_id, quantity_sold=1, sale_price_per_unit=revenue,
+                               total_revenue=revenue, sale_date=sale_date, category=product.category_norm))
+        db.commit()
+        crud.rebuild_daily_revenue(db)
+
+
+def test_period_range_covers_every_period():
+        months = analytics.period_range(date(2024, 1, 15), date(2024, 4, 2), 'month')
+        assert analytics.to_datetimes(months) == [datetime(2024, m, 1) for m in (1, 2, 3, 4)]
+        weeks = analytics.period_range(date(2024, 1, 3), date(2024, 1, 22), 'week')
+        assert [d.date() for d in analytics.to_datetimes(weeks)] == [date(2023, 12, 31), date(2024, 1, 7),
+                                                                   date(2024, 1, 14), date(2024, 1, 21)]
+        assert len(analytics.period_range(date(2024, 2, 27), date(2024, 3, 1), 'day')) == 4
+        assert len(analytics.period_range(date(2022, 6, 1), date(2024, 1, 1), 'year')) == 3
+
+
+def test_aggregate_zero_fills_given_periods():
+        days = analytics.to_day_array([date(2024, 1, 5), date(2024, 3, 9)])
+        periods = analytics.period_range(date(2024, 1, 1), date(2024, 3, 31), 'month')
+        _, _, matrix = analytics.aggregate(days, np.array([10.0, 60.0]), 'month', periods=periods)
+        assert matrix.tolist() == [[10.0, 0.0, 60.0]]
+
+
+def test_series_compares_adjacent_periods_across_a_gap(client, db):
+        product_id = create_products(client, 1)[0]
+        add_sales(db, [(product_id, datetime(2024, 1, 10, 12), 10.0), (product_id, datetime(2024, 3, 5, 9), 60.0)])
+
+        body = client.get("/sales/revenue/series?period=month&start_date=2024-01-01&end_date=2024-03-31").json()
+        assert [start[:10] for start in body["period_starts"]] == ["2024-01-01", "2024-02-01", "2024-03-01"]
+        series = body["series"][0]
+        assert series["revenue"] == [10.0, 0.0, 60.0]
+        assert series["change"] == [None, -10.0, 60.0]
+        assert series["percentage_change"] == [None, -100.0, None] # No percentage against a zero baseline
+        assert series["total_revenue"] == 70.0
+
+
+def test_grouped_series_share_the_full_period_list(client, db):
+        first, second = create_products(client, 2)
+        add_sales(db, [(first, datetime(2024, 1, 2), 5.0), (second, datetime(2024, 1, 20), 7.0)])
+
+        body = client.get("/sales/revenue/series?period=week&start_date=2024-01-01&end_date=2024-01-31&group_by=product").json()
+        assert len(body["period_starts"]) == 5
+        by_product = {series["product_id"]: series["revenue"] for series in body["series"]}
+        assert by_product == {first: [5.0, 0.0, 0.0, 0.0, 0.0], second: [0.0, 0.0, 7.0, 0.0, 0.0]}
+
+
+def test_series_without_sales_is_all_zero(client):
+        body = client.get("/sales/revenue/series?period=day&start_date=2024-01-01&end_date=2024-01-03").json()
+        assert len(body["period_starts"]) == 3
+        assert body["series"][0]["revenue"] == [0.0, 0.0, 0.0]
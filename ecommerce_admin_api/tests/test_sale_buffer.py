@@ -0,0 +1,155 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+import crud
+import models
+import sale_buffer
+import schemas
+from tests.conftest import create_products
+from tests.test_sale_pricing import change_behind_the_cache
+
+
+@pytest.fixture
+def buffer(tmp_path):
+        wal = sale_buffer.SaleBuffer(directory=str(tmp_path), flush_ms=60000)
+        yield wal
+        wal.stop()
+
+
+@pytest.mark.skipif(sale_buffer.fcntl is None, reason="needs fcntl.flock")
+def test_second_buffer_on_the_same_log_refuses_to_start(buffer, tmp_path):
+        buffer.start()
+        other = sale_buffer.SaleBuffer(directory=str(tmp_path))
+        with pytest.raises(RuntimeError, match="already running"):
+            other.start()
+        assert not other.started
+
+        buffer.stop()
+        other.start()
+        other.stop()
+
+
+def test_buffered_sales_are_dated_by_the_database_clock(buffer, client, db, monkeypatch, count_statements):
+        product_id = create_products(client, 1)[0]
+        skew = timedelta(hours=3, seconds=20) # The database clock runs ahead of this host's
+        monkeypatch.setattr(crud, "database_now", lambda session: sale_buffer._utc_now() + skew)
+        buffer.start()
+        buffer.submit(db, schemas.SaleCreate(product_id=product_id, quantity_sold=1)) # Loads the reservation
+
+        # The offset was measured once at start; accepting a sale costs no round trip
+        monkeypatch.setattr(crud, "database_now", lambda session: pytest.fail("database clock read per sale"))
+        with count_statements() as statements:
+            expected = sale_buffer._utc_now() + skew
+            buffered = buffer.submit(db, schemas.SaleCreate(product_id=product_id, quantity_sold=3))
+        assert statements == []
+        assert buffered.sale_date.microsecond == 0
+        assert abs(buffered.sale_date - expected) < timedelta(seconds=2)
+        assert buffer.flush() == 2
+
+        db.expire_all()
+        sale = db.query(models.Sale).filter(models.Sale.quantity_sold == 3).one()
+        assert sale.sale_date == buffered.sale_date
+        assert buffered.sale_date.date() in {row.day for row in db.query(models.DailyRevenue.day)}
+
+
+def test_buffered_sales_are_priced_from_the_database_not_the_product_cache(buffer, client, db):
+        product_id = create_products(client, 1, categories=("Old",), price=10.0)[0]
+        assert crud.get_product_cached(db, product_id).price == 10.0
+        change_behind_the_cache(db, product_id, price=12.5, category="New")
+        buffer.start()
+
+        buffered = buffer.submit(db, schemas.SaleCreate(product_id=product_id, quantity_sold=2))
+        assert (buffered.sale_price_per_unit, buffered.total_revenue, buffered.category) == (12.5, 25.0, "new")
+        # While sales stay buffered, the price is refreshed by each commit
+        change_behind_the_cache(db, product_id, price=15.0)
+        buffer.submit(db, schemas.SaleCreate(product_id=product_id, quantity_sold=1))
+        assert buffer.flush() == 2
+        assert buffer.submit(db, schemas.SaleCreate(product_id=product_id, quantity_sold=1)).sale_price_per_unit == 15.0
+
+
+def stock_and_sales(db, product_id):
+        db.expire_all()
+        quantity = db.query(models.Inventory.quantity).filter(models.Inventory.product_id == product_id).scalar()
+        return quantity, db.query(models.Sale).count()
+
+
+def log_lines(product_id, sequences, quantity=1):
+        return [schemas.BufferedSale(sequence=sequence, product_id=product_id, quantity_sold=quantity, sale_price_per_unit=10.0,
+                                     total_revenue=10.0 * quantity, sale_date=datetime(2024, 5, 1, 12), category="cat0")
+                .model_dump_json() + "\n" for sequence in sequences]
+
+
+def test_reservation_rejects_an_oversell(buffer, client, db):
+        product_id = create_products(client, 1, quantity=5)[0]
+        buffer.start()
+        buffer.submit(db, schemas.SaleCreate(product_id=product_id, quantity_sold=3))
+        with pytest.raises(crud.InsufficientStockError):
+            buffer.submit(db, schemas.SaleCreate(product_id=product_id, quantity_sold=3))
+        buffer.submit(db, schemas.SaleCreate(product_id=product_id, quantity_sold=2))
+        with pytest.raises(crud.InsufficientStockError):
+            buffer.submit(db, schemas.SaleCreate(product_id=product_id, quantity_sold=1))
+
+        assert buffer.flush() == 2
+        assert stock_and_sales(db, product_id) == (0, 2)
+        assert buffer.stats()["accepted"] == 2
+
+
+def test_replay_after_a_crash_between_commit_and_segment_removal_records_nothing_twice(client, db, tmp_path):
+        product_id = create_products(client, 1, quantity=10)[0]
+        first = sale_buffer.SaleBuffer(directory=str(tmp_path), flush_ms=60000)
+        first.start()
+        for quantity in (1, 2):
+            first.submit(db, schemas.SaleCreate(product_id=product_id, quantity_sold=quantity))
+        with open(first._segment, encoding="utf-8") as segment:
+            logged = segment.read()
+        segment_path = first._segment
+        assert first.flush() == 2
+        first.stop()
+        # The commit went through but the process died before deleting the segment
+        with open(segment_path, "w", encoding="utf-8") as segment:
+            segment.write(logged)
+
+        second = sale_buffer.SaleBuffer(directory=str(tmp_path), flush_ms=60000)
+        second.start()
+        try:
+            assert stock_and_sales(db, product_id) == (7, 2)
+            assert not os.path.exists(segment_path)
+            # New sales continue the sequence after the replayed ones
+            assert second.submit(db, schemas.SaleCreate(product_id=product_id, quantity_sold=1)).sequence == 3
+        finally:
+            second.stop()
+        assert stock_and_sales(db, product_id) == (6, 3)
+
+
+def test_replay_records_logged_sales_and_skips_a_torn_last_line(buffer, client, db, tmp_path):
+        product_id = create_products(client, 1, quantity=10)[0]
+        lines = log_lines(product_id, [1, 2, 3], quantity=2)
+        with open(tmp_path / "sales.000000000001.wal", "w", encoding="utf-8") as segment:
+            segment.writelines(lines[:2])
+            segment.write(lines[2][:25]) # A crash mid-append; this sale was never acknowledged
+
+        buffer.start()
+        assert stock_and_sales(db, product_id) == (6, 2)
+        assert db.get(models.SalesWalCheckpoint, "sales").applied_sequence == 2
+        assert [path.name for path in tmp_path.glob("*.wal")] == [os.path.basename(buffer._segment)] # Replayed segments removed
+
+
+def test_sale_no_longer_covered_after_an_outside_stock_change_goes_to_the_rejected_file(buffer, client, db, tmp_path):
+        product_id = create_products(client, 1, quantity=5)[0]
+        buffer.start()
+        buffer.submit(db, schemas.SaleCreate(product_id=product_id, quantity_sold=1))
+        buffer.submit(db, schemas.SaleCreate(product_id=product_id, quantity_sold=3))
+        # Another writer lowers the stock; the reservation only learns about it at the next commit
+        response = client.put(f"/inventory/{product_id}", json={"inventory_update": {"quantity": 2}})
+        assert response.status_code == 200, response.text
+
+        assert buffer.flush() == 2
+        assert stock_and_sales(db, product_id) == (1, 1)
+        assert buffer.stats()["rejected"] == 1
+        with open(tmp_path / "sales.rejected", encoding="utf-8") as rejected:
+            assert [(sale.sequence, sale.quantity_sold) for sale in map(schemas.BufferedSale.model_validate_json, rejected)] == [(2, 3)]
+        # The reservation now reflects the database: 1 left
+        with pytest.raises(crud.InsufficientStockError):
+            buffer.submit(db, schemas.SaleCreate(product_id=product_id, quantity_sold=2))
@@ -0,0 +1,38 @@
+from sqlalchemy import update
+
+import cache
+import crud
+import models
+from tests.conftest import create_products
+
+
+def change_behind_the_cache(db, product_id, **values):
+        """Updates a product the way another worker would: the database changes, this worker's cache does not."""
+        if "category" in values:
+            values["category_norm"] = models.normalize_lookup(values["category"])
+        db.execute(update(models.Product).where(models.Product.id == product_id).values(**values))
+        db.commit()
+
+
+def test_sales_are_priced_from_the_database_not_the_product_cache(client, db):
+        product_id = create_products(client, 1, categories=("Old",), price=10.0)[0]
+        assert crud.get_product_cached(db, product_id).price == 10.0 # Cached at the old price
+        change_behind_the_cache(db, product_id, price=12.5, category="New")
+        assert cache.product_cache.get(product_id).price == 10.0
+
+        response = client.post("/sales/", json={"sale": {"product_id": product_id, "quantity_sold": 2}})
+        assert response.status_code == 201, response.text
+        assert (response.json()["sale_price_per_unit"], response.json()["total_revenue"]) == (12.5, 25.0)
+
+        response = client.post("/sales/bulk", json={"sales": [{"product_id": product_id, "quantity_sold": 1}]})
+        assert response.json()["results"][0]["sale_price_per_unit"] == 12.5
+
+        db.expire_all()
+        assert {sale.category for sale in db.query(models.Sale)} == {"new"}
+        rollup = db.query(models.DailyRevenue).one()
+        assert (rollup.category, rollup.total_revenue, rollup.quantity_sold) == ("new", 37.5, 3)
+
+
+def test_single_sale_still_rejects_unknown_products_from_the_cache(client, db):
+        response = client.post("/sales/", json={"sale": {"product_id": 999, "quantity_sold": 1}})
+        assert response.status_code == 404
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+
+import httpx
+from fastapi.testclient import TestClient
+from sqlalchemy import func
+
+import database
+import main
+import models
+from tests.conftest import create_products
+
+THREADS = 24
+STOCK = 10
+
+
+def fire_concurrently(requests):
+        """Sends (path, body) requests from one thread each, released together; returns their responses."""
+        if database.ASYNC_MODE:
+            return asyncio.run(fire_on_one_loop(requests))
+        barrier = threading.Barrier(len(requests))
+        responses = [None] * len(requests)
+
+        def send(index, path, body):
+            client = TestClient(main.app)
+            barrier.wait()
+            responses[index] = client.post(path, json=body)
+
+        threads = [threading.Thread(target=send, args=(index, path, body)) for index, (path, body) in enumerate(requests)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return responses
+
+
+async def fire_on_one_loop(requests):
+        """Async mode: the async engine's pool belongs to one event loop, as in a server, so the requests
+        are sent concurrently on a single loop instead of one TestClient (and loop) per thread."""
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://testserver") as client:
+            responses = await asyncio.gather(*[client.post(path, json=body) for path, body in requests])
+        await database.async_engine.dispose() # Its pool is now bound to this loop, which is about to close
+        return responses
+
+
+def stock_and_sales(db, product_id):
+        db.expire_all()
+        quantity = db.query(models.Inventory.quantity).filter(models.Inventory.product_id == product_id).scalar()
+        sold = db.query(func.count(models.Sale.id), func.coalesce(func.sum(models.Sale.quantity_sold), 0)) \
+            .filter(models.Sale.product_id == product_id).one()
+        return quantity, sold[0], sold[1]
+
+
+def test_concurrent_sales_never_oversell(client, db):
+        product_id = create_products(client, 1, quantity=STOCK)[0]
+        responses = fire_concurrently([("/sales/", {"sale": {"product_id": product_id, "quantity_sold": 1}})] * THREADS)
+
+        statuses = [response.status_code for response in responses]
+        assert statuses.count(201) == STOCK
+        assert statuses.count(409) == THREADS - STOCK
+        quantity, sales, units = stock_and_sales(db, product_id)
+        assert quantity == 0
+        assert sales == STOCK
+        assert units == STOCK - quantity
+
+
+def test_concurrent_bulk_sales_never_oversell(client, db):
+        product_id = create_products(client, 1, quantity=STOCK)[0]
+        line = {"product_id": product_id, "quantity_sold": 1}
+        responses = fire_concurrently([("/sales/bulk", {"sales": [line, line]})] * THREADS)
+
+        assert all(response.status_code == 200 for response in responses), [r.text for r in responses if r.status_code != 200]
+        results = [result for response in responses for result in response.json()["results"]]
+        accepted = [result for result in results if result["accepted"]]
+        assert len(accepted) == STOCK
+        assert all("Insufficient stock" in result["detail"] for result in results if not result["accepted"])
+        quantity, sales, units = stock_and_sales(db, product_id)
+        assert quantity == 0
+        assert sales == len(accepted)
+        assert units == STOCK - quantity
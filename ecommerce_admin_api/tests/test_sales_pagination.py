@@ -0,0 +1,48 @@
+from tests.conftest import create_products
+
+
+def walk_sales_pages(client, limit: int, query: str = ""):
+        """Follows X-Next-Cursor from the first page to the last and returns every sale id seen."""
+        ids, cursor, pages = [], None, 0
+        while True:
+            url = f"/sales/?limit={limit}{query}" + (f"&cursor={cursor}" if cursor else "")
+            response = client.get(url)
+            assert response.status_code == 200, response.text
+            ids.extend(sale["id"] for sale in response.json())
+            cursor = response.headers.get("x-next-cursor")
+            pages += 1
+            assert pages <= 100, "cursor pagination does not advance"
+            if not cursor:
+                return ids
+
+
+def test_cursor_walk_returns_every_sale_once(client):
+        product_ids = create_products(client, 3)
+        # Most of these share a sale_date (same second), so the (sale_date, id) tiebreak is exercised
+        for i in range(10):
+            assert client.post("/sales/", json={"sale": {"product_id": product_ids[i % 3], "quantity_sold": 1}}).status_code == 201
+        bulk = {"sales": [{"product_id": product_ids[i % 3], "quantity_sold": 1} for i in range(7)]}
+        assert client.post("/sales/bulk", json=bulk).status_code in (200, 201)
+
+        for limit in (1, 3, 4, 17, 50):
+            ids = walk_sales_pages(client, limit)
+            assert sorted(ids) == list(range(1, 18)), (limit, ids)
+
+
+def test_cursor_walk_with_filters(client):
+        product_ids = create_products(client, 3)
+        for i in range(12):
+            client.post("/sales/", json={"sale": {"product_id": product_ids[i % 3], "quantity_sold": 1}})
+        ids = walk_sales_pages(client, 2, f"&product_id={product_ids[0]}")
+        assert len(ids) == len(set(ids)) == 4
+        ids = walk_sales_pages(client, 3, "&category=cat1")
+        assert len(ids) == len(set(ids)) == 4
+
+
+def test_skip_pagination_still_works(client):
+        product_ids = create_products(client, 2)
+        for i in range(6):
+            client.post("/sales/", json={"sale": {"product_id": product_ids[i % 2], "quantity_sold": 1}})
+        first = [sale["id"] for sale in client.get("/sales/?limit=3").json()]
+        second = [sale["id"] for sale in client.get("/sales/?limit=3&skip=3").json()]
+        assert sorted(first + second) == list(range(1, 7))